@@ -2,6 +2,14 @@ import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
 
+from src.analytics.anomalias_por_grupo import puntuar_por_grupo
+
+# Columnas que ve el modelo (en este orden)
+FEATURES = ["cantidad", "es_salida", "hora", "dia_semana"]
+
+# modo -> columna que separa los modelos
+COLUMNA_GRUPO = {"producto": "product_id", "categoria": "category"}
+
 
 def _require_cols(df: pd.DataFrame, cols: list[str], ctx: str):
     missing = [c for c in cols if c not in df.columns]
@@ -66,53 +74,115 @@ def _preparar_features(df_hist: pd.DataFrame):
     # cantidad
     df["cantidad"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0)
 
-    feats = df[["cantidad", "es_salida", "hora", "dia_semana"]].copy()
+    feats = df[FEATURES].copy()
     return df, feats
 
 
-def _interpretar_y_accion(row: pd.Series) -> tuple[str, str]:
+MOTIVO_IA = "Patrón inusual detectado por IA."
+
+ACCION_SALIDA = (
+    "Posible causa: venta inusual, merma, ajuste o error de digitación. "
+    "Revisar ticket/factura o control de bodega. "
+    "Si fue error, corregir el registro para evitar quiebre de stock."
+)
+ACCION_INGRESO = (
+    "Posible causa: ingreso atípico, compra grande, ajuste o error de digitación. "
+    "Revisar documento de recepción/factura. "
+    "Si fue error, corregir el registro para no inflar inventario."
+)
+INTERPRETACION = "El movimiento de **{prod}** fue marcado como anómalo porque no se parece al patrón histórico. {motivo}"
+
+
+def _motivos(df: pd.DataFrame, estadisticas: pd.DataFrame | None = None) -> pd.Series:
     """
-    Genera interpretación + acción sugerida por anomalía (explicación humana).
+    Motivo corto por anomalía, con reglas por producto (sin bucles):
+    - q > mu + 2σ                      -> cantidad inusual
+    - salida y q > mu + 1.5σ           -> salida inusual
+    - resto (producto con 3+ registros) -> patrón inusual
+
+    estadisticas: resumen de estadisticas_online (índice product_id); si se
+    pasa, mu/σ son la media/desvío exponenciales (comportamiento reciente).
+    Los productos que no figuran usan las estadísticas de df.
     """
-    prod = str(row.get("product_name", "Producto"))
-    movimiento = str(row.get("movement_type", "")).strip()
-    motivo = str(row.get("motivo", "")).strip()
-    q = row.get("quantity", None)
-    stock_after = row.get("stock_after", None)
+    motivo = pd.Series("", index=df.index, dtype=object)
+    anom = df["anomaly"] == 1
 
-    interpretacion = (
-        f"El movimiento de **{prod}** fue marcado como anómalo porque no se parece al patrón histórico. {motivo}"
-    ).strip()
+    if "product_id" not in df.columns:
+        motivo[anom] = MOTIVO_IA
+        motivo[~anom] = "Normal"
+        return motivo
 
-    # acción por tipo
-    if movimiento.lower() == "salida":
-        accion = (
-            "Posible causa: venta inusual, merma, ajuste o error de digitación. "
-            "Revisar ticket/factura o control de bodega. "
-            "Si fue error, corregir el registro para evitar quiebre de stock."
-        )
+    grupos = df.groupby("product_id")["cantidad"]
+    n = grupos.transform("size")
+    mu = grupos.transform("mean")
+    sigma = grupos.transform("std", ddof=0)
+
+    if estadisticas is not None and len(estadisticas):
+        pid = df["product_id"]
+        n = pid.map(estadisticas["n"]).fillna(n)
+        mu = pid.map(estadisticas["media_ew"]).fillna(mu)
+        sigma = pid.map(estadisticas["desvio_ew"]).fillna(sigma)
+
+    sigma = sigma.where(sigma > 0, 1.0)
+
+    q = df["cantidad"].astype(float)
+    salida = df["movement_type"].astype(str).str.lower().str.strip() == "salida"
+
+    elegible = anom & (n >= 3)
+    cantidad_inusual = elegible & (q > mu + 2 * sigma)
+    salida_inusual = elegible & ~cantidad_inusual & salida & (q > mu + 1.5 * sigma)
+
+    q_txt = q.round().astype("int64").astype(str)
+    motivo[cantidad_inusual] = "Cantidad inusual vs histórico del producto (q=" + q_txt[cantidad_inusual] + ")."
+    motivo[salida_inusual] = "Salida inusual vs histórico (q=" + q_txt[salida_inusual] + ")."
+    motivo[elegible & ~cantidad_inusual & ~salida_inusual] = MOTIVO_IA
+    return motivo
+
+
+def _interpretar_y_accion(df: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
+    """
+    Genera interpretación + acción sugerida por anomalía (explicación humana),
+    armando los textos por columnas en vez de fila por fila.
+    """
+    anom = df["anomaly"] == 1
+
+    if "product_name" in df.columns:
+        prod = df["product_name"].astype(str)
     else:
-        accion = (
-            "Posible causa: ingreso atípico, compra grande, ajuste o error de digitación. "
-            "Revisar documento de recepción/factura. "
-            "Si fue error, corregir el registro para no inflar inventario."
-        )
+        prod = pd.Series("Producto", index=df.index)
+    motivo = df["motivo"].astype(str).str.strip()
 
-    # afinaciones útiles
-    if isinstance(q, (int, float)) and q and q > 0:
-        accion += " Validar unidades y que la cantidad esté en la unidad correcta."
+    prefijo, sufijo = INTERPRETACION.split("{prod}")
+    interpretacion = (prefijo + prod + sufijo.replace("{motivo}", "") + motivo).str.strip()
 
-    if isinstance(stock_after, (int, float)) and stock_after is not None:
-        if movimiento.lower() == "salida" and stock_after < 0:
-            accion += " Stock negativo sugiere inconsistencia: revisar histórico y corregir."
+    # acción por tipo
+    salida = df["movement_type"].astype(str).str.strip().str.lower() == "salida"
+    accion = pd.Series(np.where(salida, ACCION_SALIDA, ACCION_INGRESO), index=df.index)
+
+    interpretacion = interpretacion.where(anom, "Movimiento dentro del patrón esperado.")
+    accion = accion.where(anom, "Sin acción.")
+    return interpretacion, accion
+
+
+def interpretar_movimiento(r: dict, motivo: str) -> tuple[str, str]:
+    """
+    Interpretación + acción de un solo movimiento anómalo (mismos textos
+    que _interpretar_y_accion, sin armar un DataFrame).
+    """
+    salida = str(r.get("movement_type", "")).strip().lower() == "salida"
+    interpretacion = INTERPRETACION.format(prod=r.get("product_name", "Producto"), motivo=motivo.strip()).strip()
 
+    accion = ACCION_SALIDA if salida else ACCION_INGRESO
     return interpretacion, accion
 
 
 def detectar_movimientos_extranos(
     df_historial: pd.DataFrame,
     contamination: float = 0.15,
-    random_state: int = 42
+    random_state: int = 42,
+    modo: str = "global",
+    n_jobs: int | None = 1,
+    estadisticas: pd.DataFrame | None = None
 ) -> pd.DataFrame:
     """
     Devuelve el historial con columnas nuevas:
@@ -121,7 +191,14 @@ def detectar_movimientos_extranos(
     - motivo: explicación corta del porqué
     - interpretacion: explicación humana
     - accion_sugerida: recomendación
+
+    modo="global" ajusta un solo modelo; "producto" o "categoria" ajustan
+    uno por grupo, en paralelo con n_jobs procesos (-1 = todos los núcleos).
+    estadisticas: ver _motivos.
     """
+    if modo != "global" and modo not in COLUMNA_GRUPO:
+        raise ValueError(f"modo inválido: {modo!r}. Use 'global', 'producto' o 'categoria'.")
+
     if df_historial is None or len(df_historial) == 0:
         return pd.DataFrame()
 
@@ -136,60 +213,40 @@ def detectar_movimientos_extranos(
         df["accion_sugerida"] = "Registrar más movimientos y volver a ejecutar."
         return df
 
-    model = IsolationForest(
-        n_estimators=200,
-        contamination=min(max(contamination, 0.01), 0.4),
-        random_state=random_state
-    )
-    model.fit(X)
+    contamination = min(max(contamination, 0.01), 0.4)
+
+    if modo == "global":
+        model = IsolationForest(
+            n_estimators=200,
+            contamination=contamination,
+            random_state=random_state
+        )
+        model.fit(X)
 
-    pred = model.predict(X)  # -1 anómalo, 1 normal
-    score = model.decision_function(X)
+        pred = model.predict(X)  # -1 anómalo, 1 normal
+        score = model.decision_function(X)
 
-    df["anomaly"] = (pred == -1).astype(int)
-    df["anomaly_score"] = score
+        df["anomaly"] = (pred == -1).astype(int)
+        df["anomaly_score"] = score
+    else:
+        columna = COLUMNA_GRUPO[modo]
+        _require_cols(df, [columna], ctx=f"Historial para anomalías por {modo}")
+
+        score, anomaly = puntuar_por_grupo(
+            X.to_numpy(dtype=float),
+            df[columna].to_numpy(),
+            contamination=contamination,
+            random_state=random_state,
+            n_jobs=n_jobs,
+        )
+        df["anomaly"] = anomaly
+        df["anomaly_score"] = score
 
     # Motivos (explicabilidad ligera)
-    df["motivo"] = ""
-
-    # Reglas explicativas por producto (si existe)
-    if "product_id" in df.columns:
-        for pid, grp in df.groupby("product_id"):
-            cantidades = grp["cantidad"].values
-            if len(cantidades) < 3:
-                continue
-
-            mu = float(np.mean(cantidades))
-            sigma_val = float(np.std(cantidades))
-            sigma = sigma_val if sigma_val > 0 else 1.0
-
-            for i in grp.index:
-                if int(df.at[i, "anomaly"]) == 1:
-                    q = float(df.at[i, "cantidad"])
-                    tipo = str(df.at[i, "movement_type"]).lower().strip()
-
-                    if q > mu + 2 * sigma:
-                        df.at[i, "motivo"] = f"Cantidad inusual vs histórico del producto (q={q:.0f})."
-                    elif tipo == "salida" and q > mu + 1.5 * sigma:
-                        df.at[i, "motivo"] = f"Salida inusual vs histórico (q={q:.0f})."
-                    else:
-                        df.at[i, "motivo"] = "Patrón inusual detectado por IA."
-    else:
-        df.loc[df["anomaly"] == 1, "motivo"] = "Patrón inusual detectado por IA."
-        df.loc[df["anomaly"] == 0, "motivo"] = "Normal"
+    df["motivo"] = _motivos(df, estadisticas)
 
     # Interpretación + acción
-    df["interpretacion"] = ""
-    df["accion_sugerida"] = ""
-
-    for i in df.index:
-        if int(df.at[i, "anomaly"]) == 1:
-            interp, acc = _interpretar_y_accion(df.loc[i])
-            df.at[i, "interpretacion"] = interp
-            df.at[i, "accion_sugerida"] = acc
-        else:
-            df.at[i, "interpretacion"] = "Movimiento dentro del patrón esperado."
-            df.at[i, "accion_sugerida"] = "Sin acción."
+    df["interpretacion"], df["accion_sugerida"] = _interpretar_y_accion(df)
 
     return df
 
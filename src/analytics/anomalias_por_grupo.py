@@ -0,0 +1,173 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+
+# Grupos con menos filas los puntúa un modelo global (mismo mínimo que el modo global)
+MIN_FILAS_GRUPO = 8
+
+# Árboles por modelo de grupo: los grupos son chicos (max_samples = filas
+# del grupo) y con miles de SKUs el costo fijo por árbol domina
+N_ESTIMATORS_GRUPO = 100
+
+# Tareas por worker: varias tandas por proceso equilibran grupos de distinto tamaño
+TANDAS_POR_WORKER = 4
+
+
+# =========================================================
+# WORKER (nivel de módulo para poder usarse desde el pool)
+# =========================================================
+_memoria = {}
+
+
+def _adjuntar(nombres: dict, n: int, n_features: int):
+    """
+    Initializer del pool: cada proceso se conecta una sola vez a la
+    memoria compartida (X ordenado por grupo + salidas), sin copiar X.
+    """
+    bloques = {clave: shared_memory.SharedMemory(name=nombre) for clave, nombre in nombres.items()}
+    _memoria["bloques"] = bloques
+    _memoria["X"] = np.ndarray((n, n_features), dtype=np.float64, buffer=bloques["X"].buf)
+    _memoria["score"] = np.ndarray((n,), dtype=np.float64, buffer=bloques["score"].buf)
+    _memoria["anomaly"] = np.ndarray((n,), dtype=np.int8, buffer=bloques["anomaly"].buf)
+
+
+def _ajustar_tramos(tramos, X, score, anomaly, parametros: dict) -> int:
+    """
+    Ajusta un IsolationForest por tramo [inicio, fin) de X y escribe
+    decision_function y la marca de anomalía en las mismas posiciones.
+    """
+    for inicio, fin in tramos:
+        modelo = IsolationForest(**parametros)
+        Xg = X[inicio:fin]
+        modelo.fit(Xg)
+        # predict() == -1 equivale a decision_function < 0: se calcula una vez
+        s = modelo.decision_function(Xg)
+        score[inicio:fin] = s
+        anomaly[inicio:fin] = s < 0
+    return len(tramos)
+
+
+def _ajustar_tramos_compartidos(tramos, parametros: dict) -> int:
+    return _ajustar_tramos(tramos, _memoria["X"], _memoria["score"], _memoria["anomaly"], parametros)
+
+
+# =========================================================
+# REPARTO
+# =========================================================
+def _tandas(tramos: list, n_tandas: int) -> list:
+    """
+    Reparte los tramos en n_tandas con carga parecida (mayor primero).
+    """
+    tandas = [[] for _ in range(n_tandas)]
+    carga = np.zeros(n_tandas)
+    for inicio, fin in sorted(tramos, key=lambda t: t[0] - t[1]):
+        i = int(carga.argmin())
+        tandas[i].append((inicio, fin))
+        carga[i] += fin - inicio
+    return [t for t in tandas if t]
+
+
+def _workers(n_jobs: int | None) -> int:
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max((os.cpu_count() or 1) + 1 + n_jobs, 1)
+    return n_jobs
+
+
+def puntuar_por_grupo(
+    X: np.ndarray,
+    grupos: np.ndarray,
+    contamination: float,
+    random_state: int = 42,
+    n_estimators: int = N_ESTIMATORS_GRUPO,
+    n_jobs: int | None = 1,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Un IsolationForest independiente por grupo (producto o categoría).
+
+    - Las filas se ordenan por grupo, así cada grupo es un tramo contiguo.
+    - Con n_jobs > 1 los modelos se ajustan en un ProcessPoolExecutor; X y
+      las salidas viven en memoria compartida y a los workers solo viajan
+      los índices de cada tramo. n_jobs=-1 usa todos los núcleos.
+    - Grupos con menos de MIN_FILAS_GRUPO filas los puntúa un modelo global.
+
+    Devuelve (anomaly_score, anomaly) en el orden original de las filas.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n, n_features = X.shape
+
+    parametros = {
+        "n_estimators": n_estimators,
+        "contamination": contamination,
+        "random_state": random_state,
+    }
+
+    codigos, _ = pd.factorize(np.asarray(grupos), use_na_sentinel=False)
+    orden = np.argsort(codigos, kind="stable")
+    X_ord = np.ascontiguousarray(X[orden])
+
+    limites = np.flatnonzero(np.diff(codigos[orden])) + 1
+    inicios = np.r_[0, limites]
+    fines = np.r_[limites, n]
+    tramos = [(int(i), int(f)) for i, f in zip(inicios, fines) if f - i >= MIN_FILAS_GRUPO]
+
+    workers = min(_workers(n_jobs), max(len(tramos), 1))
+
+    if workers <= 1:
+        score_ord = np.zeros(n)
+        anomaly_ord = np.zeros(n, dtype=np.int8)
+        _ajustar_tramos(tramos, X_ord, score_ord, anomaly_ord, parametros)
+    else:
+        score_ord, anomaly_ord = _ajustar_en_paralelo(X_ord, tramos, parametros, workers)
+
+    # Filas de grupos chicos: modelo global sobre todo el historial
+    cubiertas = np.zeros(n, dtype=bool)
+    for inicio, fin in tramos:
+        cubiertas[inicio:fin] = True
+    if not cubiertas.all():
+        modelo = IsolationForest(**parametros).fit(X_ord)
+        resto = ~cubiertas
+        score_ord[resto] = modelo.decision_function(X_ord[resto])
+        anomaly_ord[resto] = score_ord[resto] < 0
+
+    score = np.empty(n)
+    anomaly = np.empty(n, dtype=np.int8)
+    score[orden] = score_ord
+    anomaly[orden] = anomaly_ord
+    return score, anomaly.astype(int)
+
+
+def _ajustar_en_paralelo(X_ord: np.ndarray, tramos: list, parametros: dict, workers: int):
+    n, n_features = X_ord.shape
+    tamanos = {
+        "X": X_ord.nbytes,
+        "score": n * np.dtype(np.float64).itemsize,
+        "anomaly": n * np.dtype(np.int8).itemsize,
+    }
+    bloques = {clave: shared_memory.SharedMemory(create=True, size=max(tam, 1)) for clave, tam in tamanos.items()}
+
+    try:
+        np.ndarray(X_ord.shape, dtype=np.float64, buffer=bloques["X"].buf)[:] = X_ord
+        nombres = {clave: b.name for clave, b in bloques.items()}
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_adjuntar,
+            initargs=(nombres, n, n_features),
+        ) as pool:
+            tandas = _tandas(tramos, workers * TANDAS_POR_WORKER)
+            for futuro in [pool.submit(_ajustar_tramos_compartidos, t, parametros) for t in tandas]:
+                futuro.result()
+
+        score = np.ndarray((n,), dtype=np.float64, buffer=bloques["score"].buf).copy()
+        anomaly = np.ndarray((n,), dtype=np.int8, buffer=bloques["anomaly"].buf).copy()
+        return score, anomaly
+    finally:
+        for b in bloques.values():
+            b.close()
+            b.unlink()
@@ -0,0 +1,176 @@
+"""
+Benchmark de la etapa de explicación de detectar_movimientos_extranos:
+bucles por fila (implementación anterior) vs reglas vectorizadas.
+
+    python -m src.analytics.benchmark_anomalias --filas 10000 100000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+
+from src.analytics.anomalias import _interpretar_y_accion, _motivos, _preparar_features
+
+
+def historial_sintetico(filas: int, productos: int = 200, seed: int = 0) -> pd.DataFrame:
+    """
+    Historial con el mismo esquema que historial.json.
+    """
+    rng = np.random.default_rng(seed)
+    pid = rng.integers(1, productos + 1, size=filas)
+    inicio = np.datetime64("2025-01-01T00:00:00")
+    segundos = np.sort(rng.integers(0, 365 * 24 * 3600, size=filas))
+
+    return pd.DataFrame({
+        "id": np.arange(1, filas + 1),
+        "datetime": (inicio + segundos.astype("timedelta64[s]")).astype(str),
+        "product_id": pid,
+        "product_name": "producto_" + pd.Series(pid).astype(str),
+        "minimum_stock": 10,
+        "category": "cat_" + pd.Series(pid % 12).astype(str),
+        "price_per_unit": (pid % 50) + 0.5,
+        "quantity": np.maximum(rng.lognormal(2.0, 0.6, size=filas).round(), 1).astype(int),
+        "movement_type": np.where(rng.random(filas) < 0.6, "Salida", "Ingreso"),
+        # Algunos negativos, para comparar también esa rama de la acción sugerida
+        "stock_after": rng.integers(-5, 200, size=filas),
+    })
+
+
+# =========================================================
+# IMPLEMENTACIÓN ANTERIOR (referencia para comparar)
+# =========================================================
+def _interpretar_fila(row: pd.Series) -> tuple[str, str]:
+    prod = str(row.get("product_name", "Producto"))
+    movimiento = str(row.get("movement_type", "")).strip()
+    motivo = str(row.get("motivo", "")).strip()
+    q = row.get("quantity", None)
+    stock_after = row.get("stock_after", None)
+
+    interpretacion = (
+        f"El movimiento de **{prod}** fue marcado como anómalo porque no se parece al patrón histórico. {motivo}"
+    ).strip()
+
+    if movimiento.lower() == "salida":
+        accion = (
+            "Posible causa: venta inusual, merma, ajuste o error de digitación. "
+            "Revisar ticket/factura o control de bodega. "
+            "Si fue error, corregir el registro para evitar quiebre de stock."
+        )
+    else:
+        accion = (
+            "Posible causa: ingreso atípico, compra grande, ajuste o error de digitación. "
+            "Revisar documento de recepción/factura. "
+            "Si fue error, corregir el registro para no inflar inventario."
+        )
+
+    if isinstance(q, (int, float)) and q and q > 0:
+        accion += " Validar unidades y que la cantidad esté en la unidad correcta."
+
+    if isinstance(stock_after, (int, float)) and stock_after is not None:
+        if movimiento.lower() == "salida" and stock_after < 0:
+            accion += " Stock negativo sugiere inconsistencia: revisar histórico y corregir."
+
+    return interpretacion, accion
+
+
+def explicar_con_bucles(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["motivo"] = ""
+
+    for pid, grp in df.groupby("product_id"):
+        cantidades = grp["cantidad"].values
+        if len(cantidades) < 3:
+            continue
+
+        mu = float(np.mean(cantidades))
+        sigma_val = float(np.std(cantidades))
+        sigma = sigma_val if sigma_val > 0 else 1.0
+
+        for i in grp.index:
+            if int(df.at[i, "anomaly"]) == 1:
+                q = float(df.at[i, "cantidad"])
+                tipo = str(df.at[i, "movement_type"]).lower().strip()
+
+                if q > mu + 2 * sigma:
+                    df.at[i, "motivo"] = f"Cantidad inusual vs histórico del producto (q={q:.0f})."
+                elif tipo == "salida" and q > mu + 1.5 * sigma:
+                    df.at[i, "motivo"] = f"Salida inusual vs histórico (q={q:.0f})."
+                else:
+                    df.at[i, "motivo"] = "Patrón inusual detectado por IA."
+
+    df["interpretacion"] = ""
+    df["accion_sugerida"] = ""
+
+    for i in df.index:
+        if int(df.at[i, "anomaly"]) == 1:
+            interp, acc = _interpretar_fila(df.loc[i])
+            df.at[i, "interpretacion"] = interp
+            df.at[i, "accion_sugerida"] = acc
+        else:
+            df.at[i, "interpretacion"] = "Movimiento dentro del patrón esperado."
+            df.at[i, "accion_sugerida"] = "Sin acción."
+
+    return df
+
+
+def explicar_vectorizado(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["motivo"] = _motivos(df)
+    df["interpretacion"], df["accion_sugerida"] = _interpretar_y_accion(df)
+    return df
+
+
+# =========================================================
+# BENCHMARK
+# =========================================================
+def _cronometrar(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def medir(filas: int, con_bucles: bool = True) -> dict:
+    df, X = _preparar_features(historial_sintetico(filas))
+
+    model = IsolationForest(n_estimators=200, contamination=0.15, random_state=42)
+    (_, t_modelo) = _cronometrar(model.fit, X)
+    df["anomaly"] = (model.predict(X) == -1).astype(int)
+    df["anomaly_score"] = model.decision_function(X)
+
+    vect, t_vect = _cronometrar(explicar_vectorizado, df)
+    resultado = {"filas": filas, "modelo_s": t_modelo, "vectorizado_s": t_vect}
+
+    if con_bucles:
+        ref, t_bucles = _cronometrar(explicar_con_bucles, df)
+        resultado["bucles_s"] = t_bucles
+        resultado["speedup"] = t_bucles / max(t_vect, 1e-9)
+        resultado["mismos_motivos"] = bool((ref["motivo"] == vect["motivo"]).all())
+        resultado["mismas_interpretaciones"] = bool((ref["interpretacion"] == vect["interpretacion"]).all())
+        resultado["mismas_acciones"] = bool((ref["accion_sugerida"] == vect["accion_sugerida"]).all())
+
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--sin-bucles", action="store_true", help="No medir la implementación anterior")
+    args = parser.parse_args()
+
+    for filas in args.filas:
+        r = medir(filas, con_bucles=not args.sin_bucles)
+        linea = f"{r['filas']:>9,} filas | modelo {r['modelo_s']:7.2f}s | vectorizado {r['vectorizado_s']:7.3f}s"
+        if "bucles_s" in r:
+            linea += (
+                f" | bucles {r['bucles_s']:8.2f}s | x{r['speedup']:.0f}"
+                f" | motivos iguales: {r['mismos_motivos']}"
+                f" | interpretaciones iguales: {r['mismas_interpretaciones']}"
+                f" | acciones iguales: {r['mismas_acciones']}"
+            )
+        print(linea, flush=True)
+
+
+if __name__ == "__main__":
+    main()
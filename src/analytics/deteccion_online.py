@@ -0,0 +1,231 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from src.analytics.anomalias import FEATURES, MOTIVO_IA, interpretar_movimiento
+from src.analytics.modelo_anomalias import obtener_registro
+from src.backend.estadisticas_online import obtener_estadisticas
+from src.backend.obtener_historial import FORMATO_FECHA
+
+# Sin modelo entrenado: anomalía si q > mu + Z_SIN_MODELO·σ (con al menos MIN_HISTORIA datos)
+Z_SIN_MODELO = 3.0
+MIN_HISTORIA = 8
+
+
+# =========================================================
+# BOSQUE COMPILADO
+# =========================================================
+def _largo_promedio(n: np.ndarray) -> np.ndarray:
+    """
+    c(n) de Isolation Forest: largo promedio de camino en un árbol de n muestras.
+    """
+    n = np.asarray(n, dtype=np.float64)
+    c = np.zeros_like(n)
+    c[n == 2] = 1.0
+    m = n > 2
+    c[m] = 2.0 * (np.log(n[m] - 1.0) + np.euler_gamma) - 2.0 * (n[m] - 1.0) / n[m]
+    return c
+
+
+class BosqueCompilado:
+    """
+    Los árboles de un IsolationForest aplanados en arreglos numpy.
+
+    score_samples de sklearn recorre los árboles uno por uno en Python
+    (~10 ms para 200 árboles aunque sea una fila). Aquí todos los árboles
+    avanzan juntos, un nivel por iteración, y una fila cuesta ~0.1 ms.
+    Da el mismo resultado que IsolationForest.score_samples.
+    """
+
+    def __init__(self, modelo):
+        feature, umbral, izq, der, valor_hoja, raices = [], [], [], [], [], []
+        base = 0
+
+        for arbol, features in zip(modelo.estimators_, modelo.estimators_features_):
+            t = arbol.tree_
+            n_nodos = t.node_count
+
+            # Profundidad de cada nodo (el padre siempre tiene índice menor)
+            profundidad = np.zeros(n_nodos)
+            for nodo in range(n_nodos):
+                for hijo in (t.children_left[nodo], t.children_right[nodo]):
+                    if hijo != -1:
+                        profundidad[hijo] = profundidad[nodo] + 1
+
+            hoja = t.children_left == -1
+            f = np.where(hoja, 0, t.feature)
+            if len(features) != modelo.n_features_in_:
+                f = np.asarray(features)[f]
+
+            feature.append(f)
+            umbral.append(np.where(hoja, np.inf, t.threshold))
+            # Las hojas apuntan a sí mismas: el recorrido se queda quieto al llegar
+            propios = np.arange(n_nodos) + base
+            izq.append(np.where(hoja, propios, t.children_left + base))
+            der.append(np.where(hoja, propios, t.children_right + base))
+            valor_hoja.append(profundidad + _largo_promedio(t.n_node_samples))
+            raices.append(base)
+            base += n_nodos
+
+        self.feature = np.concatenate(feature)
+        self.umbral = np.concatenate(umbral)
+        self.izq = np.concatenate(izq)
+        self.der = np.concatenate(der)
+        self.valor_hoja = np.concatenate(valor_hoja)
+        self.raices = np.asarray(raices)
+        self.max_profundidad = max(a.tree_.max_depth for a in modelo.estimators_)
+        self.normalizador = len(modelo.estimators_) * _largo_promedio([modelo.max_samples_])[0]
+
+    def score_samples(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        filas = np.arange(len(X))[:, None]
+        nodos = np.broadcast_to(self.raices, (len(X), len(self.raices))).copy()
+
+        for _ in range(self.max_profundidad):
+            va_izq = X[filas, self.feature[nodos]] <= self.umbral[nodos]
+            nodos = np.where(va_izq, self.izq[nodos], self.der[nodos])
+
+        profundidad = self.valor_hoja[nodos].sum(axis=1)
+        return -(2.0 ** (-profundidad / self.normalizador))
+
+
+# =========================================================
+# DETECTOR ONLINE
+# =========================================================
+def _features(registros: list[dict]) -> np.ndarray:
+    filas = []
+    for r in registros:
+        ts = datetime.strptime(str(r["datetime"]), FORMATO_FECHA)
+        filas.append([
+            float(r["quantity"]),
+            1.0 if str(r["movement_type"]).lower().strip() == "salida" else 0.0,
+            ts.hour,
+            ts.weekday(),
+        ])
+    return np.asarray(filas, dtype=np.float64).reshape(-1, len(FEATURES))
+
+
+def _motivo(q: float, salida: bool, est: dict | None) -> str:
+    """
+    Mismas reglas que anomalias._motivos, con la media/σ exponenciales del producto.
+    """
+    if est is None or est["n"] < 3:
+        return ""
+    mu = est["media_ew"]
+    sigma = est["desvio_ew"] or 1.0
+    if q > mu + 2 * sigma:
+        return f"Cantidad inusual vs histórico del producto (q={q:.0f})."
+    if salida and q > mu + 1.5 * sigma:
+        return f"Salida inusual vs histórico (q={q:.0f})."
+    return MOTIVO_IA
+
+
+class DetectorOnline:
+    """
+    Puntúa cada movimiento al registrarlo:
+    - el IsolationForest persistido (compilado, ver BosqueCompilado),
+    - media/σ exponenciales del producto (estadisticas_online) para el motivo
+      (y como detector si todavía no hay modelo entrenado).
+
+    Los registros ya están guardados (y sumados a las estadísticas) cuando
+    se puntúan, así las estadísticas incluyen al propio movimiento igual
+    que en Alertas IA.
+    """
+
+    def __init__(self, contamination: float = 0.15):
+        self.contamination = contamination
+        self._bosque = None
+        self._version_modelo = None
+        self._umbral = None
+        self._lock = threading.Lock()
+
+    # ---------- modelo ----------
+    def _cargar_modelo(self):
+        registro = obtener_registro()
+        modelo, meta = registro.modelo_vigente()
+        if modelo is None or meta.get("features") != FEATURES:
+            self._bosque = self._version_modelo = None
+            return
+        if meta["version"] != self._version_modelo:
+            self._bosque = BosqueCompilado(modelo)
+            self._version_modelo = meta["version"]
+            self._umbral = registro.umbral(self.contamination)
+
+    # ---------- API ----------
+    def puntuar(self, registros: list[dict]) -> list[dict]:
+        """
+        Para cada registro recién guardado devuelve
+        {"anomaly", "anomaly_score", "motivo"} (mismo criterio que Alertas IA:
+        anomaly_score < 0 es anómalo).
+        """
+        with self._lock:
+            self._cargar_modelo()
+            estadisticas = obtener_estadisticas()
+
+            X = _features(registros)
+            if self._bosque is not None:
+                scores = self._bosque.score_samples(X) - self._umbral
+            else:
+                scores = None
+
+            resultados = []
+            for i, r in enumerate(registros):
+                est = estadisticas.producto(r["product_id"])
+                q = X[i, 0]
+                salida = X[i, 1] == 1.0
+
+                if scores is not None:
+                    score = float(scores[i])
+                    anomalo = score < 0
+                elif est is not None and est["n"] >= MIN_HISTORIA:
+                    score = float(est["media_ew"] + Z_SIN_MODELO * (est["desvio_ew"] or 1.0) - q)
+                    anomalo = score < 0
+                else:
+                    score, anomalo = 0.0, False
+
+                resultados.append({
+                    "anomaly": int(anomalo),
+                    "anomaly_score": score,
+                    "motivo": (_motivo(q, salida, est) or MOTIVO_IA) if anomalo else "",
+                })
+
+            return resultados
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def obtener_detector() -> DetectorOnline:
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = DetectorOnline()
+    return _detector
+
+
+def anomalias_para_guardar(registros: list[dict], resultados: list[dict]) -> list[dict]:
+    """
+    Registros marcados como anómalos en el formato del histórico de anomalías
+    (mismos campos que guarda la página Alertas IA).
+    """
+    anomalias = []
+    for r, res in zip(registros, resultados):
+        if res["anomaly"] != 1:
+            continue
+        interpretacion, accion = interpretar_movimiento(r, res["motivo"])
+        anomalias.append({
+            "id": r["id"],
+            "Fecha_Hora": r["datetime"],
+            "product_id": r["product_id"],
+            "product_name": r["product_name"],
+            "movement_type": r["movement_type"],
+            "quantity": r["quantity"],
+            "stock_after": r["stock_after"],
+            "anomaly_score": res["anomaly_score"],
+            "motivo": res["motivo"],
+            "interpretacion": interpretacion,
+            "accion_sugerida": accion,
+        })
+    return anomalias
@@ -0,0 +1,294 @@
+import io
+import json
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import IsolationForest
+
+from src.analytics.anomalias import (
+    FEATURES,
+    _interpretar_y_accion,
+    _motivos,
+    _preparar_features,
+    detectar_movimientos_extranos,
+)
+from src.backend.archivos import agregar_bytes, bloqueo_archivo, escribir_atomico, escribir_json_atomico
+from src.backend.estadisticas_online import obtener_estadisticas
+
+MODELOS_DIR = Path("data/modelos")
+
+# Reentrenamiento programado: por antigüedad o por crecimiento del historial
+REENTRENAR_CADA_S = 7 * 24 * 3600
+REENTRENAR_SI_CRECE = 1.0  # +100% de movimientos desde el último entrenamiento
+
+# Drift: proporción de movimientos nuevos bajo el umbral del modelo
+DRIFT_MIN_NUEVOS = 200
+DRIFT_FACTOR = 2.0
+
+# Registro (id de movimiento, score crudo) de tamaño fijo
+SCORE_DTYPE = np.dtype([("id", "<i8"), ("score", "<f8")])
+
+
+def _contamination(contamination: float) -> float:
+    return min(max(contamination, 0.01), 0.4)
+
+
+class RegistroModelo:
+    """
+    IsolationForest persistido en data/modelos/ con su esquema de features.
+
+    - modelo_v<N>.joblib: el modelo entrenado.
+    - entrenamiento_v<N>.npy: scores crudos del set de entrenamiento; el umbral
+      para cualquier sensibilidad (contamination) sale de sus percentiles, así
+      cambiar el slider no obliga a reentrenar.
+    - scores_v<N>.bin: score crudo por id de movimiento (append-only).
+      Solo se puntúan los movimientos que aún no tienen score.
+    - modelo.meta.json: versión vigente, features, fecha y tamaño del entrenamiento.
+      Se escribe al final, así un entrenamiento a medias nunca queda activo.
+    """
+
+    def __init__(self, directorio=MODELOS_DIR, random_state: int = 42):
+        self.dir = Path(directorio)
+        self.meta_path = self.dir / "modelo.meta.json"
+        self.lock_path = self.dir / ".modelo.lock"
+        self.random_state = random_state
+
+        self._meta = None
+        self._firma_meta = None
+        self._modelo = None
+        self._entrenamiento = None
+        self._scores = pd.Series(dtype="float64")
+        self._scores_offset = 0
+        self.ultima_ejecucion = {}
+        self._lock = threading.Lock()
+
+    # ---------- rutas por versión ----------
+    def _ruta(self, nombre: str, version: int, ext: str) -> Path:
+        return self.dir / f"{nombre}_v{version}.{ext}"
+
+    # ---------- carga ----------
+    def _firma(self):
+        try:
+            st = self.meta_path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _cargar(self):
+        """
+        Relee modelo y scores si otro proceso reentrenó; si no,
+        solo agrega los scores que otros procesos escribieron.
+        """
+        firma = self._firma()
+        if firma is None:
+            self._meta = self._modelo = self._entrenamiento = None
+            self._firma_meta = None
+            return
+
+        if firma != self._firma_meta:
+            meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+            version = meta["version"]
+            self._modelo = joblib.load(self._ruta("modelo", version, "joblib"))
+            self._entrenamiento = np.load(self._ruta("entrenamiento", version, "npy"))
+            self._meta = meta
+            self._firma_meta = firma
+            self._scores = pd.Series(dtype="float64")
+            self._scores_offset = 0
+
+        self._leer_scores_nuevos()
+
+    def _leer_scores_nuevos(self):
+        path = self._ruta("scores", self._meta["version"], "bin")
+        if not path.exists():
+            return
+
+        with open(path, "rb") as file:
+            file.seek(self._scores_offset)
+            datos = file.read()
+
+        # Registro incompleto al final (escritura cortada): se ignora
+        completos = len(datos) - len(datos) % SCORE_DTYPE.itemsize
+        if completos == 0:
+            return
+
+        nuevos = np.frombuffer(datos[:completos], dtype=SCORE_DTYPE)
+        self._scores = pd.concat([self._scores, pd.Series(nuevos["score"], index=nuevos["id"])])
+        self._scores = self._scores[~self._scores.index.duplicated(keep="last")]
+        self._scores_offset += completos
+
+    # ---------- entrenamiento ----------
+    def _motivo_reentreno(self, ids: np.ndarray) -> str | None:
+        meta = self._meta
+        if meta is None:
+            return "sin modelo"
+        if meta["features"] != FEATURES or meta["sklearn"] != sklearn.__version__:
+            return "esquema de features distinto"
+        if len(ids) and ids.max() < meta["max_id"]:
+            return "historial reemplazado"
+        if time.time() - meta["entrenado_en"] > REENTRENAR_CADA_S:
+            return "programado (antigüedad)"
+        if len(ids) >= meta["n"] * (1 + REENTRENAR_SI_CRECE):
+            return "programado (crecimiento)"
+        return None
+
+    def _hay_drift(self, ids: np.ndarray, raw: np.ndarray, contamination: float) -> bool:
+        nuevos = ids > self._meta["max_id"]
+        if nuevos.sum() < DRIFT_MIN_NUEVOS:
+            return False
+        tasa = float((raw[nuevos] < self.umbral(contamination)).mean())
+        return tasa > DRIFT_FACTOR * _contamination(contamination)
+
+    def _entrenar(self, ids: np.ndarray, X: pd.DataFrame, motivo: str) -> np.ndarray:
+        # contamination no influye en los árboles: el umbral se calcula aparte
+        modelo = IsolationForest(n_estimators=200, contamination="auto", random_state=self.random_state)
+        modelo.fit(X)
+        raw = modelo.score_samples(X)
+
+        version = (self._meta["version"] + 1) if self._meta else 1
+        anteriores = [self._ruta(n, self._meta["version"], e) for n, e in
+                      (("modelo", "joblib"), ("entrenamiento", "npy"), ("scores", "bin"))] if self._meta else []
+
+        buffer = io.BytesIO()
+        joblib.dump(modelo, buffer)
+        escribir_atomico(self._ruta("modelo", version, "joblib"), buffer.getvalue())
+
+        buffer = io.BytesIO()
+        np.save(buffer, raw)
+        escribir_atomico(self._ruta("entrenamiento", version, "npy"), buffer.getvalue())
+
+        registros = np.empty(len(ids), dtype=SCORE_DTYPE)
+        registros["id"] = ids
+        registros["score"] = raw
+        escribir_atomico(self._ruta("scores", version, "bin"), registros.tobytes())
+
+        meta = {
+            "version": version,
+            "features": FEATURES,
+            "sklearn": sklearn.__version__,
+            "n_estimators": 200,
+            "random_state": self.random_state,
+            "n": int(len(ids)),
+            "max_id": int(ids.max()),
+            "entrenado_en": time.time(),
+            "motivo": motivo,
+        }
+        escribir_json_atomico(self.meta_path, meta)
+
+        for path in anteriores:
+            path.unlink(missing_ok=True)
+
+        self._meta, self._firma_meta = meta, self._firma()
+        self._modelo, self._entrenamiento = modelo, raw
+        self._scores = pd.Series(raw, index=ids)
+        self._scores_offset = len(ids) * SCORE_DTYPE.itemsize
+        return raw
+
+    # ---------- API ----------
+    def umbral(self, contamination: float) -> float:
+        """
+        Score crudo bajo el cual un movimiento es anómalo (mismo criterio
+        que IsolationForest.predict con ese contamination).
+        """
+        return float(np.percentile(self._entrenamiento, 100.0 * _contamination(contamination)))
+
+    def puntuar(self, ids: np.ndarray, X: pd.DataFrame, contamination: float = 0.15, reentrenar: bool = False):
+        """
+        Scores crudos (score_samples) alineados con ids/X.
+        Reutiliza los guardados y puntúa solo los movimientos nuevos;
+        reentrena si se pide, si toca por calendario/crecimiento o si hay drift.
+        Devuelve (scores, umbral).
+        """
+        ids = np.asarray(ids, dtype="int64")
+
+        with self._lock, bloqueo_archivo(self.lock_path):
+            self._cargar()
+
+            motivo = "manual" if reentrenar else self._motivo_reentreno(ids)
+            if motivo:
+                raw = self._entrenar(ids, X, motivo)
+                self.ultima_ejecucion = {"reentreno": motivo, "puntuados": len(ids)}
+                return raw, self.umbral(contamination)
+
+            raw = self._scores.reindex(ids).to_numpy(dtype="float64", copy=True)
+            faltan = np.isnan(raw)
+            if faltan.any():
+                raw[faltan] = self._modelo.score_samples(X[faltan])
+
+                registros = np.empty(int(faltan.sum()), dtype=SCORE_DTYPE)
+                registros["id"] = ids[faltan]
+                registros["score"] = raw[faltan]
+                agregar_bytes(self._ruta("scores", self._meta["version"], "bin"), registros.tobytes())
+                self._leer_scores_nuevos()
+
+            if self._hay_drift(ids, raw, contamination):
+                raw = self._entrenar(ids, X, "drift")
+                self.ultima_ejecucion = {"reentreno": "drift", "puntuados": len(ids)}
+                return raw, self.umbral(contamination)
+
+            self.ultima_ejecucion = {"reentreno": None, "puntuados": int(faltan.sum())}
+            return raw, self.umbral(contamination)
+
+    def modelo_vigente(self):
+        """
+        (modelo, meta) vigentes; solo relee disco si otro proceso reentrenó.
+        (None, {}) si aún no se entrenó.
+        """
+        with self._lock:
+            if self._firma() != self._firma_meta:
+                with bloqueo_archivo(self.lock_path):
+                    self._cargar()
+            return self._modelo, dict(self._meta or {})
+
+    def info(self) -> dict:
+        """
+        Metadatos del modelo vigente (o {} si aún no se entrenó).
+        """
+        return self.modelo_vigente()[1]
+
+
+_registro = None
+_registro_lock = threading.Lock()
+
+
+def obtener_registro() -> RegistroModelo:
+    global _registro
+    with _registro_lock:
+        if _registro is None:
+            _registro = RegistroModelo()
+    return _registro
+
+
+def detectar_con_modelo(
+    df_historial: pd.DataFrame,
+    contamination: float = 0.15,
+    reentrenar: bool = False
+) -> pd.DataFrame:
+    """
+    Mismas columnas que detectar_movimientos_extranos, usando el modelo
+    persistido: solo se puntúan los movimientos nuevos.
+    Sin columna 'id' o con pocos datos se usa detectar_movimientos_extranos.
+    """
+    if df_historial is None or len(df_historial) == 0 or "id" not in df_historial.columns:
+        return detectar_movimientos_extranos(df_historial, contamination=contamination)
+
+    df, X = _preparar_features(df_historial)
+    if len(X) < 8:
+        return detectar_movimientos_extranos(df_historial, contamination=contamination)
+
+    raw, umbral = obtener_registro().puntuar(
+        df["id"].to_numpy(), X, contamination=contamination, reentrenar=reentrenar
+    )
+
+    # Igual que decision_function: > 0 normal, < 0 anómalo
+    score = raw - umbral
+    df["anomaly"] = (score < 0).astype(int)
+    df["anomaly_score"] = score
+
+    df["motivo"] = _motivos(df, obtener_estadisticas().resumen())
+    df["interpretacion"], df["accion_sugerida"] = _interpretar_y_accion(df)
+    return df
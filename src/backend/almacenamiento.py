@@ -0,0 +1,449 @@
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from contextlib import closing
+from pathlib import Path
+
+from src.backend.archivo_anomalias import ANOM_PATH, ArchivoAnomalias, texto_fecha
+from src.backend.archivos import bloqueo_archivo
+from src.backend.historial_journal import obtener_journal
+from src.backend.inventory_store import INVENTARIO_PATH, obtener_inventory_store
+
+LOCK_PATH = Path("data/.inventorix.lock")
+SQLITE_PATH = Path("data/inventorix.db")
+
+# "json" (archivos en data/) o "sqlite" (data/inventorix.db)
+STORAGE_ENV = "INVENTORIX_STORAGE"
+
+COLUMNAS_MOVIMIENTO = [
+    "id", "datetime", "product_id", "product_name", "minimum_stock",
+    "category", "price_per_unit", "movement_type", "quantity",
+    "stock_before", "stock_after",
+]
+
+COLUMNAS_ANOMALIA = [
+    "id", "Fecha_Hora", "product_id", "product_name", "movement_type",
+    "quantity", "stock_after", "anomaly_score", "motivo",
+    "interpretacion", "accion_sugerida",
+]
+
+
+def _filtrar_movimiento(r: dict, desde, hasta, product_id, movement_type) -> bool:
+    if desde is not None and r["datetime"] < desde:
+        return False
+    if hasta is not None and r["datetime"] > hasta:
+        return False
+    if product_id is not None and r["product_id"] != product_id:
+        return False
+    if movement_type is not None and r["movement_type"] != movement_type:
+        return False
+    return True
+
+
+class Almacenamiento(ABC):
+    """
+    Interfaz común de persistencia (inventario, historial y anomalías).
+
+    registrar(planificar): planificar(buscar_producto, siguiente_id) recibe
+    una función de búsqueda por product_id y el próximo id libre, y devuelve
+    (registros, stocks_finales) o un dict {"error": ...}. El backend la
+    ejecuta dentro de su transacción y persiste todo o nada.
+
+    Un backend que no implemente todos los métodos falla al instanciarse.
+    """
+
+    @abstractmethod
+    def producto_por_id(self, product_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def producto_por_nombre(self, nombre: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def registrar(self, planificar):
+        raise NotImplementedError
+
+    @abstractmethod
+    def leer_historial(self, desde=None, hasta=None, product_id=None, movement_type=None) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def leer_historial_incremental(self, cursor=None):
+        """
+        Devuelve (registros, cursor, completo): solo lo nuevo desde 'cursor'
+        si el historial únicamente creció, o todo (completo=True) si no.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def guardar_anomalias(self, registros: list[dict]) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def leer_anomalias(self) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def consultar_anomalias(self, desde=None, hasta=None, product_id=None, limite=None) -> list[dict]:
+        """
+        Anomalías guardadas filtradas por rango de Fecha_Hora y producto,
+        en orden de guardado; con limite, solo las últimas 'limite'.
+        """
+        raise NotImplementedError
+
+
+# =========================================================
+# BACKEND JSON (InventoryStore + journal + archivo de anomalías)
+# =========================================================
+class AlmacenamientoJSON(Almacenamiento):
+    """
+    Las escrituras toman un lock entre procesos (data/.inventorix.lock)
+    y refrescan el estado en memoria antes de validar, así varias
+    estaciones pueden registrar sobre el mismo directorio data/.
+    """
+
+    def __init__(self, anom_path=ANOM_PATH, lock_path=LOCK_PATH):
+        self.lock_path = Path(lock_path)
+        self.anomalias = ArchivoAnomalias(
+            legacy_path=anom_path,
+            archivo_path=Path(anom_path).with_suffix(".jsonl"),
+            indice_path=Path(anom_path).with_suffix(".idx.jsonl"),
+            lock_path=lock_path,
+        )
+
+    def producto_por_id(self, product_id):
+        return obtener_inventory_store().por_id(product_id)
+
+    def producto_por_nombre(self, nombre: str):
+        return obtener_inventory_store().por_nombre(nombre)
+
+    def registrar(self, planificar):
+        store = obtener_inventory_store()
+        journal = obtener_journal()
+
+        with bloqueo_archivo(self.lock_path):
+            store.recargar_si_cambio()
+            journal.refrescar()
+
+            plan = planificar(store.por_id, journal.siguiente_id())
+            if isinstance(plan, dict):
+                return plan
+
+            registros, stocks = plan
+            if not registros:
+                return []
+
+            # Primero el journal (cada registro trae stock_after) y después
+            # el inventario. Si algo falla se quitan del journal los registros
+            # del lote (si llegaron a escribirse) y se descartan los deltas en
+            # memoria: el lote se guarda entero o nada.
+            try:
+                journal.agregar(registros)
+
+                for product_id, stock in stocks.items():
+                    store.aplicar_delta(product_id, stock - store.por_id(product_id)["stock"])
+                store.flush()
+            except BaseException:
+                store.cargar()
+                journal.refrescar()
+                journal.descartar(r["id"] for r in registros)
+                raise
+
+        return registros
+
+    def leer_historial(self, desde=None, hasta=None, product_id=None, movement_type=None) -> list[dict]:
+        registros = obtener_journal().leer()
+        if desde is None and hasta is None and product_id is None and movement_type is None:
+            return registros
+        return [
+            r for r in registros
+            if _filtrar_movimiento(r, desde, hasta, product_id, movement_type)
+        ]
+
+    def leer_historial_incremental(self, cursor=None):
+        return obtener_journal().leer_incremental(cursor)
+
+    def guardar_anomalias(self, registros: list[dict]) -> int:
+        return self.anomalias.guardar(registros)
+
+    def leer_anomalias(self) -> list[dict]:
+        return self.anomalias.leer()
+
+    def consultar_anomalias(self, desde=None, hasta=None, product_id=None, limite=None) -> list[dict]:
+        return self.anomalias.consultar(desde, hasta, product_id, limite)
+
+
+# =========================================================
+# BACKEND SQLITE (WAL, índices por producto/fecha/tipo)
+# =========================================================
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS productos (
+    product_id     INTEGER PRIMARY KEY,
+    name           TEXT NOT NULL,
+    category       TEXT,
+    price          REAL,
+    stock          INTEGER NOT NULL,
+    minimum_stock  INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_productos_name ON productos(name COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS movimientos (
+    id             INTEGER PRIMARY KEY,
+    datetime       TEXT NOT NULL,
+    product_id     INTEGER NOT NULL,
+    product_name   TEXT,
+    minimum_stock  INTEGER,
+    category       TEXT,
+    price_per_unit REAL,
+    movement_type  TEXT NOT NULL,
+    quantity       INTEGER NOT NULL,
+    stock_before   INTEGER,
+    stock_after    INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_movimientos_product_id ON movimientos(product_id);
+CREATE INDEX IF NOT EXISTS idx_movimientos_datetime ON movimientos(datetime);
+CREATE INDEX IF NOT EXISTS idx_movimientos_movement_type ON movimientos(movement_type);
+
+CREATE TABLE IF NOT EXISTS anomalias (
+    anomalia_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    id              INTEGER,
+    Fecha_Hora      TEXT,
+    product_id      INTEGER,
+    product_name    TEXT,
+    movement_type   TEXT,
+    quantity        INTEGER,
+    stock_after     INTEGER,
+    anomaly_score   REAL,
+    motivo          TEXT,
+    interpretacion  TEXT,
+    accion_sugerida TEXT,
+    UNIQUE (product_id, Fecha_Hora, movement_type, quantity)
+);
+CREATE INDEX IF NOT EXISTS idx_anomalias_fecha ON anomalias(Fecha_Hora);
+"""
+
+
+class AlmacenamientoSQLite(Almacenamiento):
+
+    def __init__(self, db_path=SQLITE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with closing(self._conectar()) as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(ESQUEMA_SQLITE)
+
+    def _conectar(self) -> sqlite3.Connection:
+        # Una conexión por operación: Streamlit ejecuta cada sesión en su hilo
+        con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    @staticmethod
+    def _fila(row) -> dict:
+        # Igual que el JSON: las columnas vacías no aparecen en el registro
+        return {k: row[k] for k in row.keys() if row[k] is not None}
+
+    def producto_por_id(self, product_id):
+        with closing(self._conectar()) as con:
+            row = con.execute(
+                "SELECT * FROM productos WHERE product_id = ?", (product_id,)
+            ).fetchone()
+        return self._fila(row) if row else None
+
+    def producto_por_nombre(self, nombre: str):
+        with closing(self._conectar()) as con:
+            row = con.execute(
+                "SELECT * FROM productos WHERE name = ? COLLATE NOCASE", (str(nombre),)
+            ).fetchone()
+        return self._fila(row) if row else None
+
+    def registrar(self, planificar):
+        with closing(self._conectar()) as con:
+            # BEGIN IMMEDIATE: toma el lock de escritura antes de leer el stock
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                def buscar(product_id):
+                    row = con.execute(
+                        "SELECT * FROM productos WHERE product_id = ?", (product_id,)
+                    ).fetchone()
+                    return self._fila(row) if row else None
+
+                siguiente_id = con.execute(
+                    "SELECT COALESCE(MAX(id), 0) + 1 FROM movimientos"
+                ).fetchone()[0]
+
+                plan = planificar(buscar, siguiente_id)
+                if isinstance(plan, dict) or not plan[0]:
+                    con.execute("ROLLBACK")
+                    return plan if isinstance(plan, dict) else []
+
+                registros, stocks = plan
+                con.executemany(
+                    "UPDATE productos SET stock = ? WHERE product_id = ?",
+                    [(stock, product_id) for product_id, stock in stocks.items()],
+                )
+                con.executemany(
+                    f"INSERT INTO movimientos ({', '.join(COLUMNAS_MOVIMIENTO)}) "
+                    f"VALUES ({', '.join('?' * len(COLUMNAS_MOVIMIENTO))})",
+                    [tuple(r.get(c) for c in COLUMNAS_MOVIMIENTO) for r in registros],
+                )
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+
+        return registros
+
+    def leer_historial(self, desde=None, hasta=None, product_id=None, movement_type=None) -> list[dict]:
+        condiciones, params = [], []
+        if desde is not None:
+            condiciones.append("datetime >= ?")
+            params.append(desde)
+        if hasta is not None:
+            condiciones.append("datetime <= ?")
+            params.append(hasta)
+        if product_id is not None:
+            condiciones.append("product_id = ?")
+            params.append(product_id)
+        if movement_type is not None:
+            condiciones.append("movement_type = ?")
+            params.append(movement_type)
+
+        sql = "SELECT * FROM movimientos"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        sql += " ORDER BY id"
+
+        with closing(self._conectar()) as con:
+            return [self._fila(row) for row in con.execute(sql, params)]
+
+    def leer_historial_incremental(self, cursor=None):
+        with closing(self._conectar()) as con:
+            # Transacción de lectura: todas las consultas ven el mismo snapshot
+            con.execute("BEGIN")
+            max_id, total = con.execute(
+                "SELECT COALESCE(MAX(id), 0), COUNT(*) FROM movimientos"
+            ).fetchone()
+            nuevo_cursor = ("sqlite", max_id, total)
+
+            if cursor == nuevo_cursor:
+                return [], cursor, False
+
+            if cursor is not None and cursor[0] == "sqlite":
+                nuevos = con.execute(
+                    "SELECT * FROM movimientos WHERE id > ? ORDER BY id", (cursor[1],)
+                ).fetchall()
+                # Solo se agregaron filas al final: lectura incremental
+                if cursor[2] + len(nuevos) == total:
+                    return [self._fila(row) for row in nuevos], nuevo_cursor, False
+
+            rows = con.execute("SELECT * FROM movimientos ORDER BY id").fetchall()
+        return [self._fila(row) for row in rows], nuevo_cursor, True
+
+    def guardar_anomalias(self, registros: list[dict]) -> int:
+        with closing(self._conectar()) as con:
+            con.execute("BEGIN IMMEDIATE")
+            antes = con.total_changes
+            con.executemany(
+                f"INSERT OR IGNORE INTO anomalias ({', '.join(COLUMNAS_ANOMALIA)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNAS_ANOMALIA))})",
+                [tuple(r.get(c) for c in COLUMNAS_ANOMALIA) for r in registros],
+            )
+            nuevos = con.total_changes - antes
+            con.execute("COMMIT")
+        return nuevos
+
+    def leer_anomalias(self) -> list[dict]:
+        with closing(self._conectar()) as con:
+            rows = con.execute(
+                f"SELECT {', '.join(COLUMNAS_ANOMALIA)} FROM anomalias ORDER BY anomalia_id"
+            ).fetchall()
+        return [self._fila(row) for row in rows]
+
+    def consultar_anomalias(self, desde=None, hasta=None, product_id=None, limite=None) -> list[dict]:
+        condiciones, params = [], []
+        if desde is not None:
+            condiciones.append("Fecha_Hora >= ?")
+            params.append(texto_fecha(desde))
+        if hasta is not None:
+            condiciones.append("Fecha_Hora <= ?")
+            params.append(texto_fecha(hasta, fin_de_dia=True))
+        if product_id is not None:
+            condiciones.append("product_id = ?")
+            params.append(product_id)
+
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        sql = f"SELECT anomalia_id, {', '.join(COLUMNAS_ANOMALIA)} FROM anomalias {where} ORDER BY anomalia_id DESC"
+        if limite is not None:
+            sql += " LIMIT ?"
+            params.append(limite)
+
+        with closing(self._conectar()) as con:
+            rows = con.execute(sql, params).fetchall()
+        return [{k: v for k, v in self._fila(row).items() if k != "anomalia_id"} for row in reversed(rows)]
+
+    def esta_vacio(self) -> bool:
+        with closing(self._conectar()) as con:
+            return con.execute("SELECT COUNT(*) FROM productos").fetchone()[0] == 0
+
+
+# =========================================================
+# IMPORTADOR JSON -> SQLITE
+# =========================================================
+def importar_json_a_sqlite(db_path=SQLITE_PATH, inventario_path=INVENTARIO_PATH, anom_path=ANOM_PATH) -> dict:
+    """
+    Carga inventario, historial (journal o historial.json) y anomalías
+    en la base SQLite. Se puede ejecutar varias veces: no duplica registros
+    ni pisa productos que ya están en la base (su stock allí es el vigente).
+    """
+    destino = AlmacenamientoSQLite(db_path)
+
+    with open(inventario_path, "r", encoding="utf-8") as file:
+        inventario = json.load(file)
+    historial = obtener_journal().leer()
+    anomalias = AlmacenamientoJSON(anom_path).leer_anomalias()
+
+    with closing(destino._conectar()) as con:
+        con.execute("BEGIN IMMEDIATE")
+        con.executemany(
+            "INSERT OR IGNORE INTO productos (product_id, name, category, price, stock, minimum_stock) "
+            "VALUES (:product_id, :name, :category, :price, :stock, :minimum_stock)",
+            inventario,
+        )
+        con.executemany(
+            f"INSERT OR IGNORE INTO movimientos ({', '.join(COLUMNAS_MOVIMIENTO)}) "
+            f"VALUES ({', '.join('?' * len(COLUMNAS_MOVIMIENTO))})",
+            [tuple(r.get(c) for c in COLUMNAS_MOVIMIENTO) for r in historial],
+        )
+        con.execute("COMMIT")
+
+    n_anom = destino.guardar_anomalias(anomalias)
+    return {"productos": len(inventario), "movimientos": len(historial), "anomalias": n_anom}
+
+
+_almacenamiento = None
+
+
+def obtener_almacenamiento() -> Almacenamiento:
+    """
+    Backend configurado con la variable de entorno INVENTORIX_STORAGE.
+    Con "sqlite", la primera vez importa los datos JSON existentes.
+    """
+    global _almacenamiento
+    if _almacenamiento is None:
+        if os.environ.get(STORAGE_ENV, "json").lower() == "sqlite":
+            _almacenamiento = AlmacenamientoSQLite()
+            if _almacenamiento.esta_vacio():
+                importar_json_a_sqlite()
+        else:
+            _almacenamiento = AlmacenamientoJSON()
+    return _almacenamiento
+
+
+if __name__ == "__main__":
+    # python -m src.backend.almacenamiento  -> importa data/*.json a SQLite
+    print(importar_json_a_sqlite())
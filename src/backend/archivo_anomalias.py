@@ -0,0 +1,224 @@
+import json
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+from src.backend.archivos import agregar_bytes, agregar_lineas, bloqueo_archivo, escribir_atomico
+
+ANOM_PATH = Path("data/anomalias.json")
+ARCHIVO_PATH = Path("data/anomalias.jsonl")
+INDICE_PATH = Path("data/anomalias.idx.jsonl")
+LOCK_PATH = Path("data/.inventorix.lock")
+
+
+def clave_anomalia(r: dict) -> tuple:
+    # Evitar duplicados básicos por (product_id, Fecha_Hora, movement, quantity)
+    return (r.get("product_id"), r.get("Fecha_Hora"), r.get("movement_type"), r.get("quantity"))
+
+
+def texto_fecha(valor, fin_de_dia: bool = False):
+    """
+    Normaliza un límite de fecha al formato de Fecha_Hora ("%Y-%m-%d %H:%M:%S"),
+    que se compara como texto. Un date sin hora cubre el día completo.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(valor, date):
+        return f"{valor.isoformat()} {'23:59:59' if fin_de_dia else '00:00:00'}"
+    return str(valor)
+
+
+class ArchivoAnomalias:
+    """
+    Histórico de anomalías append-only con índice de claves persistido.
+
+    - anomalias.jsonl: una anomalía por línea; guardar solo agrega al final.
+    - anomalias.idx.jsonl: por anomalía [product_id, Fecha_Hora, movement_type,
+      quantity, offset, largo]. Con él se descartan duplicados sin leer el
+      archivo y las consultas leen solo las líneas que corresponden.
+    - anomalias.json (formato anterior) se migra una sola vez al primer uso.
+
+    El índice se carga una vez por proceso y después solo se lee lo que
+    otros procesos agregaron, así guardar es O(anomalías nuevas).
+    """
+
+    def __init__(self, legacy_path=ANOM_PATH, archivo_path=ARCHIVO_PATH, indice_path=INDICE_PATH, lock_path=LOCK_PATH):
+        self.legacy_path = Path(legacy_path)
+        self.archivo_path = Path(archivo_path)
+        self.indice_path = Path(indice_path)
+        self.lock_path = Path(lock_path)
+
+        self._claves = set()
+        self._entradas = []  # (Fecha_Hora, product_id, offset, largo) en orden de guardado
+        self._indice_firma = None  # (inode, offset leído)
+        self._lock = threading.Lock()
+
+    # =========================================================
+    # MIGRACIÓN / RECONSTRUCCIÓN
+    # =========================================================
+    def _leer_legacy(self) -> list[dict]:
+        try:
+            datos = json.loads(self.legacy_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return []
+        return datos if isinstance(datos, list) else []
+
+    def _escribir_todo(self, registros: list[dict]):
+        lineas, indice, offset = [], [], 0
+        for r in registros:
+            linea = (json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8")
+            indice.append(list(clave_anomalia(r)) + [offset, len(linea)])
+            lineas.append(linea)
+            offset += len(linea)
+
+        # Primero los datos, después el índice que apunta a ellos
+        escribir_atomico(self.archivo_path, b"".join(lineas))
+        escribir_atomico(self.indice_path, "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in indice))
+
+    def _migrar(self):
+        """
+        Crea archivo + índice desde anomalias.json si aún no existen,
+        o reconstruye el índice si se perdió. Llamar con el lock tomado.
+        """
+        if not self.archivo_path.exists():
+            self._escribir_todo(self._leer_legacy())
+        elif not self.indice_path.exists():
+            self._escribir_todo(self._leer_archivo())
+
+    def _leer_archivo(self) -> list[dict]:
+        registros = []
+        with open(self.archivo_path, "rb") as file:
+            for linea in file:
+                try:
+                    registros.append(json.loads(linea))
+                except ValueError:
+                    # Línea cortada por una escritura interrumpida
+                    continue
+        return registros
+
+    # =========================================================
+    # ÍNDICE EN MEMORIA
+    # =========================================================
+    def _refrescar(self):
+        """
+        Lee del índice solo las entradas nuevas desde la última vez
+        (o todo si el archivo fue reemplazado).
+        """
+        try:
+            st = self.indice_path.stat()
+        except FileNotFoundError:
+            with bloqueo_archivo(self.lock_path):
+                self._migrar()
+            st = self.indice_path.stat()
+
+        if self._indice_firma is None or self._indice_firma[0] != st.st_ino or self._indice_firma[1] > st.st_size:
+            self._claves, self._entradas = set(), []
+            desde = 0
+        else:
+            desde = self._indice_firma[1]
+            if desde == st.st_size:
+                return
+
+        offset = desde
+        with open(self.indice_path, "rb") as file:
+            file.seek(desde)
+            for linea in file:
+                if not linea.endswith(b"\n"):
+                    break
+                offset += len(linea)
+                try:
+                    pid, fecha, mov, qty, inicio, largo = json.loads(linea)
+                except ValueError:
+                    continue
+                self._claves.add((pid, fecha, mov, qty))
+                self._entradas.append((fecha, pid, inicio, largo))
+        self._indice_firma = (st.st_ino, offset)
+
+    @staticmethod
+    def _termina_en_salto(path: Path) -> bool:
+        try:
+            with open(path, "rb") as file:
+                file.seek(0, 2)
+                if file.tell() == 0:
+                    return True
+                file.seek(-1, 2)
+                return file.read(1) == b"\n"
+        except FileNotFoundError:
+            return True
+
+    # =========================================================
+    # API
+    # =========================================================
+    def guardar(self, registros: list[dict]) -> int:
+        """
+        Agrega las anomalías cuya clave no existe todavía.
+        Devuelve cuántas guardó.
+        """
+        with self._lock, bloqueo_archivo(self.lock_path):
+            self._migrar()
+            self._refrescar()
+
+            nuevos, claves = [], set()
+            for r in registros:
+                clave = clave_anomalia(r)
+                if clave in self._claves or clave in claves:
+                    continue
+                claves.add(clave)
+                nuevos.append(r)
+
+            if not nuevos:
+                return 0
+
+            prefijo = b"" if self._termina_en_salto(self.archivo_path) else b"\n"
+            offset = self.archivo_path.stat().st_size + len(prefijo)
+
+            lineas, indice = [], []
+            for r in nuevos:
+                linea = (json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8")
+                indice.append(json.dumps(list(clave_anomalia(r)) + [offset, len(linea)], ensure_ascii=False) + "\n")
+                lineas.append(linea)
+                offset += len(linea)
+
+            agregar_bytes(self.archivo_path, prefijo + b"".join(lineas))
+            prefijo_indice = "" if self._termina_en_salto(self.indice_path) else "\n"
+            agregar_lineas(self.indice_path, prefijo_indice + "".join(indice))
+
+            self._refrescar()
+        return len(nuevos)
+
+    def consultar(self, desde=None, hasta=None, product_id=None, limite: int | None = None) -> list[dict]:
+        """
+        Anomalías guardadas (en orden de guardado) filtradas por rango de
+        Fecha_Hora y producto. Con limite devuelve solo las últimas 'limite'.
+        Solo se leen del archivo las líneas que pasan el filtro.
+        """
+        desde = texto_fecha(desde)
+        hasta = texto_fecha(hasta, fin_de_dia=True)
+
+        with self._lock:
+            self._refrescar()
+            entradas = [
+                (inicio, largo)
+                for fecha, pid, inicio, largo in self._entradas
+                if (desde is None or (fecha is not None and fecha >= desde))
+                and (hasta is None or (fecha is not None and fecha <= hasta))
+                and (product_id is None or pid == product_id)
+            ]
+
+        if limite is not None:
+            entradas = entradas[-limite:] if limite > 0 else []
+
+        registros = []
+        with open(self.archivo_path, "rb") as file:
+            for inicio, largo in entradas:
+                file.seek(inicio)
+                try:
+                    registros.append(json.loads(file.read(largo)))
+                except ValueError:
+                    continue
+        return registros
+
+    def leer(self) -> list[dict]:
+        return self.consultar()
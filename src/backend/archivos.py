@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def escribir_atomico(path, contenido: str | bytes):
+    """
+    Escribe un archivo (texto o bytes) de forma atómica:
+    primero en un temporal del mismo directorio y luego os.replace.
+    Si el proceso muere a mitad, el archivo original queda intacto.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    binario = isinstance(contenido, bytes)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb" if binario else "w", encoding=None if binario else "utf-8") as file:
+            file.write(contenido)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def escribir_json_atomico(path, datos, indent=4):
+    escribir_atomico(path, json.dumps(datos, indent=indent, ensure_ascii=False))
+
+
+def agregar_lineas(path, contenido: str):
+    """
+    Agrega texto al final del archivo y fuerza el fsync.
+    Una línea cortada por un corte de luz la descartan los lectores.
+    """
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(contenido)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def agregar_bytes(path, contenido: bytes):
+    """
+    Igual que agregar_lineas para archivos binarios de registros de
+    tamaño fijo: un registro cortado al final lo descartan los lectores.
+    """
+    with open(path, "ab") as file:
+        file.write(contenido)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+@contextmanager
+def bloqueo_archivo(path):
+    """
+    Lock exclusivo entre procesos (advisory, fcntl.flock) sobre 'path'.
+    Lo usan todas las escrituras read-modify-write de data/, para que
+    varias estaciones de escaneo y el dashboard compartan el directorio.
+    El SO libera el lock si el proceso muere.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(path, "a+b") as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        else:
+            while True:
+                try:
+                    file.seek(0)
+                    msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+            try:
+                yield
+            finally:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,151 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.backend.obtener_historial import obtener_historial_versionado
+
+CLAVES = ["Producto_Tienda", "Categoria_Tienda", "Tipo_de_Movimiento"]
+DIMENSIONES = CLAVES + ["Dia", "Hora"]
+MEDIDAS = ["n", "cantidad", "venta", "valor_inventario", "ultimo_ts", "ultimo_stock", "stock_minimo"]
+
+
+# =========================================================
+# CONSTRUCCIÓN
+# =========================================================
+def df_reporte(df_historial: pd.DataFrame) -> pd.DataFrame:
+    """
+    Columnas del historial renombradas al formato de los reportes.
+    """
+    return pd.DataFrame({
+        "Fecha_Hora": df_historial["datetime"],
+        "Producto_Tienda": df_historial["product_name"],
+        "Categoria_Tienda": df_historial["category"],
+        "Tipo_de_Movimiento": df_historial["movement_type"],
+        "Cantidad": df_historial["quantity"],
+        "Precio_Unitario": df_historial["price_per_unit"],
+        "Stock_Minimo": df_historial["minimum_stock"],
+        "Stock_Real": df_historial["stock_after"],
+    })
+
+
+def construir_cubo(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rollup producto × categoría × tipo × día × hora con:
+    - n, cantidad, venta y valor_inventario (sumas)
+    - ultimo_ts, ultimo_stock, stock_minimo (último movimiento de la celda)
+    """
+    df = df.dropna(subset=["Fecha_Hora"])
+    if df.empty:
+        return pd.DataFrame(columns=DIMENSIONES + MEDIDAS)
+
+    df = df.assign(
+        Dia=df["Fecha_Hora"].dt.normalize(),
+        Hora=df["Fecha_Hora"].dt.hour,
+        venta=np.where(
+            df["Tipo_de_Movimiento"] == "Salida",
+            df["Cantidad"] * df["Precio_Unitario"],
+            0
+        ),
+        valor_inventario=df["Stock_Real"] * df["Precio_Unitario"],
+    )
+
+    sumas = df.groupby(DIMENSIONES, observed=True, sort=False).agg(
+        n=("Cantidad", "size"),
+        cantidad=("Cantidad", "sum"),
+        venta=("venta", "sum"),
+        valor_inventario=("valor_inventario", "sum"),
+    )
+
+    ultimos = (
+        df.sort_values("Fecha_Hora", kind="stable")
+        .groupby(DIMENSIONES, observed=True, sort=False)
+        .tail(1)
+        .set_index(DIMENSIONES)[["Fecha_Hora", "Stock_Real", "Stock_Minimo"]]
+        .rename(columns={
+            "Fecha_Hora": "ultimo_ts",
+            "Stock_Real": "ultimo_stock",
+            "Stock_Minimo": "stock_minimo",
+        })
+    )
+
+    return sumas.join(ultimos).reset_index()
+
+
+def filtrar_cubo(cubo: pd.DataFrame, categorias=None, productos=None, tipos=None) -> pd.DataFrame:
+    if categorias:
+        cubo = cubo[cubo["Categoria_Tienda"].isin(categorias)]
+    if productos:
+        cubo = cubo[cubo["Producto_Tienda"].isin(productos)]
+    if tipos:
+        cubo = cubo[cubo["Tipo_de_Movimiento"].isin(tipos)]
+    return cubo
+
+
+# =========================================================
+# ROLLUPS
+# =========================================================
+def _ultima_celda(cubo: pd.DataFrame, claves) -> pd.DataFrame:
+    return (
+        cubo.sort_values("ultimo_ts", kind="stable")
+        .groupby(claves, observed=True, sort=False)
+        .tail(1)
+        .set_index(claves)
+    )
+
+
+def parciales_desde_cubo(cubo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rollup a (producto, categoría, tipo): los parciales de los KPIs.
+    """
+    if cubo.empty:
+        return pd.DataFrame(columns=CLAVES + ["n", "cantidad", "venta", "ultimo_ts", "ultimo_stock", "stock_minimo"])
+
+    sumas = cubo.groupby(CLAVES, observed=True, sort=False)[["n", "cantidad", "venta"]].sum()
+    ultimos = _ultima_celda(cubo, CLAVES)[["ultimo_ts", "ultimo_stock", "stock_minimo"]]
+    return sumas.join(ultimos).reset_index()
+
+
+def stock_por_producto(cubo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Último stock de cada producto (celda más reciente), ordenado por producto.
+    """
+    df_stock = (
+        _ultima_celda(cubo, ["Producto_Tienda"])
+        .reset_index()
+        .sort_values("Producto_Tienda")
+        .rename(columns={"ultimo_stock": "Stock_Real", "stock_minimo": "Stock_Minimo"})
+    )
+    return df_stock[["Producto_Tienda", "Categoria_Tienda", "Stock_Real", "Stock_Minimo"]]
+
+
+# =========================================================
+# CACHE POR VERSIÓN DE DATOS
+# =========================================================
+_cache = {"cursor": None, "cubo": None}
+_cache_lock = threading.Lock()
+
+
+def obtener_cubo(con_cursor: bool = False):
+    """
+    Cubo del historial completo; se recalcula solo cuando cambia el historial.
+    Con con_cursor=True devuelve (cubo, cursor del almacenamiento).
+    """
+    df, cursor = obtener_historial_versionado()
+    cubo = cubo_de_historial(df, cursor)
+    return (cubo, cursor) if con_cursor else cubo
+
+
+def cubo_de_historial(df: pd.DataFrame, cursor) -> pd.DataFrame:
+    """
+    Cubo de una versión dada del historial (df, cursor), usando el cache
+    si ya se construyó para ese cursor.
+    """
+    with _cache_lock:
+        if _cache["cubo"] is None or _cache["cursor"] != cursor:
+            if len(df) == 0:
+                _cache["cubo"] = pd.DataFrame(columns=DIMENSIONES + MEDIDAS)
+            else:
+                _cache["cubo"] = construir_cubo(df_reporte(df))
+            _cache["cursor"] = cursor
+        return _cache["cubo"]
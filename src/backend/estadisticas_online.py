@@ -0,0 +1,250 @@
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.backend.almacenamiento import obtener_almacenamiento
+from src.backend.obtener_historial import FORMATO_FECHA, obtener_historial_versionado
+
+# Medias exponenciales: un movimiento pesa la mitad después de VIDA_MEDIA movimientos
+VIDA_MEDIA = 20
+ALPHA = 1 - 0.5 ** (1 / VIDA_MEDIA)
+
+# Cuantiles sobre los últimos VENTANA_CUANTILES del reloj del historial
+VENTANA_CUANTILES = timedelta(days=30)
+MAX_VENTANA = 5000
+
+COLUMNAS_RESUMEN = ["product_name", "n", "media", "desvio", "media_ew", "desvio_ew", "consumo_ew"]
+
+
+def _ultimo_ew(df: pd.DataFrame, columna: str) -> pd.Series:
+    """
+    Último valor de la media exponencial de 'columna' por product_id.
+    """
+    if df.empty:
+        return pd.Series(dtype="float64")
+    ew = df.groupby("product_id", sort=False)[columna].ewm(alpha=ALPHA, adjust=False).mean()
+    return ew.groupby(level=0).last()
+
+
+class EstadisticasOnline:
+    """
+    Estadísticas por product_id que se actualizan en O(1) con cada movimiento:
+    - n, media y varianza de la cantidad (Welford),
+    - media y varianza exponenciales (comportamiento reciente),
+    - consumo exponencial: cantidad media reciente de las salidas,
+    - ventana temporal de cantidades para cuantiles.
+
+    Mismo ciclo de vida que AgregadosKPI: se construyen una vez desde el
+    historial y luego se actualizan con cada registro (aplicar) o con lo
+    que otros procesos agregaron (sincronizar), con la misma marca de
+    último id incluido para no sumar dos veces un movimiento.
+    """
+
+    def __init__(self):
+        self._estados = None
+        self._reloj = None
+        self._cursor = None
+        self._ultimo_id = 0
+        self._ids_aplicados = set()
+        self._lock = threading.Lock()
+
+    # ---------- construcción ----------
+    def _reconstruir(self):
+        df, cursor = obtener_historial_versionado()
+        self._estados = {}
+        self._reloj = None
+        self._cursor = cursor
+        self._ultimo_id = int(df["id"].max()) if len(df) else 0
+        self._ids_aplicados = set()
+
+        if len(df) == 0:
+            return
+
+        df = df.sort_values("id", kind="stable")
+        df = df.assign(q=pd.to_numeric(df["quantity"], errors="coerce").fillna(0).astype(float))
+        grupos = df.groupby("product_id", sort=False)
+
+        n = grupos.size()
+        media = grupos["q"].mean()
+        m2 = grupos["q"].var(ddof=0) * n
+
+        # Estado final de la recursión exponencial (ewm adjust=False): var = E_ew[x²] - E_ew[x]²
+        media_ew = _ultimo_ew(df, "q")
+        cuad_ew = _ultimo_ew(df.assign(q=df["q"] ** 2), "q")
+        var_ew = (cuad_ew - media_ew ** 2).clip(lower=0)
+        consumo_ew = _ultimo_ew(df[df["movement_type"].astype(str) == "Salida"], "q")
+        nombres = grupos["product_name"].last()
+
+        ts = df["datetime"]
+        self._reloj = ts.max() if ts.notna().any() else None
+        ventanas = {}
+        if self._reloj is not None:
+            recientes = df[ts >= self._reloj - VENTANA_CUANTILES]
+            recientes = recientes.groupby("product_id", sort=False).tail(MAX_VENTANA)
+            for p, grp in recientes.groupby("product_id", sort=False):
+                ventanas[p] = deque(zip(grp["datetime"].dt.to_pydatetime(), grp["q"]), maxlen=MAX_VENTANA)
+
+        for p in n.index:
+            self._estados[p] = {
+                "product_name": nombres[p],
+                "n": int(n[p]),
+                "media": float(media[p]),
+                "m2": float(m2[p]),
+                "media_ew": float(media_ew[p]),
+                "var_ew": float(var_ew[p]),
+                "consumo_ew": float(consumo_ew[p]) if p in consumo_ew.index else None,
+                "ventana": ventanas.get(p, deque(maxlen=MAX_VENTANA)),
+            }
+
+    # ---------- actualización O(1) ----------
+    def _sumar(self, r: dict):
+        x = float(r["quantity"])
+        e = self._estados.get(r["product_id"])
+        if e is None:
+            e = self._estados[r["product_id"]] = {
+                "product_name": r["product_name"], "n": 0, "media": 0.0, "m2": 0.0,
+                "media_ew": x, "var_ew": 0.0, "consumo_ew": None,
+                "ventana": deque(maxlen=MAX_VENTANA),
+            }
+        e["product_name"] = r["product_name"]
+
+        # Welford
+        e["n"] += 1
+        d = x - e["media"]
+        e["media"] += d / e["n"]
+        e["m2"] += d * (x - e["media"])
+
+        # Exponencial (West): misma recursión que ewm(adjust=False)
+        d = x - e["media_ew"]
+        e["media_ew"] += ALPHA * d
+        e["var_ew"] = (1 - ALPHA) * (e["var_ew"] + ALPHA * d * d)
+
+        if r["movement_type"] == "Salida":
+            c = e["consumo_ew"]
+            e["consumo_ew"] = x if c is None else c + ALPHA * (x - c)
+
+        try:
+            ts = datetime.strptime(str(r["datetime"]), FORMATO_FECHA)
+        except ValueError:
+            return
+        e["ventana"].append((ts, x))
+        if self._reloj is None or ts > self._reloj:
+            self._reloj = ts
+
+    def aplicar(self, registros: list[dict]):
+        """
+        Suma movimientos recién registrados en este proceso.
+        Si las estadísticas aún no se construyeron no hace nada.
+        """
+        with self._lock:
+            if self._estados is None:
+                return
+            for r in registros:
+                if r["id"] <= self._ultimo_id or r["id"] in self._ids_aplicados:
+                    continue
+                self._sumar(r)
+                self._ids_aplicados.add(r["id"])
+
+    def sincronizar(self):
+        """
+        Incorpora movimientos agregados por otros procesos desde la
+        última lectura (o reconstruye si el historial fue reemplazado).
+        """
+        with self._lock:
+            if self._estados is None:
+                self._reconstruir()
+                return
+
+            datos, cursor, completo = obtener_almacenamiento().leer_historial_incremental(self._cursor)
+            if completo:
+                self._reconstruir()
+                return
+
+            for r in datos:
+                if r["id"] > self._ultimo_id and r["id"] not in self._ids_aplicados:
+                    self._sumar(r)
+            self._cursor = cursor
+            if datos:
+                self._ultimo_id = max(self._ultimo_id, max(r["id"] for r in datos))
+                self._ids_aplicados = {i for i in self._ids_aplicados if i > self._ultimo_id}
+
+    # ---------- lectura ----------
+    @staticmethod
+    def _leer(e: dict) -> dict:
+        return {
+            "product_name": e["product_name"],
+            "n": e["n"],
+            "media": e["media"],
+            "desvio": (e["m2"] / e["n"]) ** 0.5 if e["n"] else 0.0,
+            "media_ew": e["media_ew"],
+            "desvio_ew": e["var_ew"] ** 0.5,
+            "consumo_ew": e["consumo_ew"],
+        }
+
+    def producto(self, product_id) -> dict | None:
+        """
+        Estadísticas de un producto (O(1)) o None si no tiene movimientos.
+        """
+        self.sincronizar()
+        with self._lock:
+            e = self._estados.get(product_id)
+            return self._leer(e) if e is not None else None
+
+    def resumen(self) -> pd.DataFrame:
+        """
+        Una fila por product_id con COLUMNAS_RESUMEN (O(productos)).
+        """
+        self.sincronizar()
+        with self._lock:
+            filas = {p: self._leer(e) for p, e in self._estados.items()}
+        return pd.DataFrame.from_dict(filas, orient="index", columns=COLUMNAS_RESUMEN).rename_axis("product_id")
+
+    def consumo_por_nombre(self) -> pd.Series:
+        """
+        Consumo reciente (media exponencial de las salidas) por nombre de producto.
+        """
+        resumen = self.resumen().dropna(subset=["consumo_ew"])
+        return resumen.groupby("product_name")["consumo_ew"].last()
+
+    def cuantiles(self, product_id, qs=(0.5, 0.9, 0.99)) -> dict:
+        """
+        Cuantiles de la cantidad en los últimos VENTANA_CUANTILES (según el
+        movimiento más reciente del historial). {} si no hay datos en la ventana.
+        """
+        self.sincronizar()
+        with self._lock:
+            e = self._estados.get(product_id)
+            if e is None or self._reloj is None:
+                return {}
+            ventana = e["ventana"]
+            while ventana and ventana[0][0] < self._reloj - VENTANA_CUANTILES:
+                ventana.popleft()
+            valores = np.fromiter((x for _, x in ventana), dtype=np.float64, count=len(ventana))
+
+        if len(valores) == 0:
+            return {}
+        return dict(zip(qs, np.quantile(valores, qs).tolist()))
+
+
+_estadisticas = None
+_estadisticas_lock = threading.Lock()
+
+
+def obtener_estadisticas() -> EstadisticasOnline:
+    global _estadisticas
+    with _estadisticas_lock:
+        if _estadisticas is None:
+            _estadisticas = EstadisticasOnline()
+    return _estadisticas
+
+
+def actualizar_estadisticas(registros: list[dict]):
+    """
+    Hook de registrar_movimientos: suma los registros nuevos a las
+    estadísticas del proceso (si ya se construyeron).
+    """
+    if _estadisticas is not None:
+        _estadisticas.aplicar(registros)
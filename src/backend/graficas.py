@@ -4,19 +4,34 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 
-from src.backend.obtener_historial import obtener_historial
+from src.backend.cubo_reportes import (
+    construir_cubo,
+    filtrar_cubo,
+    obtener_cubo,
+    parciales_desde_cubo,
+    stock_por_producto,
+)
+from src.backend.kpis_incrementales import (
+    filtrar_parciales,
+    kpis_desde_parciales,
+    obtener_agregados,
+)
+from src.backend.snapshot_historial import leer_snapshot
+
+COLUMNAS_REPORTE = [
+    "datetime", "product_name", "category", "movement_type",
+    "quantity", "price_per_unit", "minimum_stock", "stock_after",
+]
 
 
 # =========================================================
 # GENERAR DATASET BASE + FIGURAS + KPIS (SIN FILTROS)
 # =========================================================
 def generar_reportes():
-    df_historial = obtener_historial().copy()
+    # Snapshot columnar: solo las columnas del reporte, 'datetime' ya parseado
+    df_historial = leer_snapshot(columnas=COLUMNAS_REPORTE)
 
-    df_historial["Fecha_Hora"] = pd.to_datetime(
-        df_historial["datetime"],
-        errors="coerce"
-    )
+    df_historial["Fecha_Hora"] = df_historial["datetime"]
 
     df = pd.DataFrame({
         "Fecha_Hora": df_historial["Fecha_Hora"],
@@ -31,77 +46,39 @@ def generar_reportes():
 
     df = df.sort_values(by=["Producto_Tienda", "Fecha_Hora"])
 
-    return df, recalcular_figuras(df), recalcular_kpis(df)
+    return df, recalcular_figuras(), recalcular_kpis()
 
 
 # =========================================================
 # RECALCULAR KPIS (CON FILTROS)
 # =========================================================
-def recalcular_kpis(df):
-    df = df.copy()
-
-    df["Total_Venta"] = np.where(
-        df["Tipo_de_Movimiento"] == "Salida",
-        df["Cantidad"] * df["Precio_Unitario"],
-        0
-    )
+def recalcular_kpis(df=None, categorias=None, productos=None, tipos=None):
+    """
+    Sin df: KPIs desde los agregados incrementales por producto/categoría/tipo,
+    filtrados por categorías, productos y tipos de movimiento (sin recorrer filas).
+    Con df: se arma el cubo de ese DataFrame y se combinan sus parciales.
+    """
+    if df is None:
+        return obtener_agregados().kpis(categorias, productos, tipos)
 
-    ventas_totales = df["Total_Venta"].sum()
-    productos_distintos = df["Producto_Tienda"].nunique()
-
-    df_stock = (
-        df.groupby("Producto_Tienda")
-        .tail(1)
-        .copy()
-    )
-
-    df_stock["Estado_Stock"] = np.where(
-        df_stock["Stock_Real"] < df_stock["Stock_Minimo"],
-        "Bajo",
-        "Adecuado"
-    )
-
-    productos_bajo_minimo = (df_stock["Estado_Stock"] == "Bajo").sum()
-    riesgo_pct = productos_bajo_minimo / max(len(df_stock), 1) * 100
-
-    consumo_promedio = (
-        df[df["Tipo_de_Movimiento"] == "Salida"]
-        .groupby("Producto_Tienda")["Cantidad"]
-        .mean()
-    )
-
-    df_stock["Dias_Cobertura"] = df_stock["Stock_Real"] / consumo_promedio
-    productos_criticos = df_stock[df_stock["Dias_Cobertura"] < 3].shape[0]
-
-    return {
-        "ventas_totales": ventas_totales,
-        "productos_distintos": productos_distintos,
-        "productos_bajo_minimo": productos_bajo_minimo,
-        "riesgo_pct": riesgo_pct,
-        "productos_criticos": productos_criticos,
-    }
+    parciales = filtrar_parciales(parciales_desde_cubo(construir_cubo(df)), categorias, productos, tipos)
+    return kpis_desde_parciales(parciales)
 
 
 # =========================================================
 # RECALCULAR FIGURAS (CON FILTROS)
 # =========================================================
-def recalcular_figuras(df):
-    df = df.copy()
-
-    df["Total_Venta"] = np.where(
-        df["Tipo_de_Movimiento"] == "Salida",
-        df["Cantidad"] * df["Precio_Unitario"],
-        0
-    )
-
-    df["Valor_Inventario"] = df["Stock_Real"] * df["Precio_Unitario"]
+def recalcular_figuras(df=None, categorias=None, productos=None, tipos=None):
+    """
+    Figuras desde el cubo producto × categoría × tipo × día × hora:
+    filtrar y agrupar depende de la cantidad de celdas, no de movimientos.
+    Sin df se usa el cubo del historial completo (cacheado por versión).
+    """
+    cubo = obtener_cubo() if df is None else construir_cubo(df)
+    cubo = filtrar_cubo(cubo, categorias, productos, tipos)
 
     # ---------- Stock ----------
-    df_stock = (
-        df.groupby("Producto_Tienda")
-        .tail(1)
-        .copy()
-    )
+    df_stock = stock_por_producto(cubo)
 
     df_stock["Estado_Stock"] = np.where(
         df_stock["Stock_Real"] < df_stock["Stock_Minimo"],
@@ -110,9 +87,14 @@ def recalcular_figuras(df):
     )
 
     # ---------- 1. Ranking ventas ----------
-    ventas = (
-        df.groupby("Producto_Tienda")["Total_Venta"]
+    ventas_producto = (
+        cubo.groupby("Producto_Tienda", observed=True)["venta"]
         .sum()
+        .rename("Total_Venta")
+    )
+
+    ventas = (
+        ventas_producto
         .reset_index()
         .sort_values(by="Total_Venta")
     )
@@ -139,12 +121,10 @@ def recalcular_figuras(df):
     )
 
     # ---------- 3. Heatmap ----------
-    df["Dia_Semana"] = df["Fecha_Hora"].dt.day_name()
-    df["Hora"] = df["Fecha_Hora"].dt.hour
-
     actividad = (
-        df.groupby(["Dia_Semana", "Hora"])
-        .size()
+        cubo.assign(Dia_Semana=cubo["Dia"].dt.day_name())
+        .groupby(["Dia_Semana", "Hora"])["n"]
+        .sum()
         .reset_index(name="Movimientos")
     )
 
@@ -157,16 +137,18 @@ def recalcular_figuras(df):
     )
 
     # ---------- 4. Cuadrante ----------
-    df_scatter = (
-        df.groupby("Producto_Tienda")
-        .agg({
-            "Total_Venta": "sum",
-            "Stock_Real": "last",
-            "Categoria_Tienda": "first"
-        })
-        .reset_index()
+    categoria_producto = (
+        cubo.sort_values(["Dia", "Hora"], kind="stable")
+        .groupby("Producto_Tienda", observed=True)["Categoria_Tienda"]
+        .first()
     )
 
+    df_scatter = pd.DataFrame({
+        "Total_Venta": ventas_producto,
+        "Stock_Real": df_stock.set_index("Producto_Tienda")["Stock_Real"],
+        "Categoria_Tienda": categoria_producto,
+    }).rename_axis("Producto_Tienda").reset_index()
+
     fig4 = px.scatter(
         df_scatter,
         x="Stock_Real",
@@ -178,8 +160,14 @@ def recalcular_figuras(df):
     )
 
     # ---------- 5. Sunburst ----------
+    capital = (
+        cubo.groupby(["Categoria_Tienda", "Producto_Tienda"], observed=True)["valor_inventario"]
+        .sum()
+        .reset_index(name="Valor_Inventario")
+    )
+
     fig5 = px.sunburst(
-        df,
+        capital,
         path=["Categoria_Tienda", "Producto_Tienda"],
         values="Valor_Inventario",
         title="Distribución del Capital en Inventario",
@@ -187,8 +175,7 @@ def recalcular_figuras(df):
 
     # ---------- 6. Pareto ----------
     df_abc = (
-        df.groupby("Producto_Tienda")["Total_Venta"]
-        .sum()
+        ventas_producto
         .reset_index()
         .sort_values(by="Total_Venta", ascending=False)
     )
@@ -0,0 +1,325 @@
+import json
+from pathlib import Path
+
+from src.backend.archivos import agregar_lineas, escribir_atomico, escribir_json_atomico
+
+HISTORIAL_PATH = Path("data/historial.json")
+JOURNAL_PATH = Path("data/historial.jsonl")
+META_PATH = Path("data/historial.meta.json")
+
+# Cada cuántos registros agregados se compacta el journal
+COMPACTAR_CADA = 5000
+
+
+class HistorialJournal:
+    """
+    Historial de movimientos como journal append-only (JSON Lines).
+
+    - Cada movimiento es una línea: agregar es O(1), no reescribe el archivo.
+    - El siguiente id se persiste en un archivo meta (no depende del último registro).
+    - historial.json (formato anterior) se migra una sola vez al primer write
+      y se sigue leyendo mientras el journal no exista.
+    """
+
+    def __init__(
+        self,
+        journal_path=JOURNAL_PATH,
+        legacy_path=HISTORIAL_PATH,
+        meta_path=META_PATH,
+        compactar_cada: int = COMPACTAR_CADA,
+    ):
+        self.journal_path = Path(journal_path)
+        self.legacy_path = Path(legacy_path)
+        self.meta_path = Path(meta_path)
+        self.compactar_cada = compactar_cada
+        self._meta = None
+
+    # =========================================================
+    # META (next_id + offset confirmado del journal)
+    # =========================================================
+    def _cargar_meta(self) -> dict:
+        if self._meta is not None:
+            return self._meta
+
+        try:
+            meta = json.loads(self.meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            meta = None
+
+        if not isinstance(meta, dict):
+            meta = self._reconstruir_meta()
+        else:
+            meta = self._recuperar_cola(meta)
+
+        self._meta = meta
+        return meta
+
+    def refrescar(self):
+        """
+        Descarta el meta en memoria: otro proceso pudo haber agregado
+        registros. Llamar con el lock de datos tomado, antes de siguiente_id().
+        """
+        self._meta = None
+
+    def _guardar_meta(self):
+        escribir_json_atomico(self.meta_path, self._meta, indent=None)
+
+    def _reconstruir_meta(self) -> dict:
+        registros = list(self._leer_journal())
+        return {
+            "next_id": max((r["id"] for r in registros), default=0) + 1,
+            "offset": self._tamano_journal(),
+            "desde_compactacion": 0,
+        }
+
+    def _recuperar_cola(self, meta: dict) -> dict:
+        """
+        Si el proceso murió entre el append y la actualización del meta,
+        el journal tiene registros más allá del offset guardado: los
+        tenemos en cuenta para no repetir ids.
+        """
+        tamano = self._tamano_journal()
+        if tamano <= meta.get("offset", 0):
+            return meta
+
+        for r in self._leer_journal(desde=meta.get("offset", 0)):
+            meta["next_id"] = max(meta["next_id"], r["id"] + 1)
+            meta["desde_compactacion"] = meta.get("desde_compactacion", 0) + 1
+        meta["offset"] = tamano
+        return meta
+
+    def _termina_en_salto(self) -> bool:
+        try:
+            with open(self.journal_path, "rb") as file:
+                file.seek(0, 2)
+                if file.tell() == 0:
+                    return True
+                file.seek(-1, 2)
+                return file.read(1) == b"\n"
+        except FileNotFoundError:
+            return True
+
+    def _tamano_journal(self) -> int:
+        try:
+            return self.journal_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    # =========================================================
+    # MIGRACIÓN (una sola vez desde historial.json)
+    # =========================================================
+    def migrar(self) -> int:
+        """
+        Convierte historial.json a JSON Lines si el journal aún no existe.
+        Devuelve cuántos registros se migraron (0 si ya estaba migrado).
+        """
+        if self.journal_path.exists():
+            return 0
+
+        legacy = self._leer_legacy()
+        escribir_atomico(
+            self.journal_path,
+            "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in legacy),
+        )
+
+        self._meta = {
+            "next_id": max((r["id"] for r in legacy), default=0) + 1,
+            "offset": self._tamano_journal(),
+            "desde_compactacion": 0,
+        }
+        self._guardar_meta()
+        return len(legacy)
+
+    def _leer_legacy(self) -> list[dict]:
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as file:
+                datos = json.load(file)
+        except (OSError, ValueError):
+            return []
+        return datos if isinstance(datos, list) else []
+
+    # =========================================================
+    # ESCRITURA
+    # =========================================================
+    def siguiente_id(self) -> int:
+        self.migrar()
+        return self._cargar_meta()["next_id"]
+
+    def agregar(self, registros: list[dict]):
+        """
+        Agrega registros al final del journal en una sola escritura.
+        Los registros deben traer su 'id' (ver siguiente_id).
+        """
+        if not registros:
+            return
+
+        self.migrar()
+        meta = self._cargar_meta()
+
+        contenido = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in registros)
+        if not self._termina_en_salto():
+            # Cola cortada por un crash: no pegar el registro nuevo a esa línea
+            contenido = "\n" + contenido
+        agregar_lineas(self.journal_path, contenido)
+
+        meta["next_id"] = max(meta["next_id"], max(r["id"] for r in registros) + 1)
+        meta["offset"] = self._tamano_journal()
+        meta["desde_compactacion"] = meta.get("desde_compactacion", 0) + len(registros)
+        self._guardar_meta()
+
+        if meta["desde_compactacion"] >= self.compactar_cada:
+            self.compactar()
+
+    def descartar(self, ids) -> int:
+        """
+        Quita del journal los registros con esos ids (reescritura atómica).
+        Deshace un agregar() cuyo lote no se pudo completar; el meta
+        conserva next_id, así los ids descartados no se reutilizan.
+        Devuelve cuántos registros se quitaron.
+        """
+        ids = set(ids)
+        if not ids or not self.journal_path.exists():
+            return 0
+
+        registros = list(self._leer_journal())
+        quedan = [r for r in registros if r["id"] not in ids]
+        if len(quedan) == len(registros):
+            return 0
+
+        escribir_atomico(
+            self.journal_path,
+            "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in quedan),
+        )
+
+        meta = self._cargar_meta()
+        meta["offset"] = self._tamano_journal()
+        self._guardar_meta()
+        return len(registros) - len(quedan)
+
+    def compactar(self) -> int:
+        """
+        Reescribe el journal de forma atómica eliminando líneas truncadas
+        (escrituras interrumpidas) y registros con id repetido.
+        Devuelve cuántos registros quedaron.
+        """
+        self.migrar()
+
+        vistos = set()
+        registros = []
+        for r in self._leer_journal():
+            if r["id"] in vistos:
+                continue
+            vistos.add(r["id"])
+            registros.append(r)
+
+        escribir_atomico(
+            self.journal_path,
+            "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in registros),
+        )
+
+        meta = self._cargar_meta()
+        meta["offset"] = self._tamano_journal()
+        meta["desde_compactacion"] = 0
+        self._guardar_meta()
+        return len(registros)
+
+    # =========================================================
+    # LECTURA (compatible con historial.json)
+    # =========================================================
+    def _leer_journal(self, desde: int = 0):
+        try:
+            file = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return
+
+        with file:
+            file.seek(desde)
+            for linea in file:
+                linea = linea.strip()
+                if not linea:
+                    continue
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    # Línea incompleta por una escritura interrumpida
+                    continue
+                if isinstance(registro, dict) and "id" in registro:
+                    yield registro
+
+    def leer(self) -> list[dict]:
+        """
+        Devuelve todos los movimientos en orden de registro.
+        Si aún no hay journal, lee historial.json directamente.
+        """
+        if not self.journal_path.exists():
+            return self._leer_legacy()
+        return list(self._leer_journal())
+
+    def leer_incremental(self, cursor=None):
+        """
+        Lectura para caches: devuelve (registros, cursor, completo).
+
+        - Si el journal solo creció desde 'cursor', devuelve únicamente
+          los registros nuevos (completo=False).
+        - Si no cambió, devuelve [] con el mismo cursor.
+        - Si se reemplazó (migración, compactación) o no hay cursor,
+          devuelve todo el historial (completo=True).
+        """
+        try:
+            st = self.journal_path.stat()
+        except FileNotFoundError:
+            try:
+                st = self.legacy_path.stat()
+            except FileNotFoundError:
+                return [], ("vacio",), True
+            firma = ("legacy", st.st_mtime_ns, st.st_size)
+            if cursor == firma:
+                return [], cursor, False
+            return self._leer_legacy(), firma, True
+
+        mismo_archivo = (
+            cursor is not None
+            and cursor[0] == "journal"
+            and cursor[1] == st.st_ino
+            and cursor[2] <= st.st_size
+        )
+        if mismo_archivo and cursor[2] == st.st_size:
+            return [], cursor, False
+
+        desde = cursor[2] if mismo_archivo else 0
+        registros, offset = self._leer_lineas_completas(desde)
+        return registros, ("journal", st.st_ino, offset), not mismo_archivo
+
+    def _leer_lineas_completas(self, desde: int):
+        """
+        Lee desde 'desde' hasta la última línea terminada en salto.
+        Una línea a medio escribir se deja para la próxima lectura.
+        """
+        registros = []
+        offset = desde
+        with open(self.journal_path, "rb") as file:
+            file.seek(desde)
+            for linea in file:
+                if not linea.endswith(b"\n"):
+                    break
+                offset += len(linea)
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    continue
+                if isinstance(registro, dict) and "id" in registro:
+                    registros.append(registro)
+        return registros, offset
+
+
+_journal = None
+
+
+def obtener_journal() -> HistorialJournal:
+    """
+    Journal compartido por el proceso (conserva el meta en memoria).
+    """
+    global _journal
+    if _journal is None:
+        _journal = HistorialJournal()
+    return _journal
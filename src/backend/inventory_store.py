@@ -0,0 +1,101 @@
+import json
+import os
+from pathlib import Path
+
+from src.backend.archivos import escribir_json_atomico
+
+INVENTARIO_PATH = Path("data/inventario.json")
+
+
+class InventoryStore:
+    """
+    Catálogo de inventario en memoria.
+
+    - Se lee de disco una sola vez.
+    - Índices por product_id y por nombre en minúsculas (búsqueda O(1)).
+    - Los cambios de stock se aplican en memoria y se escriben juntos
+      con flush() (archivo temporal + rename, nunca queda a medias).
+    """
+
+    def __init__(self, path=INVENTARIO_PATH):
+        self.path = Path(path)
+        self._productos = []
+        self._por_id = {}
+        self._por_nombre = {}
+        self._pendientes = 0
+        self._firma = None
+        self.cargar()
+
+    def cargar(self):
+        with open(self.path, "r", encoding="utf-8") as file:
+            self._productos = json.load(file)
+
+        self._por_id = {p["product_id"]: p for p in self._productos}
+        self._por_nombre = {p["name"].lower(): p for p in self._productos}
+        self._pendientes = 0
+        self._firma = self._firma_archivo()
+
+    def _firma_archivo(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def recargar_si_cambio(self) -> bool:
+        """
+        Vuelve a leer el catálogo si otro proceso lo reescribió.
+        Llamar con el lock de datos tomado, antes de aplicar deltas.
+        """
+        if self._pendientes or self._firma_archivo() == self._firma:
+            return False
+        self.cargar()
+        return True
+
+    # =========================================================
+    # CONSULTAS
+    # =========================================================
+    def productos(self) -> list[dict]:
+        return self._productos
+
+    def por_id(self, product_id):
+        return self._por_id.get(product_id)
+
+    def por_nombre(self, nombre: str):
+        return self._por_nombre.get(str(nombre).lower())
+
+    # =========================================================
+    # CAMBIOS DE STOCK
+    # =========================================================
+    def aplicar_delta(self, product_id, delta: int) -> dict:
+        """
+        Suma 'delta' al stock del producto (negativo para salidas).
+        No escribe a disco: llamar flush() al terminar el lote.
+        """
+        producto = self._por_id[product_id]
+        producto["stock"] += delta
+        self._pendientes += 1
+        return producto
+
+    def flush(self) -> bool:
+        """
+        Escribe el catálogo a disco si hay cambios pendientes.
+        Devuelve True si escribió.
+        """
+        if not self._pendientes:
+            return False
+
+        escribir_json_atomico(self.path, self._productos, indent=4)
+        self._pendientes = 0
+        self._firma = self._firma_archivo()
+        return True
+
+
+_store = None
+
+
+def obtener_inventory_store() -> InventoryStore:
+    """
+    Store compartido por el proceso (backend y detector de visión).
+    """
+    global _store
+    if _store is None:
+        _store = InventoryStore()
+    return _store
@@ -0,0 +1,209 @@
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from src.backend.almacenamiento import obtener_almacenamiento
+from src.backend.cubo_reportes import CLAVES, cubo_de_historial, parciales_desde_cubo
+from src.backend.estadisticas_online import obtener_estadisticas
+from src.backend.obtener_historial import FORMATO_FECHA, obtener_historial_versionado
+
+MEDIDAS = ["n", "cantidad", "venta", "ultimo_ts", "ultimo_stock", "stock_minimo"]
+
+
+# =========================================================
+# KPIS A PARTIR DE PARCIALES
+# =========================================================
+def kpis_desde_parciales(parciales: pd.DataFrame, consumo: pd.Series | None = None) -> dict:
+    """
+    Mismos KPIs que recalcular_kpis, combinando parciales (O(claves)).
+
+    consumo: unidades por salida por nombre de producto (ej. la media
+    exponencial de estadisticas_online). Sin él, o para productos que no
+    figuran, se usa el promedio histórico de los parciales.
+    """
+    if parciales.empty:
+        return {
+            "ventas_totales": 0,
+            "productos_distintos": 0,
+            "productos_bajo_minimo": 0,
+            "riesgo_pct": 0.0,
+            "productos_criticos": 0,
+        }
+
+    ventas_totales = parciales["venta"].sum()
+    productos_distintos = parciales["Producto_Tienda"].nunique()
+
+    # Último stock por producto = parcial con la fecha más reciente
+    df_stock = (
+        parciales.sort_values("ultimo_ts", kind="stable")
+        .groupby("Producto_Tienda", observed=True)
+        .tail(1)
+        .set_index("Producto_Tienda")
+    )
+
+    bajo = df_stock["ultimo_stock"] < df_stock["stock_minimo"]
+    productos_bajo_minimo = bajo.sum()
+    riesgo_pct = productos_bajo_minimo / max(len(df_stock), 1) * 100
+
+    salidas = (
+        parciales[parciales["Tipo_de_Movimiento"] == "Salida"]
+        .groupby("Producto_Tienda", observed=True)[["cantidad", "n"]]
+        .sum()
+    )
+    consumo_promedio = salidas["cantidad"] / salidas["n"]
+    if consumo is not None:
+        consumo_promedio = consumo.reindex(consumo_promedio.index).fillna(consumo_promedio)
+
+    dias_cobertura = df_stock["ultimo_stock"] / consumo_promedio
+    productos_criticos = int((dias_cobertura < 3).sum())
+
+    return {
+        "ventas_totales": ventas_totales,
+        "productos_distintos": productos_distintos,
+        "productos_bajo_minimo": productos_bajo_minimo,
+        "riesgo_pct": riesgo_pct,
+        "productos_criticos": productos_criticos,
+    }
+
+
+def filtrar_parciales(parciales: pd.DataFrame, categorias=None, productos=None, tipos=None) -> pd.DataFrame:
+    if categorias:
+        parciales = parciales[parciales["Categoria_Tienda"].isin(categorias)]
+    if productos:
+        parciales = parciales[parciales["Producto_Tienda"].isin(productos)]
+    if tipos:
+        parciales = parciales[parciales["Tipo_de_Movimiento"].isin(tipos)]
+    return parciales
+
+
+# =========================================================
+# AGREGADOS INCREMENTALES
+# =========================================================
+class AgregadosKPI:
+    """
+    Parciales por (producto, categoría, tipo de movimiento):
+    cantidad de movimientos, unidades, ventas, último stock y stock mínimo.
+
+    Se construyen una vez desde el historial y luego se actualizan con
+    cada registro (aplicar) o con lo que otros procesos agregaron
+    (sincronizar), sin volver a recorrer todas las filas.
+
+    Los ids del historial son crecientes: _ultimo_id marca hasta dónde
+    ya está incluido el historial leído, y _ids_aplicados guarda solo los
+    registros de aplicar que todavía no llegaron por sincronizar. Así un
+    registro nunca se suma dos veces, llegue primero por una vía o la otra.
+    """
+
+    def __init__(self):
+        self._parciales = None
+        self._cursor = None
+        self._ultimo_id = 0
+        self._ids_aplicados = set()
+        self._lock = threading.Lock()
+
+    def _reconstruir(self):
+        # Punto de partida: rollup del cubo de reportes y último id, los dos
+        # de la misma versión del historial
+        df, cursor = obtener_historial_versionado()
+        parciales = parciales_desde_cubo(cubo_de_historial(df, cursor))
+
+        self._parciales = {
+            tuple(fila[c] for c in CLAVES): [fila[m] for m in MEDIDAS]
+            for fila in parciales.to_dict(orient="records")
+        }
+        self._cursor = cursor
+        self._ultimo_id = int(df["id"].max()) if len(df) else 0
+        self._ids_aplicados = set()
+
+    def _sumar(self, r: dict):
+        try:
+            ts = datetime.strptime(str(r["datetime"]), FORMATO_FECHA)
+        except ValueError:
+            # Igual que el reporte: filas sin fecha válida no cuentan
+            return
+
+        clave = (r["product_name"], r["category"], r["movement_type"])
+        venta = r["quantity"] * r["price_per_unit"] if r["movement_type"] == "Salida" else 0
+
+        p = self._parciales.get(clave)
+        if p is None:
+            self._parciales[clave] = [1, r["quantity"], venta, ts, r["stock_after"], r["minimum_stock"]]
+            return
+
+        p[0] += 1
+        p[1] += r["quantity"]
+        p[2] += venta
+        if ts >= p[3]:
+            p[3], p[4], p[5] = ts, r["stock_after"], r["minimum_stock"]
+
+    def aplicar(self, registros: list[dict]):
+        """
+        Suma movimientos recién registrados en este proceso.
+        Si los agregados aún no se construyeron no hace nada.
+        """
+        with self._lock:
+            if self._parciales is None:
+                return
+            for r in registros:
+                if r["id"] <= self._ultimo_id or r["id"] in self._ids_aplicados:
+                    continue
+                self._sumar(r)
+                self._ids_aplicados.add(r["id"])
+
+    def sincronizar(self):
+        """
+        Incorpora movimientos agregados por otros procesos desde la
+        última lectura (o reconstruye si el historial fue reemplazado).
+        """
+        with self._lock:
+            if self._parciales is None:
+                self._reconstruir()
+                return
+
+            datos, cursor, completo = obtener_almacenamiento().leer_historial_incremental(self._cursor)
+            if completo:
+                self._reconstruir()
+                return
+
+            for r in datos:
+                if r["id"] > self._ultimo_id and r["id"] not in self._ids_aplicados:
+                    self._sumar(r)
+            self._cursor = cursor
+            if datos:
+                self._ultimo_id = max(self._ultimo_id, max(r["id"] for r in datos))
+                self._ids_aplicados = {i for i in self._ids_aplicados if i > self._ultimo_id}
+
+    def parciales(self) -> pd.DataFrame:
+        self.sincronizar()
+        with self._lock:
+            filas = [list(clave) + list(valores) for clave, valores in self._parciales.items()]
+        parciales = pd.DataFrame(filas, columns=CLAVES + MEDIDAS)
+        parciales["ultimo_ts"] = pd.to_datetime(parciales["ultimo_ts"])
+        return parciales
+
+    def kpis(self, categorias=None, productos=None, tipos=None) -> dict:
+        parciales = filtrar_parciales(self.parciales(), categorias, productos, tipos)
+        # Días de cobertura con el consumo reciente de cada producto, no el de todo el historial
+        return kpis_desde_parciales(parciales, consumo=obtener_estadisticas().consumo_por_nombre())
+
+
+_agregados = None
+_agregados_lock = threading.Lock()
+
+
+def obtener_agregados() -> AgregadosKPI:
+    global _agregados
+    with _agregados_lock:
+        if _agregados is None:
+            _agregados = AgregadosKPI()
+    return _agregados
+
+
+def actualizar_kpis(registros: list[dict]):
+    """
+    Hook de registrar_movimientos: suma los registros nuevos a los
+    agregados del proceso (si ya se construyeron).
+    """
+    if _agregados is not None:
+        _agregados.aplicar(registros)
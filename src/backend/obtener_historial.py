@@ -1,14 +1,101 @@
-import json
+import threading
+
 import pandas as pd
 
-def obtener_historial():
-    historial_path = "data/historial.json"
+from src.backend.almacenamiento import obtener_almacenamiento
+
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+COLUMNAS_CATEGORICAS = ["product_name", "category", "movement_type"]
 
-    # Leer historial
-    with open(historial_path, "r") as file:
-        datos = json.load(file)
+# Cache del proceso: DataFrame tipado + cursor del almacenamiento
+_cache = {"cursor": None, "df": None}
+_cache_lock = threading.Lock()
 
-    # Convertir a DataFrame
-    df = pd.DataFrame(datos)
 
+def tipar_historial(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    datetime ya parseado y columnas repetitivas como categóricas,
+    para que reportes y anomalías no vuelvan a convertir strings.
+    """
+    if "datetime" in df.columns:
+        df["datetime"] = pd.to_datetime(df["datetime"], format=FORMATO_FECHA, errors="coerce")
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
     return df
+
+
+def concatenar_historial(df: pd.DataFrame, nuevos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agrega filas nuevas manteniendo las columnas categóricas
+    (pd.concat las volvería object si las categorías difieren).
+    """
+    categoricas = {}
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns and col in nuevos.columns:
+            categoricas[col] = pd.api.types.union_categoricals(
+                [df[col], nuevos[col]], ignore_order=True
+            )
+
+    out = pd.concat([df, nuevos], ignore_index=True)
+    for col, valores in categoricas.items():
+        out[col] = pd.Categorical(valores)
+    return out
+
+
+def _sincronizar():
+    """
+    Pone al día el cache del proceso y devuelve (DataFrame, cursor).
+    En un proceso nuevo arranca desde el snapshot Parquet si existe.
+    """
+    almacenamiento = obtener_almacenamiento()
+
+    with _cache_lock:
+        if _cache["df"] is None:
+            from src.backend.snapshot_historial import cargar_snapshot
+            semilla = cargar_snapshot()
+            if semilla is not None:
+                _cache["df"], _cache["cursor"] = semilla
+
+        datos, cursor, completo = almacenamiento.leer_historial_incremental(_cache["cursor"])
+
+        if completo or _cache["df"] is None:
+            df = tipar_historial(pd.DataFrame(datos))
+        elif datos:
+            df = concatenar_historial(_cache["df"], tipar_historial(pd.DataFrame(datos)))
+        else:
+            df = _cache["df"]
+
+        _cache["cursor"] = cursor
+        _cache["df"] = df
+
+    return df, cursor
+
+
+def obtener_historial(desde=None, hasta=None, product_id=None, movement_type=None):
+    """
+    Historial de movimientos como DataFrame.
+    Los filtros son opcionales (fechas 'YYYY-MM-DD HH:MM:SS'); con SQLite
+    se resuelven en la base sin cargar el historial completo.
+
+    Sin filtros se usa un cache del proceso: si el historial no cambió se
+    devuelve el mismo DataFrame, y si solo creció se leen los registros nuevos.
+    """
+    if desde is not None or hasta is not None or product_id is not None or movement_type is not None:
+        datos = obtener_almacenamiento().leer_historial(
+            desde=desde, hasta=hasta, product_id=product_id, movement_type=movement_type
+        )
+        return tipar_historial(pd.DataFrame(datos))
+
+    df, _ = _sincronizar()
+
+    # Copia para que quien llama pueda modificarla sin tocar el cache
+    return df.copy()
+
+
+def obtener_historial_versionado():
+    """
+    (DataFrame del cache, cursor del almacenamiento).
+    El DataFrame es compartido: solo lectura.
+    """
+    return _sincronizar()
@@ -1,73 +1,122 @@
-import json
 from datetime import datetime
 
+from src.backend.almacenamiento import obtener_almacenamiento
+from src.backend.estadisticas_online import actualizar_estadisticas
+from src.backend.guardar_anomalias import guardar_anomalias_historico
+from src.backend.kpis_incrementales import actualizar_kpis
 
-def registrar_movimiento(product_id, cantidad, tipo_movimiento):
-    inventario_path = "data/inventario.json"
-    historial_path = "data/historial.json"
 
-    # 1. Cargar inventario
-    with open(inventario_path, "r") as file:
-        inventario = json.load(file)
+def registrar_movimiento(product_id, cantidad, tipo_movimiento, puntuar=False):
+    resp = registrar_movimientos([{
+        "product_id": product_id,
+        "cantidad": cantidad,
+        "tipo_movimiento": tipo_movimiento,
+    }], puntuar=puntuar)
 
-    # Buscar producto
-    producto = next((p for p in inventario if p["product_id"] == product_id), None)
+    if isinstance(resp, dict) and resp.get("error"):
+        return {"error": resp["error"]}
 
-    if producto is None:
-        return {"error": "Producto no encontrado"}
+    return resp[0]
 
-    # 🔹 GUARDAR STOCK ANTERIOR
-    stock_anterior = producto["stock"]
 
-    # 2. Actualizar stock
-    if tipo_movimiento.lower() == "entrada":
-        producto["stock"] += cantidad
+def registrar_movimientos(batch, puntuar=False):
+    """
+    Registra varios movimientos de una sola vez (ej. escaneo de un pallet).
 
-    elif tipo_movimiento.lower() == "salida":
-        if producto["stock"] < cantidad:
-            return {"error": "Stock insuficiente para salida"}
-        producto["stock"] -= cantidad
+    batch: lista de dicts con product_id, cantidad y tipo_movimiento.
 
-    else:
-        return {"error": "Tipo de movimiento inválido. Use 'Entrada' o 'Salida'"}
+    Todo o nada: si algún movimiento no es válido (producto inexistente,
+    tipo inválido o stock insuficiente) no se guarda ninguno y se devuelve
+    {"error": ..., "indice": posición del movimiento}.
+    Si todo es válido, el inventario y el historial se escriben una sola vez
+    y se devuelve la lista de registros con ids consecutivos.
 
-    # Guardar nuevo inventario
-    with open(inventario_path, "w") as file:
-        json.dump(inventario, file, indent=4)
+    Con puntuar=True cada registro devuelto trae además anomaly,
+    anomaly_score y motivo (detector online), y los marcados como
+    anómalos se agregan al histórico de anomalías.
+    """
+    def planificar(buscar_producto, nuevo_id):
+        return _planificar_lote(batch, buscar_producto, nuevo_id)
 
-    # 3. Fecha y hora completas
-    fecha_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    resp = obtener_almacenamiento().registrar(planificar)
+
+    if isinstance(resp, list) and resp:
+        # Mantener al día los KPIs y las estadísticas por producto de este proceso
+        actualizar_kpis(resp)
+        actualizar_estadisticas(resp)
 
-    # Cargar historial
-    try:
-        with open(historial_path, "r") as file:
-            historial = json.load(file)
-    except:
-        historial = []
+        if puntuar:
+            _puntuar(resp)
 
-    # Generar ID consecutivo
-    nuevo_id = historial[-1]["id"] + 1 if historial else 1
+    return resp
 
-    nuevo_registro = {
-        "id": nuevo_id,
-        "datetime": fecha_hora,
 
-        "product_id": producto["product_id"],
-        "product_name": producto["name"],
-        "minimum_stock": producto["minimum_stock"],
-        "category": producto["category"],
-        "price_per_unit": producto["price"],
+def _puntuar(registros):
+    # Import diferido: sklearn/modelo solo se cargan si se pide puntuar
+    from src.analytics.deteccion_online import anomalias_para_guardar, obtener_detector
 
-        "movement_type": "Ingreso" if tipo_movimiento.lower() == "entrada" else "Salida",
-        "quantity": cantidad,
+    resultados = obtener_detector().puntuar(registros)
 
-        "stock_before": stock_anterior,
-        "stock_after": producto["stock"]
-    }
+    anomalias = anomalias_para_guardar(registros, resultados)
+    if anomalias:
+        guardar_anomalias_historico(anomalias)
 
-    historial.append(nuevo_registro)
+    for r, res in zip(registros, resultados):
+        r.update(res)
 
-    with open(historial_path, "w") as file:
-        json.dump(historial, file, indent=4)
 
-    return nuevo_registro
+def _planificar_lote(batch, buscar_producto, nuevo_id):
+    """
+    Valida el lote y arma los registros sin tocar el almacenamiento.
+    Devuelve (registros, stock final por product_id) o {"error": ...}.
+    """
+    fecha_hora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    stocks = {}
+    registros = []
+
+    for i, mov in enumerate(batch):
+        product_id = mov["product_id"]
+        cantidad = mov["cantidad"]
+        tipo = str(mov["tipo_movimiento"]).lower()
+
+        producto = buscar_producto(product_id)
+        if producto is None:
+            return {"error": "Producto no encontrado", "indice": i}
+
+        # 🔹 GUARDAR STOCK ANTERIOR (incluye movimientos previos del lote)
+        stock_anterior = stocks.get(product_id, producto["stock"])
+
+        if tipo == "entrada":
+            stock_nuevo = stock_anterior + cantidad
+        elif tipo == "salida":
+            if stock_anterior < cantidad:
+                return {"error": "Stock insuficiente para salida", "indice": i}
+            stock_nuevo = stock_anterior - cantidad
+        else:
+            return {
+                "error": "Tipo de movimiento inválido. Use 'Entrada' o 'Salida'",
+                "indice": i,
+            }
+
+        stocks[product_id] = stock_nuevo
+
+        registros.append({
+            "id": nuevo_id,
+            "datetime": fecha_hora,
+
+            "product_id": producto["product_id"],
+            "product_name": producto["name"],
+            "minimum_stock": producto["minimum_stock"],
+            "category": producto["category"],
+            "price_per_unit": producto["price"],
+
+            "movement_type": "Ingreso" if tipo == "entrada" else "Salida",
+            "quantity": cantidad,
+
+            "stock_before": stock_anterior,
+            "stock_after": stock_nuevo
+        })
+        nuevo_id += 1
+
+    return registros, stocks
@@ -0,0 +1,222 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.backend.almacenamiento import obtener_almacenamiento
+from src.backend.obtener_historial import (
+    concatenar_historial,
+    obtener_historial,
+    obtener_historial_versionado,
+    tipar_historial,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Sin pyarrow se lee el historial normal
+    pa = None
+    pq = None
+
+SNAPSHOT_PATH = Path("data/historial.parquet")
+
+# Cursor del almacenamiento con el que se generó el snapshot
+METADATA_CURSOR = b"inventorix_cursor"
+
+# Filas por row group: las estadísticas min/max por grupo permiten
+# saltar grupos completos al filtrar por fecha o producto
+FILAS_POR_GRUPO = 64_000
+
+
+# =========================================================
+# ESCRITURA
+# =========================================================
+def _abrir_snapshot(path):
+    """
+    Abre el snapshot una sola vez y devuelve (archivo, cursor), o None.
+    El cursor y los datos se leen del mismo archivo abierto: si el hilo
+    de mantenimiento lo reemplaza mientras tanto, se sigue leyendo la
+    versión anterior completa (nunca datos más nuevos que el cursor).
+    """
+    try:
+        fuente = pa.memory_map(str(path))
+    except OSError:
+        return None
+    try:
+        metadata = pq.ParquetFile(fuente).schema_arrow.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        fuente.close()
+        return None
+    valor = metadata.get(METADATA_CURSOR)
+    if not valor:
+        fuente.close()
+        return None
+    return fuente, tuple(json.loads(valor))
+
+
+def _cursor_snapshot(path):
+    abierto = _abrir_snapshot(path)
+    if abierto is None:
+        return None
+    fuente, cursor = abierto
+    fuente.close()
+    return cursor
+
+
+def actualizar_snapshot(path=SNAPSHOT_PATH) -> bool:
+    """
+    Reescribe el snapshot Parquet si el historial cambió.
+    Datetime queda como timestamp y las categóricas con dictionary encoding.
+    Devuelve True si escribió.
+    """
+    if pq is None:
+        return False
+
+    path = Path(path)
+    df, cursor = obtener_historial_versionado()
+    if path.exists() and _cursor_snapshot(path) == tuple(cursor):
+        return False
+
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    tabla = tabla.replace_schema_metadata({
+        **(tabla.schema.metadata or {}),
+        METADATA_CURSOR: json.dumps(list(cursor)).encode(),
+    })
+
+    # Temporal + rename: un lector nunca ve un Parquet a medias
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    os.close(fd)
+    try:
+        pq.write_table(tabla, tmp, row_group_size=FILAS_POR_GRUPO)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return True
+
+
+# =========================================================
+# LECTURA
+# =========================================================
+def cargar_snapshot(path=SNAPSHOT_PATH):
+    """
+    Snapshot completo como (DataFrame, cursor), o None si no hay.
+    Lo usa obtener_historial para arrancar sin parsear el JSON.
+    """
+    path = Path(path)
+    abierto = _abrir_snapshot(path) if pq is not None and path.exists() else None
+    if abierto is None:
+        return None
+
+    fuente, cursor = abierto
+    with fuente:
+        df = pq.read_table(fuente).to_pandas()
+    return df, cursor
+
+
+def _filtros(desde, hasta, product_ids):
+    filtros = []
+    if desde is not None:
+        filtros.append(("datetime", ">=", pd.Timestamp(desde)))
+    if hasta is not None:
+        filtros.append(("datetime", "<=", pd.Timestamp(hasta)))
+    if product_ids is not None:
+        filtros.append(("product_id", "in", list(product_ids)))
+    return filtros or None
+
+
+def _filtrar_df(df: pd.DataFrame, columnas, desde, hasta, product_ids) -> pd.DataFrame:
+    if len(df) == 0:
+        return df
+    if desde is not None:
+        df = df[df["datetime"] >= pd.Timestamp(desde)]
+    if hasta is not None:
+        df = df[df["datetime"] <= pd.Timestamp(hasta)]
+    if product_ids is not None:
+        df = df[df["product_id"].isin(list(product_ids))]
+    if columnas is not None:
+        df = df[[c for c in columnas if c in df.columns]]
+    return df.reset_index(drop=True)
+
+
+def leer_snapshot(columnas=None, desde=None, hasta=None, product_ids=None, path=SNAPSHOT_PATH) -> pd.DataFrame:
+    """
+    Historial tipado para analítica, leído del snapshot Parquet:
+
+    - columnas: solo se leen esas columnas del archivo.
+    - desde / hasta / product_ids: se aplican al leer (row groups que no
+      cumplen no se cargan).
+
+    Los movimientos registrados después del snapshot se agregan al final,
+    así el resultado siempre está al día. Sin snapshot (o sin pyarrow)
+    se usa obtener_historial.
+    """
+    path = Path(path)
+    abierto = _abrir_snapshot(path) if pq is not None and path.exists() else None
+    if abierto is None:
+        return _filtrar_df(obtener_historial(), columnas, desde, hasta, product_ids)
+
+    fuente, cursor = abierto
+    with fuente:
+        datos, _, completo = obtener_almacenamiento().leer_historial_incremental(cursor)
+        if completo:
+            # El historial se reemplazó (compactación, cambio de backend)
+            return _filtrar_df(obtener_historial(), columnas, desde, hasta, product_ids)
+
+        df = pq.read_table(
+            fuente,
+            columns=list(columnas) if columnas is not None else None,
+            filters=_filtros(desde, hasta, product_ids),
+        ).to_pandas()
+
+    if datos:
+        nuevos = _filtrar_df(tipar_historial(pd.DataFrame(datos)), columnas, desde, hasta, product_ids)
+        df = concatenar_historial(df, nuevos)
+
+    return df
+
+
+# =========================================================
+# MANTENIMIENTO EN SEGUNDO PLANO
+# =========================================================
+_hilo = None
+_ultimo_error = None
+
+
+def error_mantenimiento() -> str | None:
+    """
+    Último error del hilo de mantenimiento (None si la última
+    actualización salió bien), para mostrarlo en la UI.
+    """
+    return _ultimo_error
+
+
+def iniciar_mantenimiento(intervalo: float = 30.0, path=SNAPSHOT_PATH):
+    """
+    Hilo daemon que refresca el snapshot cada 'intervalo' segundos
+    (solo escribe si hubo movimientos nuevos). Llamarlo varias veces
+    no crea hilos extra.
+    """
+    global _hilo
+    if pq is None or (_hilo is not None and _hilo.is_alive()):
+        return
+
+    def _loop():
+        global _ultimo_error
+        while True:
+            try:
+                actualizar_snapshot(path)
+                _ultimo_error = None
+            except Exception as e:
+                # Los lectores siguen funcionando con el snapshot anterior
+                _ultimo_error = f"{type(e).__name__}: {e}"
+            time.sleep(intervalo)
+
+    _hilo = threading.Thread(target=_loop, name="snapshot-historial", daemon=True)
+    _hilo.start()
@@ -0,0 +1,169 @@
+"""
+Prueba de estrés del lock entre procesos del almacenamiento JSON:
+N procesos registran lotes a la vez sobre el mismo directorio data/
+(uno temporal, no toca los datos reales) y al final se verifica que
+los ids sean únicos y que el stock final de cada producto sea el
+inicial más todo lo registrado.
+
+    python -m src.backend.stress_bloqueo --procesos 8 --lotes 40
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from src.backend.historial_journal import JOURNAL_PATH
+from src.backend.inventory_store import INVENTARIO_PATH
+
+
+def inventario_sintetico(productos: int) -> list[dict]:
+    return [
+        {
+            "product_id": pid,
+            "name": f"producto_{pid}",
+            "category": f"cat_{pid % 5}",
+            "price": 1.0 + pid,
+            "stock": 1000,
+            "minimum_stock": 10,
+        }
+        for pid in range(1, productos + 1)
+    ]
+
+
+def _escritor(directorio: str, semilla: int, lotes: int, por_lote: int, productos: int, salida):
+    """
+    Proceso escritor: registra 'lotes' lotes de entradas y devuelve por
+    la cola las cantidades que le confirmaron, por product_id.
+    """
+    os.chdir(directorio)
+    from src.backend.registrar_movimiento import registrar_movimientos
+
+    rng = random.Random(semilla)
+    confirmado = Counter()
+    for _ in range(lotes):
+        batch = [
+            {
+                "product_id": rng.randint(1, productos),
+                "cantidad": rng.randint(1, 5),
+                "tipo_movimiento": "Entrada",
+            }
+            for _ in range(por_lote)
+        ]
+        resp = registrar_movimientos(batch)
+        if isinstance(resp, dict):
+            raise RuntimeError(resp["error"])
+        for r in resp:
+            confirmado[r["product_id"]] += r["quantity"]
+    salida.put(dict(confirmado))
+
+
+def verificar(directorio, inventario_inicial: list[dict], confirmado: Counter, esperados: int) -> list[str]:
+    """
+    Lista de inconsistencias (vacía si todo cuadra).
+    """
+    errores = []
+    directorio = Path(directorio)
+
+    registros = []
+    with open(directorio / JOURNAL_PATH, "r", encoding="utf-8") as file:
+        for linea in file:
+            if linea.strip():
+                registros.append(json.loads(linea))
+
+    ids = [r["id"] for r in registros]
+    if len(ids) != esperados:
+        errores.append(f"{len(ids)} registros en el historial, se esperaban {esperados}")
+    if len(set(ids)) != len(ids):
+        errores.append(f"{len(ids) - len(set(ids))} ids repetidos")
+
+    with open(directorio / INVENTARIO_PATH, "r", encoding="utf-8") as file:
+        final = {p["product_id"]: p["stock"] for p in json.load(file)}
+
+    en_historial = Counter()
+    ultimo_stock = {}
+    for r in sorted(registros, key=lambda r: r["id"]):
+        en_historial[r["product_id"]] += r["quantity"]
+        anterior = ultimo_stock.get(r["product_id"])
+        if anterior is not None and r["stock_before"] != anterior:
+            errores.append(f"id {r['id']}: stock_before {r['stock_before']} != {anterior} (actualización perdida)")
+        ultimo_stock[r["product_id"]] = r["stock_after"]
+
+    for p in inventario_inicial:
+        pid = p["product_id"]
+        esperado = p["stock"] + confirmado[pid]
+        if final[pid] != esperado:
+            errores.append(f"producto {pid}: stock {final[pid]}, se esperaba {esperado}")
+        if en_historial[pid] != confirmado[pid]:
+            errores.append(f"producto {pid}: historial suma {en_historial[pid]}, se confirmaron {confirmado[pid]}")
+    return errores
+
+
+def estresar(procesos: int = 8, lotes: int = 40, por_lote: int = 5, productos: int = 10) -> tuple[list[str], dict]:
+    """
+    Corre la prueba en un directorio temporal y devuelve (errores, resumen).
+    """
+    with tempfile.TemporaryDirectory(prefix="inventorix_stress_") as directorio:
+        inventario = inventario_sintetico(productos)
+        ruta = Path(directorio) / INVENTARIO_PATH
+        ruta.parent.mkdir(parents=True)
+        ruta.write_text(json.dumps(inventario, indent=4), encoding="utf-8")
+
+        # spawn: cada escritor arranca sin los singletons de este proceso
+        ctx = multiprocessing.get_context("spawn")
+        salida = ctx.Queue()
+        escritores = [
+            ctx.Process(target=_escritor, args=(directorio, semilla, lotes, por_lote, productos, salida))
+            for semilla in range(procesos)
+        ]
+
+        t0 = time.perf_counter()
+        for p in escritores:
+            p.start()
+        confirmado = Counter()
+        for _ in escritores:
+            confirmado.update(salida.get())
+        for p in escritores:
+            p.join()
+        segundos = time.perf_counter() - t0
+
+        errores = [f"el proceso {i} terminó con código {p.exitcode}" for i, p in enumerate(escritores) if p.exitcode]
+        errores += verificar(directorio, inventario, confirmado, procesos * lotes * por_lote)
+
+    resumen = {
+        "procesos": procesos,
+        "lotes": procesos * lotes,
+        "movimientos": procesos * lotes * por_lote,
+        "segundos": segundos,
+        "lotes_por_segundo": procesos * lotes / segundos,
+    }
+    return errores, resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estrés del lock de data/ con varios procesos escritores.")
+    parser.add_argument("--procesos", type=int, default=8)
+    parser.add_argument("--lotes", type=int, default=40, help="Lotes por proceso.")
+    parser.add_argument("--por-lote", type=int, default=5, help="Movimientos por lote.")
+    parser.add_argument("--productos", type=int, default=10)
+    args = parser.parse_args()
+
+    errores, r = estresar(args.procesos, args.lotes, args.por_lote, args.productos)
+    print(
+        f"{r['procesos']} procesos · {r['lotes']} lotes · {r['movimientos']} movimientos "
+        f"en {r['segundos']:.1f} s ({r['lotes_por_segundo']:.0f} lotes/s)"
+    )
+    for error in errores:
+        print(f"FALLA: {error}")
+    if not errores:
+        print("OK: ids únicos y stock final exacto")
+    sys.exit(1 if errores else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import os, sys
-import json
-from pathlib import Path
+from datetime import datetime
 
 import streamlit as st
 import pandas as pd
@@ -11,11 +10,16 @@ if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
 from src.vision.detectar_producto import detectar_producto
-from src.backend.registrar_movimiento import registrar_movimiento
-from src.backend.obtener_historial import obtener_historial
+from src.vision.servicio_escaneo import ClienteEscaneo
+from src.vision.vision_model import obtener_modelo
+from src.backend.registrar_movimiento import registrar_movimientos
+from src.backend.snapshot_historial import error_mantenimiento, leer_snapshot, iniciar_mantenimiento
 from src.backend.graficas import generar_reportes, recalcular_figuras, recalcular_kpis
+from src.backend.cubo_reportes import obtener_cubo, filtrar_cubo
+from src.backend.guardar_anomalias import guardar_anomalias_historico, consultar_anomalias_historico
 
-from src.analytics.anomalias import detectar_movimientos_extranos, resumen_anomalias
+from src.analytics.anomalias import resumen_anomalias
+from src.analytics.modelo_anomalias import detectar_con_modelo, obtener_registro
 
 from src.frontend.styles import inject_corporate_css
 from src.frontend.ui_components import (
@@ -28,41 +32,8 @@ from src.frontend.ui_components import (
 st.set_page_config(page_title="Inventorix AI", page_icon="📦", layout="wide")
 inject_corporate_css()
 
-ANOM_PATH = Path("data/anomalias.json")
-
-
-def guardar_anomalias_historico(registros_anomalias: list[dict]) -> int:
-    """
-    Guarda anomalías en data/anomalias.json evitando duplicados simples.
-    """
-    ANOM_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    if ANOM_PATH.exists():
-        try:
-            prev = json.loads(ANOM_PATH.read_text(encoding="utf-8"))
-            if not isinstance(prev, list):
-                prev = []
-        except Exception:
-            prev = []
-    else:
-        prev = []
-
-    seen = set()
-    for x in prev:
-        key = (x.get("product_id"), x.get("Fecha_Hora"), x.get("movement_type"), x.get("quantity"))
-        seen.add(key)
-
-    nuevos = []
-    for r in registros_anomalias:
-        key = (r.get("product_id"), r.get("Fecha_Hora"), r.get("movement_type"), r.get("quantity"))
-        if key in seen:
-            continue
-        nuevos.append(r)
-
-    merged = prev + nuevos
-    ANOM_PATH.write_text(json.dumps(merged, indent=2, ensure_ascii=False), encoding="utf-8")
-    return len(nuevos)
-
+# Snapshot Parquet del historial, refrescado en segundo plano
+iniciar_mantenimiento()
 
 # -------------------- STATE --------------------
 if "page" not in st.session_state:
@@ -80,6 +51,9 @@ if "escaneo_en_progreso" not in st.session_state:
 if "ultimo_registro" not in st.session_state:
     st.session_state.ultimo_registro = None
 
+if "ultimos_registros" not in st.session_state:
+    st.session_state.ultimos_registros = []
+
 # --- Fix del diálogo de guardado (para que NO bloquee el guardado) ---
 if "show_save_dialog" not in st.session_state:
     st.session_state.show_save_dialog = False
@@ -152,6 +126,8 @@ with st.sidebar:
     st.caption("Estado")
     st.write("Escaneo:", "🟢" if st.session_state.escaneo_en_progreso else "⚪")
     st.write("Registro:", "🟢" if st.session_state.registro_en_progreso else "⚪")
+    if error_mantenimiento():
+        st.caption(f"⚠️ Snapshot del historial: {error_mantenimiento()}")
 
 
 # -------------------- HEADER --------------------
@@ -276,11 +252,68 @@ elif st.session_state.page == "Escaneo":
     st.markdown("## 🎥 Escaneo y registro")
     st.info(
         "1) Presiona **Iniciar escaneo (YOLO)**\n"
-        "2) Se abrirá una **ventana nueva** con la cámara\n"
+        "2) Se abrirá la cámara (en esta página si el servicio de escaneo está activo, si no en una **ventana nueva**)\n"
         "3) Selecciona **Entrada / Salida** en la ventana\n"
         "4) El registro se guardará automáticamente\n"
     )
 
+    # Servicio de escaneo headless (python -m src.vision.servicio_escaneo):
+    # si está corriendo, la cámara se ve y se confirma en esta página sin
+    # bloquear la app; si no, se usa la ventana de escaneo local.
+    cliente_escaneo = ClienteEscaneo()
+    servicio_activo = cliente_escaneo.disponible()
+
+    if servicio_activo:
+        estado_modelo = cliente_escaneo.estado().get("modelo") or {}
+        st.caption("🟢 Servicio de escaneo conectado")
+    else:
+        # El modelo YOLO queda residente en el proceso: se carga y calienta
+        # en segundo plano la primera vez y los escaneos siguientes lo reutilizan
+        modelo_vision = obtener_modelo()
+        modelo_vision.cargar_en_segundo_plano()
+        estado_modelo = modelo_vision.estado()
+
+    if estado_modelo.get("error"):
+        st.caption(f"⚠️ Modelo YOLO: {estado_modelo['error']}")
+    elif estado_modelo.get("listo"):
+        latencia = estado_modelo["latencia_ms"] or estado_modelo["warmup_ms"]
+        st.caption(f"🟢 Modelo YOLO listo · {latencia:.0f} ms por frame")
+    else:
+        st.caption("🟡 Cargando modelo YOLO...")
+
+    def registrar_resultado_escaneo(resultado):
+        if not resultado:
+            st.warning("Escaneo cancelado o sin detección válida.")
+            return
+
+        # Todos los productos detectados se registran juntos (todo o nada)
+        resp = registrar_movimientos([
+            {
+                "product_id": int(r["producto"]["product_id"]),
+                "cantidad": int(r["cantidad"]),
+                "tipo_movimiento": r["tipo"],
+            }
+            for r in resultado
+        ], puntuar=True)
+
+        if isinstance(resp, dict) and resp.get("error"):
+            prod = resultado[resp.get("indice", 0)]["producto"]
+            st.error(f"{resp['error']} ({prod.get('name')}). No se guardó ningún movimiento.")
+            return
+
+        st.session_state.ultimo_registro = resp[-1]
+        st.session_state.ultimos_registros = resp
+        toast_ok(
+            "Registro guardado correctamente"
+            if len(resp) == 1
+            else f"{len(resp)} registros guardados correctamente"
+        )
+
+        # Detector online: los marcados ya quedaron en el histórico de anomalías
+        for r in resp:
+            if r.get("anomaly") == 1:
+                st.toast(f"⚠️ {r['product_name']}: {r['motivo']}")
+
     st.write("")
     topA, topB, topC = st.columns([1.1, 1.1, 1])
 
@@ -308,13 +341,24 @@ elif st.session_state.page == "Escaneo":
 
     # -------------------- CANCELAR --------------------
     if cancelar:
+        if servicio_activo:
+            try:
+                cliente_escaneo.cancelar()
+            except (OSError, RuntimeError):
+                pass
         st.session_state.escaneo_en_progreso = False
         st.session_state.ultimo_registro = None
+        st.session_state.ultimos_registros = []
         toast_ok("Escaneo cancelado.")
         st.rerun()
 
     # -------------------- INICIAR ESCANEO --------------------
-    if iniciar:
+    if iniciar and servicio_activo:
+        cliente_escaneo.iniciar()
+        st.session_state.escaneo_en_progreso = True
+        st.rerun()
+
+    if iniciar and not servicio_activo:
         st.session_state.escaneo_en_progreso = True
         st.info(
             "Se abrirá una ventana nueva.\n"
@@ -325,27 +369,65 @@ elif st.session_state.page == "Escaneo":
         resultado = detectar_producto()
 
         st.session_state.escaneo_en_progreso = False
+        registrar_resultado_escaneo(resultado)
+        st.rerun()
 
-        if resultado is None:
-            st.warning("Escaneo cancelado o sin detección válida.")
-        else:
-            prod = resultado["producto"]
-            cantidad = resultado["cantidad"]
-            tipo = resultado["tipo"]
-
-            resp = registrar_movimiento(
-                product_id=int(prod["product_id"]),
-                cantidad=int(cantidad),
-                tipo_movimiento=tipo
-            )
+    # -------------------- ESCANEO EN EL SERVICIO --------------------
+    # Solo este bloque se vuelve a ejecutar cada medio segundo (vista + conteo)
+    if servicio_activo and st.session_state.escaneo_en_progreso:
+
+        @st.fragment(run_every=0.5)
+        def _vista_escaneo():
+            try:
+                estado = cliente_escaneo.estado()
+                preview = cliente_escaneo.preview()
+            except (OSError, RuntimeError):
+                st.warning("Se perdió la conexión con el servicio de escaneo.")
+                return
+
+            if not estado["escaneando"]:
+                st.info("No hay un escaneo en curso. Presiona **Cancelar** para volver a empezar.")
+                return
+
+            colV, colP = st.columns([2, 1])
+            with colV:
+                if preview:
+                    st.image(preview, use_container_width=True)
+                else:
+                    st.caption("Esperando la primera imagen...")
+
+            with colP:
+                st.markdown("#### 📦 Conteo detectado")
+                conteo = estado["conteo"]
+                if conteo:
+                    st.markdown("\n".join(f"- **{k}**: {v}" for k, v in conteo.items()))
+                else:
+                    st.write("Esperando detección...")
+
+                m = estado.get("metricas") or {}
+                mapeo = estado.get("mapeo") or {}
+                st.caption(
+                    f"FPS: {m.get('fps', 0):.1f} · Inferencia: {m.get('latencia_ms', 0):.0f} ms · "
+                    f"Sin producto: {100 * mapeo.get('tasa_sin_mapear', 0):.0f}%"
+                )
 
-            if isinstance(resp, dict) and resp.get("error"):
-                st.error(resp["error"])
-            else:
-                st.session_state.ultimo_registro = resp
-                toast_ok("Registro guardado correctamente")
+                tipo = None
+                if st.button("⬆ Entrada", disabled=not conteo, use_container_width=True, key="escaneo_entrada"):
+                    tipo = "entrada"
+                if st.button("⬇ Salida", disabled=not conteo, use_container_width=True, key="escaneo_salida"):
+                    tipo = "salida"
 
-        st.rerun()
+            if tipo:
+                try:
+                    resultado = cliente_escaneo.confirmar(tipo)
+                except (OSError, RuntimeError) as e:
+                    st.error(f"No se pudo confirmar el escaneo: {e}")
+                    return
+                st.session_state.escaneo_en_progreso = False
+                registrar_resultado_escaneo(resultado)
+                st.rerun()
+
+        _vista_escaneo()
 
     # =====================================================
     # CONFIRMACIÓN VISUAL – TARJETA DE REGISTRO GUARDADO
@@ -370,6 +452,15 @@ elif st.session_state.page == "Escaneo":
             """
         )
 
+        if len(st.session_state.ultimos_registros) > 1:
+            st.markdown("#### 📦 Productos registrados en el escaneo")
+            st.dataframe(
+                pd.DataFrame(st.session_state.ultimos_registros)[
+                    ["product_name", "movement_type", "quantity", "stock_before", "stock_after"]
+                ],
+                use_container_width=True
+            )
+
 
 # =========================================================
 # PAGE: REPORTES (Dashboard BI)
@@ -410,7 +501,7 @@ elif st.session_state.page == "Reportes":
 
         # ---------- SI YA HAY DATOS ----------
         if st.session_state.df_reportes is not None:
-            df_rep = st.session_state.df_reportes.copy()
+            df_rep = st.session_state.df_reportes
             figs = st.session_state.figs
             kpis = st.session_state.kpis
 
@@ -434,35 +525,31 @@ elif st.session_state.page == "Reportes":
             # ===============================
             st.markdown("### 🎛️ Filtros")
 
+            # Cubo de reportes (se recalcula solo si cambió el historial)
+            cubo = obtener_cubo()
+
             f1, f2, f3 = st.columns(3)
             with f1:
                 categoria = st.multiselect(
                     "Categoría",
-                    sorted(df_rep["Categoria_Tienda"].unique())
+                    sorted(cubo["Categoria_Tienda"].unique())
                 )
             with f2:
                 producto = st.multiselect(
                     "Producto",
-                    sorted(df_rep["Producto_Tienda"].unique())
+                    sorted(cubo["Producto_Tienda"].unique())
                 )
             with f3:
                 tipo = st.multiselect(
                     "Movimiento",
-                    sorted(df_rep["Tipo_de_Movimiento"].unique())
+                    sorted(cubo["Tipo_de_Movimiento"].unique())
                 )
 
-            # ---------- APLICAR FILTROS ----------
-            df_filtrado = df_rep.copy()
-
-            if categoria:
-                df_filtrado = df_filtrado[df_filtrado["Categoria_Tienda"].isin(categoria)]
-            if producto:
-                df_filtrado = df_filtrado[df_filtrado["Producto_Tienda"].isin(producto)]
-            if tipo:
-                df_filtrado = df_filtrado[df_filtrado["Tipo_de_Movimiento"].isin(tipo)]
+            # ---------- APLICAR FILTROS (sobre el cubo, no sobre filas) ----------
+            cubo_filtrado = filtrar_cubo(cubo, categoria, producto, tipo)
 
             # ---------- DATASET VACÍO ----------
-            if df_filtrado.empty:
+            if cubo_filtrado.empty:
                 st.warning("⚠️ No hay datos para los filtros seleccionados.")
                 st.stop()
 
@@ -471,7 +558,11 @@ elif st.session_state.page == "Reportes":
             # ===============================
             st.markdown("### 📈 Análisis Principal")
 
-            figs_filtradas = recalcular_figuras(df_filtrado)
+            figs_filtradas = recalcular_figuras(
+                categorias=categoria,
+                productos=producto,
+                tipos=tipo
+            )
 
             c1, c2 = st.columns(2)
             with c1:
@@ -501,7 +592,11 @@ elif st.session_state.page == "Reportes":
             # ===============================
             # ALERTAS ANALITICAS
             # ===============================
-            kpis_filtrados = recalcular_kpis(df_filtrado)
+            kpis_filtrados = recalcular_kpis(
+                categorias=categoria,
+                productos=producto,
+                tipos=tipo
+            )
 
             if kpis_filtrados["productos_criticos"] > 0:
                 st.warning(
@@ -511,7 +606,15 @@ elif st.session_state.page == "Reportes":
             # ===============================
             # DATASET
             # ===============================
-            with st.expander("📄 Ver dataset completo"):
+            # Las filas solo se filtran si se pide ver el dataset
+            if st.toggle("📄 Ver dataset completo"):
+                df_filtrado = df_rep
+                if categoria:
+                    df_filtrado = df_filtrado[df_filtrado["Categoria_Tienda"].isin(categoria)]
+                if producto:
+                    df_filtrado = df_filtrado[df_filtrado["Producto_Tienda"].isin(producto)]
+                if tipo:
+                    df_filtrado = df_filtrado[df_filtrado["Tipo_de_Movimiento"].isin(tipo)]
                 st.dataframe(df_filtrado, use_container_width=True)
 
 # =========================================================
@@ -552,6 +655,11 @@ elif st.session_state.page == "Alertas IA":
                 step=0.01,
                 help="Más alto = detecta más anomalías. Recomendado 0.10–0.20"
             )
+            reentrenar = st.checkbox(
+                "Reentrenar modelo",
+                value=False,
+                help="El modelo guardado se reentrena solo (cada semana, si el historial se duplica o si detecta drift)."
+            )
 
         with top[1]:
             st.write("")
@@ -575,16 +683,18 @@ elif st.session_state.page == "Alertas IA":
         st.divider()
 
         if ejecutar:
-            df_hist = obtener_historial()
+            df_hist = leer_snapshot()
 
             if df_hist is None or len(df_hist) == 0:
                 st.info("No existe historial suficiente para analizar.")
             else:
                 st.session_state.anom_last_contamination = contamination
 
-                df_anom = detectar_movimientos_extranos(
+                # Modelo persistido: solo se puntúan los movimientos nuevos
+                df_anom = detectar_con_modelo(
                     df_historial=df_hist,
-                    contamination=contamination
+                    contamination=contamination,
+                    reentrenar=reentrenar
                 )
                 st.session_state.df_anom = df_anom
 
@@ -598,6 +708,17 @@ elif st.session_state.page == "Alertas IA":
             k2.metric("Anomalías detectadas", kpi["anomalias"])
             k3.metric("% Anomalías", f"{kpi['porcentaje']:.1f}%")
 
+            registro = obtener_registro()
+            info_modelo = registro.info()
+            if info_modelo:
+                ejecucion = registro.ultima_ejecucion
+                entrenado = datetime.fromtimestamp(info_modelo["entrenado_en"]).strftime("%Y-%m-%d %H:%M")
+                st.caption(
+                    f"Modelo v{info_modelo['version']} entrenado el {entrenado} con {info_modelo['n']} movimientos"
+                    + (f" · reentrenado ({ejecucion['reentreno']})" if ejecucion.get("reentreno") else "")
+                    + f" · puntuados en esta ejecución: {ejecucion.get('puntuados', 0)}"
+                )
+
             st.divider()
 
             # -------------------------
@@ -663,17 +784,21 @@ elif st.session_state.page == "Alertas IA":
                 campos = [c for c in campos if c in registros.columns]
                 payload = registros[campos].to_dict(orient="records")
 
-                if st.button("Guardar anomalías detectadas en data/anomalias.json"):
+                if st.button("Guardar anomalías detectadas en el histórico"):
                     n = guardar_anomalias_historico(payload)
                     st.success(f"Se guardaron {n} anomalías nuevas en el histórico.")
 
-                if ANOM_PATH.exists():
-                    with st.expander("Ver histórico guardado (data/anomalias.json)"):
-                        try:
-                            hist = json.loads(ANOM_PATH.read_text(encoding="utf-8"))
-                            st.dataframe(pd.DataFrame(hist), use_container_width=True)
-                        except Exception:
-                            st.error("No se pudo leer el histórico de anomalías.")
+                with st.expander("Ver histórico guardado de anomalías"):
+                    # Consulta por índice: solo se leen las anomalías del rango
+                    rango = st.date_input("Rango de fechas", value=(), key="anom_hist_rango")
+                    desde, hasta = (rango[0], rango[-1]) if rango else (None, None)
+                    hist = consultar_anomalias_historico(desde=desde, hasta=hasta, limite=500)
+                    if hist:
+                        st.dataframe(pd.DataFrame(hist), use_container_width=True)
+                        if len(hist) == 500:
+                            st.caption("Se muestran las últimas 500 anomalías del rango.")
+                    else:
+                        st.info("No hay anomalías guardadas en el rango.")
 
             # -------------------------
             # Historial completo
@@ -0,0 +1,108 @@
+# adaptativo.py
+import time
+
+import cv2
+import numpy as np
+
+# Resolución (ancho, alto) a la que se comparan frames para detectar movimiento
+TAMANO_MOVIMIENTO = (160, 120)
+
+# Un píxel "cambió" si su gris varía más que UMBRAL_PIXEL (0-255)...
+UMBRAL_PIXEL = 25
+# ...y hay movimiento si cambió más de FRACCION_MOVIMIENTO de la imagen
+FRACCION_MOVIMIENTO = 0.01
+
+# Aunque la escena esté quieta se infiere al menos cada REFRESCO_MAX segundos
+REFRESCO_MAX = 2.0
+
+# Límites del tick (s) y margen sobre la latencia medida del modelo
+TICK_MIN = 0.03
+TICK_MAX = 0.5
+MARGEN_TICK = 1.2
+
+
+class DetectorMovimiento:
+    """
+    Decide si vale la pena correr el modelo: compara el frame (en gris y
+    reducido a TAMANO_MOVIMIENTO) contra el último frame que SÍ se infirió.
+    Comparar contra el último inferido (y no contra el anterior) hace que
+    un cambio lento también termine disparando la inferencia.
+    """
+
+    def __init__(self, umbral_pixel=UMBRAL_PIXEL, fraccion=FRACCION_MOVIMIENTO, refresco_max=REFRESCO_MAX):
+        self.umbral_pixel = umbral_pixel
+        self.fraccion = fraccion
+        self.refresco_max = refresco_max
+
+        ancho, alto = TAMANO_MOVIMIENTO
+        self._chico = np.empty((alto, ancho, 3), dtype=np.uint8)
+        self._gris = np.empty((alto, ancho), dtype=np.uint8)
+        self._diferencia = np.empty((alto, ancho), dtype=np.uint8)
+        self._referencia = None
+        self._ultima_inferencia = 0.0
+
+    def hay_movimiento(self, frame: np.ndarray) -> bool:
+        cv2.resize(frame, TAMANO_MOVIMIENTO, dst=self._chico, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._chico, cv2.COLOR_BGR2GRAY, dst=self._gris)
+
+        if self._referencia is None or time.perf_counter() - self._ultima_inferencia > self.refresco_max:
+            return True
+
+        cv2.absdiff(self._gris, self._referencia, dst=self._diferencia)
+        cambiados = np.count_nonzero(self._diferencia > self.umbral_pixel)
+        return cambiados > self.fraccion * self._diferencia.size
+
+    def marcar_inferido(self):
+        """
+        El frame recién evaluado se infirió: pasa a ser la referencia.
+        """
+        if self._referencia is None:
+            self._referencia = self._gris.copy()
+        else:
+            self._referencia[:] = self._gris
+        self._ultima_inferencia = time.perf_counter()
+
+    def reiniciar(self):
+        self._referencia = None
+
+
+class TickAdaptativo:
+    """
+    Intervalo entre inferencias: MARGEN_TICK × latencia reciente del
+    modelo, entre TICK_MIN y TICK_MAX. Si el modelo no da abasto el tick
+    se alarga solo (en lugar de encolar trabajo) y vuelve a acortarse
+    cuando la latencia baja.
+    """
+
+    def __init__(self, minimo=TICK_MIN, maximo=TICK_MAX, alpha=0.2):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.alpha = alpha
+        self._latencia = None
+
+    def registrar(self, latencia: float):
+        if self._latencia is None:
+            self._latencia = latencia
+        else:
+            self._latencia += self.alpha * (latencia - self._latencia)
+
+    def intervalo(self) -> float:
+        if self._latencia is None:
+            return self.minimo
+        return min(max(self._latencia * MARGEN_TICK, self.minimo), self.maximo)
+
+
+def recortar_roi(frame: np.ndarray, roi):
+    """
+    Recorte (vista, sin copiar) de roi=(x, y, ancho, alto) acotado al
+    frame, y su desplazamiento (x, y). Sin roi devuelve el frame entero.
+    """
+    if roi is None:
+        return frame, (0, 0)
+    x, y, w, h = (int(v) for v in roi)
+    alto, ancho = frame.shape[:2]
+    x0, y0 = min(max(x, 0), ancho - 1), min(max(y, 0), alto - 1)
+    # El borde derecho/inferior es el del roi (no x0 + w): con x o y
+    # negativos el recorte se acota en vez de desplazarse
+    x1, y1 = min(max(x + w, x0 + 1), ancho), min(max(y + h, y0 + 1), alto)
+    return frame[y0:y1, x0:x1], (x0, y0)
@@ -0,0 +1,258 @@
+# benchmark_vision.py
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from src.vision.detectar_producto import DetectorProducto
+from src.vision.fuentes import FuenteImagenes, FuenteVideo
+from src.vision.render import dibujar_cajas
+from src.vision.vision_model import BACKENDS, MODELO_PATH, ModeloResidente
+
+ETAPAS = ("captura", "inferencia", "plot", "total")
+
+
+def fuente_replay(ruta):
+    """
+    Fuente que recorre una sola vez una carpeta de imágenes o un video,
+    sin limitar el ritmo (cada frame se procesa apenas se termina el anterior).
+    """
+    ruta = Path(ruta)
+    if ruta.is_dir():
+        return FuenteImagenes(ruta)
+    if ruta.is_file():
+        return FuenteVideo(ruta, repetir=False)
+    raise ValueError(f"No existe {ruta}")
+
+
+def cargar_frames(ruta, max_frames: int = 200) -> list[np.ndarray]:
+    """
+    Frames grabados en memoria: de una carpeta de imágenes (p. ej. capturas/)
+    o de un archivo de video. Así se mide solo la inferencia, sin cámara.
+    """
+    fuente = fuente_replay(ruta)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = fuente.read()
+        if not ret:
+            break
+        frames.append(frame)
+    fuente.release()
+
+    if not frames:
+        raise ValueError(f"No hay frames legibles en {ruta}")
+    return frames
+
+
+def percentiles_ms(tiempos: list[float]) -> dict:
+    ms = 1000 * np.asarray(tiempos)
+    return {
+        "media": float(ms.mean()),
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+    }
+
+
+# =========================================================
+# BACKENDS (solo inferencia, frames en memoria)
+# =========================================================
+def medir_backend(frames: list, backend: str, int8: bool = False, rondas: int = 3, conf: float = 0.4, ruta=MODELO_PATH) -> dict:
+    """
+    Latencia por frame (ms) y FPS de un backend sobre los frames dados.
+    La carga/exportación y el warm-up se informan aparte.
+    """
+    alto, ancho = frames[0].shape[:2]
+    modelo = ModeloResidente(ruta, resolucion=(alto, ancho), backend=backend, int8=int8)
+    modelo.cargar()
+
+    tiempos = []
+    for _ in range(rondas):
+        for frame in frames:
+            t0 = time.perf_counter()
+            modelo(frame, conf=conf)
+            tiempos.append(time.perf_counter() - t0)
+
+    return {
+        "backend": backend + (" int8" if int8 else ""),
+        "carga_ms": modelo.carga_ms,
+        "warmup_ms": modelo.warmup_ms,
+        "fps": len(tiempos) / sum(tiempos),
+        **percentiles_ms(tiempos),
+    }
+
+
+def comando_backends(args):
+    frames = cargar_frames(args.frames, args.max_frames)
+    print(f"{len(frames)} frames de {args.frames} · {args.rondas} rondas")
+
+    variantes = [(b, False) for b in args.backends]
+    if args.int8:
+        variantes += [(b, True) for b in args.backends if b != "pytorch"]
+
+    print(f"{'backend':<14}{'carga ms':>10}{'warmup ms':>11}{'media':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'FPS':>8}")
+    for backend, int8 in variantes:
+        try:
+            r = medir_backend(frames, backend, int8, args.rondas, ruta=args.modelo)
+        except Exception as e:
+            print(f"{backend + (' int8' if int8 else ''):<14} no disponible: {e}")
+            continue
+        print(
+            f"{r['backend']:<14}{r['carga_ms']:>10.0f}{r['warmup_ms']:>11.0f}"
+            f"{r['media']:>9.1f}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}{r['fps']:>8.1f}"
+        )
+    return 0
+
+
+# =========================================================
+# REPLAY (detector completo sobre frames grabados)
+# =========================================================
+def leer_etiquetas(path) -> dict:
+    """
+    {"<archivo de imagen o número de frame>": {"producto": cantidad, ...}}
+    """
+    datos = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {str(clave): {str(k).lower(): int(v) for k, v in conteo.items()} for clave, conteo in datos.items()}
+
+
+def replay(ruta, etiquetas: dict | None = None, max_frames: int | None = None, modelo=None, **opciones) -> dict:
+    """
+    Pasa cada frame de 'ruta' por DetectorProducto y mide por frame:
+    captura (leer de la fuente), inferencia (procesar: modelo + mapeo +
+    conteo), plot (dibujar las cajas sobre una copia a resolución de
+    origen) y total. Con etiquetas compara el conteo de cada frame
+    etiquetado contra el esperado.
+    """
+    detector = DetectorProducto(cam_index=fuente_replay(ruta), modelo=modelo, **opciones)
+    tiempos = {etapa: [] for etapa in ETAPAS}
+    errores, exactos, contado, esperado = [], 0, 0, 0
+
+    try:
+        while max_frames is None or len(tiempos["total"]) < max_frames:
+            t0 = time.perf_counter()
+            frame = detector.capturar()
+            t1 = time.perf_counter()
+            if frame is None:
+                break
+            detector.procesar(frame, anotar=False)
+            t2 = time.perf_counter()
+            dibujar_cajas(frame.copy(), *detector.detecciones, detector.model.names)
+            t3 = time.perf_counter()
+
+            for etapa, t in zip(ETAPAS, (t1 - t0, t2 - t1, t3 - t2, t3 - t0)):
+                tiempos[etapa].append(t)
+
+            clave = detector.cap.clave
+            if etiquetas and clave in etiquetas:
+                obtenido = Counter({k.lower(): v for k, v in detector.conteo.items()})
+                objetivo = Counter(etiquetas[clave])
+                error = sum(abs(obtenido[k] - objetivo[k]) for k in set(obtenido) | set(objetivo))
+                errores.append(error)
+                exactos += error == 0
+                contado += sum(obtenido.values())
+                esperado += sum(objetivo.values())
+    finally:
+        detector.liberar()
+
+    if not tiempos["total"]:
+        raise ValueError(f"No hay frames legibles en {ruta}")
+
+    resultado = {
+        "frames": len(tiempos["total"]),
+        "fps": len(tiempos["total"]) / sum(tiempos["total"]),
+        **{etapa: percentiles_ms(valores) for etapa, valores in tiempos.items()},
+        "mapeo": detector.metricas_mapeo(),
+    }
+    if errores:
+        resultado["precision"] = {
+            "frames_etiquetados": len(errores),
+            "exactitud": exactos / len(errores),
+            "error_medio": float(np.mean(errores)),
+            "contado": contado,
+            "esperado": esperado,
+        }
+    return resultado
+
+
+def comando_replay(args):
+    etiquetas = leer_etiquetas(args.etiquetas) if args.etiquetas else None
+    modelo = ModeloResidente(args.modelo, backend=args.backend, int8=args.int8)
+    # Carga y warm-up fuera de la medición
+    modelo.cargar()
+
+    r = replay(
+        args.fuente, etiquetas, args.max_frames, modelo,
+        conf=args.conf, imgsz=args.imgsz,
+        seguimiento=args.seguimiento, movimiento=args.movimiento,
+    )
+
+    print(f"{r['frames']} frames de {args.fuente} · {modelo.estado()['backend']} · {r['fps']:.1f} FPS")
+    print(f"{'etapa (ms)':<12}{'media':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for etapa in ETAPAS:
+        e = r[etapa]
+        print(f"{etapa:<12}{e['media']:>9.1f}{e['p50']:>9.1f}{e['p95']:>9.1f}{e['p99']:>9.1f}")
+    if r["mapeo"]:
+        print(f"Detecciones sin producto: {100 * r['mapeo']['tasa_sin_mapear']:.1f}%")
+
+    p = r.get("precision")
+    if p:
+        print(
+            f"Conteo: {p['exactitud']:.1%} de frames exactos ({p['frames_etiquetados']} etiquetados) · "
+            f"error medio {p['error_medio']:.2f} por frame · {p['contado']} contados / {p['esperado']} esperados"
+        )
+    elif etiquetas:
+        print("Ningún frame de la fuente aparece en el archivo de etiquetas.")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(r, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    # Umbrales: código de salida 1 si no se cumplen (uso como gate de regresión)
+    fallas = []
+    if args.max_p95_ms is not None and r["total"]["p95"] > args.max_p95_ms:
+        fallas.append(f"p95 total {r['total']['p95']:.1f} ms > {args.max_p95_ms} ms")
+    if args.min_exactitud is not None and (p is None or p["exactitud"] < args.min_exactitud):
+        fallas.append(f"exactitud {p['exactitud'] if p else 0:.1%} < {args.min_exactitud:.1%}")
+    for falla in fallas:
+        print(f"FALLA: {falla}")
+    return 1 if fallas else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del detector sin cámara, sobre frames grabados.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("backends", help="Latencia y FPS de la inferencia por backend.")
+    p.add_argument("--frames", default="capturas", help="Carpeta de imágenes o archivo de video.")
+    p.add_argument("--modelo", default=MODELO_PATH)
+    p.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    p.add_argument("--int8", action="store_true", help="Agregar también las variantes INT8 de onnx/openvino.")
+    p.add_argument("--rondas", type=int, default=3)
+    p.add_argument("--max-frames", type=int, default=200)
+    p.set_defaults(funcion=comando_backends)
+
+    p = sub.add_parser("replay", help="DetectorProducto completo: latencias por etapa, FPS y precisión del conteo.")
+    p.add_argument("--fuente", default="capturas", help="Carpeta de imágenes o archivo de video.")
+    p.add_argument("--etiquetas", help='JSON {"archivo o n° de frame": {"producto": cantidad}}.')
+    p.add_argument("--modelo", default=MODELO_PATH)
+    p.add_argument("--backend", choices=BACKENDS)
+    p.add_argument("--int8", action="store_true")
+    p.add_argument("--imgsz", type=int)
+    p.add_argument("--conf", type=float, default=0.4)
+    p.add_argument("--seguimiento", action="store_true", help="Conteo con tracker + voto (para videos).")
+    p.add_argument("--movimiento", action="store_true", help="Saltar la inferencia en frames sin movimiento.")
+    p.add_argument("--max-frames", type=int)
+    p.add_argument("--json", help="Guardar el resultado completo en este archivo.")
+    p.add_argument("--max-p95-ms", type=float, help="Falla si el p95 total supera este valor.")
+    p.add_argument("--min-exactitud", type=float, help="Falla si la fracción de frames exactos es menor (0-1).")
+    p.set_defaults(funcion=comando_replay)
+
+    args = parser.parse_args()
+    sys.exit(args.funcion(args))
+
+
+if __name__ == "__main__":
+    main()
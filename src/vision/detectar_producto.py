@@ -1,58 +1,212 @@
 # detectar_producto.py
 import cv2
-import json
+import numpy as np
+import threading
 from collections import Counter
-from ultralytics import YOLO
+
+from src.backend.almacenamiento import obtener_almacenamiento
+from src.vision.adaptativo import DetectorMovimiento, recortar_roi
+from src.vision.fuentes import abrir_fuente
+from src.vision.mapeo_catalogo import MapeoCatalogo
+from src.vision.render import dibujar_cajas
+from src.vision.seguimiento import SeguimientoConteo
+from src.vision.vision_model import obtener_modelo
+
+
+def detecciones_de(result):
+    """
+    (cajas xyxy (n, 4), class_ids (n,), confianzas (n,)) de un resultado
+    de YOLO como arreglos numpy.
+    """
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 4)), np.zeros(0, dtype=np.int64), np.zeros(0)
+    boxes = boxes.cpu().numpy()
+    return boxes.xyxy, boxes.cls.astype(np.int64), boxes.conf
+
+
+def resultados_de_conteo(store, conteo_productos, tipo_movimiento) -> list[dict]:
+    """
+    Un resultado por producto del conteo (product_id → cantidad).
+    """
+    resultados = []
+    for product_id, cantidad in conteo_productos.items():
+        producto = store.producto_por_id(product_id)
+        if producto is not None:
+            resultados.append({
+                "producto": dict(producto),
+                "cantidad": int(cantidad),
+                "tipo": tipo_movimiento
+            })
+    return resultados
 
 
 class DetectorProducto:
     # CAMBIAR ÍNDICE DE CÁMARA SEGÚN LA QUE SE USE (cam_index=0, 1, 2, ...)
-    def __init__(self, cam_index=3, conf=0.4):
-        # Inventario
-        with open("data/inventario.json", "r", encoding="utf-8") as f:
-            self.inventario = json.load(f)
-
-        self.map_inv = {p["name"].lower(): p for p in self.inventario}
+    # También acepta un video o "sintetica" (ver fuentes.abrir_fuente)
+    #
+    # seguimiento=True: el conteo sale de un tracker + voto sobre los últimos
+    # frames (estable) en lugar del frame actual. Con linea=((x1, y1), (x2, y2))
+    # en píxeles, el conteo son los objetos que cruzaron la línea (una vez cada uno).
+    #
+    # modelo=None usa el modelo residente del proceso (vision_model.obtener_modelo),
+    # que se carga y calienta una sola vez.
+    #
+    # roi=(x, y, ancho, alto): solo ese recorte (la bandeja de escaneo) va al modelo.
+    # movimiento=True: si la escena no cambió desde la última inferencia se
+    # reutilizan las detecciones anteriores en lugar de correr el modelo.
+    # imgsz: tamaño de entrada del modelo (por defecto el del modelo).
+    def __init__(self, cam_index=3, conf=0.4, seguimiento=True, linea=None, modelo=None, roi=None, movimiento=True, imgsz=None):
+        # Inventario (mismo almacenamiento que usa el backend)
+        self.store = obtener_almacenamiento()
 
         # Modelo YOLO
-        self.model = YOLO("yolov8n.pt")
+        self.model = modelo if modelo is not None else obtener_modelo()
         self.conf = conf
+        self.opciones_modelo = {"imgsz": imgsz} if imgsz else {}
 
         # Cámara
-        self.cap = cv2.VideoCapture(cam_index)
+        self.cam_index = cam_index
+        self.cap = None
+        self.abrir()
+
+        self.linea = linea
+        self.roi = roi
+        self.movimiento = DetectorMovimiento() if movimiento else None
+        self.inferido = False
+        self.usar_seguimiento = seguimiento
+        self.seguimiento = None
+        self.mapeo = None
+        self.conteo = Counter()  # nombre → cantidad (lo que se muestra)
+        self.conteo_productos = Counter()  # product_id → cantidad (lo que se registra)
+        self.detecciones = (np.zeros((0, 4)), np.zeros(0, dtype=np.int64), np.zeros(0))
+        self.reiniciar()
+
+    def abrir(self):
+        """
+        Abre la cámara si está cerrada (al volver a escanear con el mismo detector).
+        """
+        if self.cap is None:
+            self.cap = abrir_fuente(self.cam_index)
 
+    def reiniciar(self):
+        """
+        Conteo y tracks en cero para un escaneo nuevo. El mapeo al catálogo
+        se vuelve a armar en el primer frame (toma productos nuevos).
+        """
+        self.seguimiento = SeguimientoConteo(linea=self.linea) if self.usar_seguimiento else None
+        self.mapeo = None
         self.conteo = Counter()
+        self.conteo_productos = Counter()
+        if self.movimiento is not None:
+            self.movimiento.reiniciar()
 
-    def leer_frame(self):
+    def capturar(self):
+        """
+        Lee un frame de la cámara (None si no hay o está cerrada).
+        """
+        if self.cap is None:
+            return None
         ret, frame = self.cap.read()
-        if not ret:
-            return None, None
+        return frame if ret else None
+
+    def procesar(self, frame, anotar=True):
+        """
+        Inferencia + anotación de un frame ya capturado.
+        Devuelve (frame_annotated, conteo).
 
-        results = self.model(frame, conf=self.conf)
-        frame_annotated = results[0].plot()
+        Con anotar=False no se dibuja nada: devuelve el frame original y
+        las cajas quedan en self.detecciones para dibujarlas a tamaño de
+        vista (ver render.RenderizadorFrames).
 
-        clases = []
-        boxes = results[0].boxes
-        if boxes is not None:
-            for box in boxes:
-                class_id = int(box.cls[0])
-                clases.append(self.model.names[class_id].lower())
+        self.inferido indica si el modelo corrió para este frame o si,
+        sin movimiento en la escena, se reutilizaron las detecciones previas.
+        """
+        recorte, (dx, dy) = recortar_roi(frame, self.roi)
+        self.inferido = self.movimiento is None or self.movimiento.hay_movimiento(recorte)
 
-        self.conteo = Counter(clases)
+        if self.inferido:
+            results = self.model(recorte, conf=self.conf, **self.opciones_modelo)
+            if self.mapeo is None:
+                self.mapeo = MapeoCatalogo(self.model.names, self.store)
+
+            # Las clases que no son productos se descartan antes de contar
+            cajas, clases, confianzas, productos = self.mapeo.filtrar(*detecciones_de(results[0]))
+            if dx or dy:
+                cajas = cajas + (dx, dy, dx, dy)
+            self.detecciones = (cajas, clases, confianzas)
+            if self.movimiento is not None:
+                self.movimiento.marcar_inferido()
+            self._actualizar_conteo(cajas, productos)
+
+        if not anotar:
+            return frame, self.conteo
+
+        # Solo se dibujan las detecciones que son productos del catálogo
+        frame_annotated = dibujar_cajas(frame.copy(), *self.detecciones, self.model.names)
+        if self.roi is not None:
+            x, y, w, h = (int(v) for v in self.roi)
+            cv2.rectangle(frame_annotated, (x, y), (x + w, y + h), (255, 255, 255), 1)
+        if self.linea is not None:
+            p1, p2 = (tuple(int(v) for v in p) for p in self.linea)
+            cv2.line(frame_annotated, p1, p2, (0, 200, 255), 2)
         return frame_annotated, self.conteo
 
+    def _actualizar_conteo(self, cajas, productos):
+        if self.seguimiento is None:
+            self.conteo_productos = Counter(productos.tolist())
+        else:
+            # El tracker trabaja por product_id: dos clases alias del mismo producto se unen
+            self.seguimiento.actualizar(cajas, productos)
+            self.conteo_productos = self.seguimiento.cruces() if self.linea is not None else self.seguimiento.conteo()
+        self.conteo = self.mapeo.por_nombre(self.conteo_productos)
+
+    def metricas_mapeo(self) -> dict:
+        """
+        Tasa de detecciones sin producto en el catálogo en el escaneo actual.
+        """
+        return self.mapeo.metricas() if self.mapeo is not None else {}
+
+    def leer_frame(self):
+        frame = self.capturar()
+        if frame is None:
+            return None, None
+        return self.procesar(frame)
+
     def obtener_resultado(self, tipo_movimiento):
-        for nombre, cantidad in self.conteo.items():
-            if nombre in self.map_inv:
-                return {
-                    "producto": self.map_inv[nombre],
-                    "cantidad": int(cantidad),
-                    "tipo": tipo_movimiento
-                }
-        return None
+        resultados = self.obtener_resultados(tipo_movimiento)
+        return resultados[0] if resultados else None
+
+    def obtener_resultados(self, tipo_movimiento):
+        """
+        Todos los productos del catálogo presentes en el conteo actual
+        (un escaneo de pallet puede ver varios a la vez).
+        """
+        return resultados_de_conteo(self.store, self.conteo_productos, tipo_movimiento)
 
     def liberar(self):
-        self.cap.release()
+        """
+        Cierra la cámara; el modelo queda cargado para el próximo escaneo.
+        """
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def obtener_detector_producto() -> DetectorProducto:
+    """
+    Detector del proceso: se reutiliza entre escaneos (abrir/reiniciar
+    al empezar, liberar al terminar) en lugar de crearse cada vez.
+    """
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = DetectorProducto()
+    return _detector
 
 
 # =========================================================
@@ -61,7 +215,8 @@ class DetectorProducto:
 def detectar_producto():
     """
     Punto de entrada para el frontend.
-    Abre la UI de escaneo y devuelve el resultado.
+    Abre la UI de escaneo y devuelve la lista de resultados
+    (uno por producto detectado) o None si se canceló.
     """
     from src.vision.detectar_producto_ui import lanzar_ui
     return lanzar_ui()
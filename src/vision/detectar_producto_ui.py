@@ -1,18 +1,21 @@
 # detectar_producto_ui.py
+import queue
 import sys
-import cv2
+import threading
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton,
     QVBoxLayout, QHBoxLayout, QFrame, QShortcut
 )
-from PyQt5.QtGui import QImage, QPixmap, QKeySequence
+from PyQt5.QtGui import QKeySequence
 from PyQt5.QtCore import QTimer, Qt
 
-from src.vision.detectar_producto import DetectorProducto
+from src.vision.detectar_producto import obtener_detector_producto
+from src.vision.pipeline import PipelineDetector
+from src.vision.render import ALTO_VISTA, ANCHO_VISTA, RenderizadorFrames
 
 
 class DetectorUI(QWidget):
-    def __init__(self):
+    def __init__(self, detector=None):
         super().__init__()
 
         self.setWindowTitle("Inventorix AI · Escaneo")
@@ -20,13 +23,21 @@ class DetectorUI(QWidget):
         self.setStyleSheet(self.estilos())
 
         # --------- LÓGICA ---------
-        self.detector = DetectorProducto()
+        # El detector (y su modelo) sobrevive entre escaneos: solo se
+        # reabre la cámara y se ponen los conteos en cero
+        self.detector = detector if detector is not None else obtener_detector_producto()
+        self.detector.abrir()
+        self.detector.reiniciar()
+        # Sin results.plot(): las cajas se dibujan a tamaño de vista en el render
+        self.pipeline = PipelineDetector(self.detector, anotar=False)
+        self.render = RenderizadorFrames(ANCHO_VISTA, ALTO_VISTA)
         self.resultado = None
+        self._seq = 0
 
         # --------- UI ---------
         self.video_label = QLabel()
         self.video_label.setAlignment(Qt.AlignCenter)
-        self.video_label.setFixedSize(720, 540)
+        self.video_label.setFixedSize(ANCHO_VISTA, ALTO_VISTA)
         self.video_label.setStyleSheet(
             "background-color: #000; border-radius: 8px;"
         )
@@ -40,6 +51,9 @@ class DetectorUI(QWidget):
         self.info_label = QLabel("Esperando detección...")
         self.info_label.setObjectName("conteo")
 
+        self.metricas_label = QLabel("FPS: –   ·   Inferencia: – ms")
+        self.metricas_label.setObjectName("metricas")
+
         self.btn_entrada = QPushButton("⬆ Entrada  (E)")
         self.btn_salida = QPushButton("⬇ Salida   (S)")
         self.btn_cancelar = QPushButton("✖ Cancelar (Q)")
@@ -54,6 +68,7 @@ class DetectorUI(QWidget):
         panel_layout = QVBoxLayout()
         panel_layout.addWidget(titulo)
         panel_layout.addWidget(self.info_label)
+        panel_layout.addWidget(self.metricas_label)
         panel_layout.addStretch()
         panel_layout.addWidget(self.btn_entrada)
         panel_layout.addWidget(self.btn_salida)
@@ -72,16 +87,26 @@ class DetectorUI(QWidget):
         QShortcut(QKeySequence("S"), self, activated=lambda: self.confirmar("salida"))
         QShortcut(QKeySequence("Q"), self, activated=self.cancelar)
 
-        # --------- TIMER ---------
+        # --------- PIPELINE + TIMER ---------
+        # Captura e inferencia corren en sus hilos; el timer solo pinta
+        self.pipeline.iniciar()
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_frame)
         self.timer.start(30)
 
     # ==================================================
     def update_frame(self):
-        frame, conteo = self.detector.leer_frame()
-        if frame is None:
+        ultimo = self.pipeline.ultimo(self._seq)
+        if ultimo is None:
+            if self._seq == 0:
+                estado = self.detector.model.estado() if hasattr(self.detector.model, "estado") else {}
+                if estado.get("error"):
+                    self.info_label.setText(f"Error al cargar el modelo:\n{estado['error']}")
+                elif not estado.get("listo", True):
+                    self.info_label.setText("Cargando modelo...")
             return
+        self._seq, res = ultimo
+        frame, conteo = res.frame, res.conteo
 
         if conteo:
             texto = "\n".join(f"• {k}: {v}" for k, v in conteo.items())
@@ -93,13 +118,27 @@ class DetectorUI(QWidget):
             self.btn_entrada.setEnabled(False)
             self.btn_salida.setEnabled(False)
 
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = frame.shape
-        img = QImage(frame.data, w, h, ch * w, QImage.Format_RGB888)
-        self.video_label.setPixmap(QPixmap.fromImage(img))
+        m = self.pipeline.metricas()
+        self.metricas_label.setText(
+            f"FPS: {m['fps']:.1f}   ·   Inferencia: {m['latencia_ms']:.0f} ms\n"
+            f"Frames descartados: {m['descartados']}   ·   Sin movimiento: {m['omitidos']}\n"
+            f"Detecciones sin producto: {100 * self.detector.metricas_mapeo().get('tasa_sin_mapear', 0):.0f}%"
+        )
+        # No repintar más seguido de lo que llegan inferencias
+        intervalo = max(30, int(m["tick_ms"]))
+        if self.timer.interval() != intervalo:
+            self.timer.setInterval(intervalo)
+
+        cajas, clases, confianzas = res.detecciones
+        self.render.renderizar(frame, cajas, clases, confianzas, self.detector.model.names)
+        if self.detector.roi is not None:
+            self.render.dibujar_roi(self.detector.roi)
+        if self.detector.linea is not None:
+            self.render.dibujar_linea(*self.detector.linea)
+        self.video_label.setPixmap(self.render.pixmap())
 
     def confirmar(self, tipo):
-        self.resultado = self.detector.obtener_resultado(tipo)
+        self.resultado = self.detector.obtener_resultados(tipo) or None
         self.close()
 
     def cancelar(self):
@@ -107,6 +146,8 @@ class DetectorUI(QWidget):
         self.close()
 
     def closeEvent(self, event):
+        self.timer.stop()
+        self.pipeline.detener()
         self.detector.liberar()
         event.accept()
 
@@ -138,6 +179,12 @@ class DetectorUI(QWidget):
             padding: 12px;
         }
 
+        QLabel#metricas {
+            font-size: 12px;
+            color: #6b7280;
+            padding: 4px 2px;
+        }
+
         QPushButton {
             height: 42px;
             border-radius: 8px;
@@ -163,9 +210,37 @@ class DetectorUI(QWidget):
 # =========================================================
 # FUNCIÓN INTERNA PARA LA UI
 # =========================================================
+_hilo_qt = None
+_hilo_qt_lock = threading.Lock()
+_pedidos = queue.Queue()
+
+
+def _loop_qt():
+    # Qt exige que el event loop corra en el hilo que creó la QApplication,
+    # y Streamlit ejecuta cada rerun en un hilo distinto: la QApplication
+    # vive en este hilo dedicado y cada escaneo se le pide por la cola
+    app = QApplication.instance() or QApplication(sys.argv)
+    while True:
+        respuesta = _pedidos.get()
+        try:
+            win = DetectorUI()
+            win.show()
+            app.exec_()
+            respuesta.put((win.resultado, None))
+        except Exception as e:
+            respuesta.put((None, e))
+
+
 def lanzar_ui():
-    app = QApplication(sys.argv)
-    win = DetectorUI()
-    win.show()
-    app.exec_()
-    return win.resultado
+    global _hilo_qt
+    with _hilo_qt_lock:
+        if _hilo_qt is None:
+            _hilo_qt = threading.Thread(target=_loop_qt, name="escaneo-qt", daemon=True)
+            _hilo_qt.start()
+
+    respuesta = queue.Queue(maxsize=1)
+    _pedidos.put(respuesta)
+    resultado, error = respuesta.get()
+    if error is not None:
+        raise error
+    return resultado
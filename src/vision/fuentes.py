@@ -0,0 +1,166 @@
+# fuentes.py
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+EXTENSIONES_IMAGEN = {".png", ".jpg", ".jpeg", ".bmp"}
+
+# FPS si un video no informa el suyo
+FPS_VIDEO_DEFECTO = 30
+
+
+class Ritmo:
+    """
+    Limita read() a 'fps' frames por segundo, como una cámara real
+    (sin fps no espera). Sin esto una fuente de archivo entrega frames
+    tan rápido como se decodifican y el hilo de captura ocupa un núcleo.
+    """
+
+    def __init__(self, fps=None):
+        self.periodo = 1 / fps if fps else 0.0
+        self._ultimo = 0.0
+
+    def esperar(self):
+        if not self.periodo:
+            return
+        espera = self._ultimo + self.periodo - time.perf_counter()
+        if espera > 0:
+            time.sleep(espera)
+        self._ultimo = time.perf_counter()
+
+
+class FuenteSintetica:
+    """
+    Cámara falsa: frames BGR con rectángulos que se desplazan.
+    Misma interfaz que cv2.VideoCapture (read / release) para probar
+    el detector sin hardware. Con fps limita el ritmo como una cámara real.
+    """
+
+    def __init__(self, ancho=640, alto=480, fps=None, objetos=3, seed=0):
+        self.ancho = ancho
+        self.alto = alto
+        self.ritmo = Ritmo(fps)
+        self._rng = np.random.default_rng(seed)
+        self._pos = self._rng.uniform(0, 1, size=(objetos, 2))
+        self._vel = self._rng.uniform(-0.02, 0.02, size=(objetos, 2))
+        self._colores = self._rng.integers(0, 255, size=(objetos, 3))
+        self._abierta = True
+
+    def isOpened(self):
+        return self._abierta
+
+    def read(self):
+        if not self._abierta:
+            return False, None
+        self.ritmo.esperar()
+
+        frame = np.full((self.alto, self.ancho, 3), 40, dtype=np.uint8)
+        self._pos = (self._pos + self._vel) % 1.0
+        lado = min(self.ancho, self.alto) // 6
+        for (x, y), color in zip(self._pos, self._colores):
+            x0, y0 = int(x * (self.ancho - lado)), int(y * (self.alto - lado))
+            cv2.rectangle(frame, (x0, y0), (x0 + lado, y0 + lado), tuple(int(c) for c in color), -1)
+        return True, frame
+
+    def release(self):
+        self._abierta = False
+
+
+class FuenteVideo:
+    """
+    Archivo de video como cámara. Con repetir=True vuelve al inicio al
+    terminar (estación que no se queda sin frames); con tiempo_real=True
+    entrega los frames al FPS del archivo, como una cámara.
+    clave es el número del último frame leído (para un archivo de etiquetas).
+    """
+
+    def __init__(self, ruta, repetir=True, tiempo_real=False):
+        self.ruta = str(ruta)
+        self.repetir = repetir
+        self.cap = cv2.VideoCapture(self.ruta)
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or FPS_VIDEO_DEFECTO
+        self.ritmo = Ritmo(fps if tiempo_real else None)
+        self.clave = None
+        self._indice = -1
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.repetir:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self._indice = -1
+            ret, frame = self.cap.read()
+        if ret:
+            self.ritmo.esperar()
+            self._indice += 1
+            self.clave = str(self._indice)
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class FuenteImagenes:
+    """
+    Carpeta de imágenes (p. ej. capturas/) reproducida como cámara, en
+    orden de nombre. clave es el nombre del último archivo leído.
+    Con fps limita el ritmo; sin repetir, read() da False al terminar.
+    """
+
+    def __init__(self, carpeta, repetir=False, fps=None):
+        self.archivos = sorted(
+            p for p in Path(carpeta).iterdir() if p.suffix.lower() in EXTENSIONES_IMAGEN
+        )
+        self.repetir = repetir
+        self.ritmo = Ritmo(fps)
+        self.clave = None
+        self._i = 0
+
+    def isOpened(self):
+        return bool(self.archivos)
+
+    def read(self):
+        while True:
+            if self._i >= len(self.archivos):
+                if not self.repetir or not self.archivos:
+                    return False, None
+                self._i = 0
+            archivo = self.archivos[self._i]
+            self._i += 1
+            frame = cv2.imread(str(archivo))
+            if frame is not None:
+                break
+
+        self.ritmo.esperar()
+        self.clave = archivo.name
+        return True, frame
+
+    def release(self):
+        self._i = len(self.archivos)
+        self.repetir = False
+
+
+def abrir_fuente(fuente):
+    """
+    Abre una fuente de frames a partir de:
+    - un índice de cámara (int o texto numérico),
+    - "sintetica" (FuenteSintetica a 30 FPS, como una cámara),
+    - la ruta de un archivo de video (FuenteVideo en bucle, al FPS del archivo),
+    - una carpeta de imágenes (FuenteImagenes, en bucle a 30 FPS),
+    - un objeto que ya tenga read()/release() (se devuelve tal cual).
+    """
+    if hasattr(fuente, "read"):
+        return fuente
+    if isinstance(fuente, int) or (isinstance(fuente, str) and fuente.isdigit()):
+        return cv2.VideoCapture(int(fuente))
+    if fuente == "sintetica":
+        return FuenteSintetica(fps=30)
+    if Path(fuente).is_file():
+        return FuenteVideo(fuente, tiempo_real=True)
+    if Path(fuente).is_dir():
+        return FuenteImagenes(fuente, repetir=True, fps=30)
+    raise ValueError(f"Fuente de video no reconocida: {fuente!r}")
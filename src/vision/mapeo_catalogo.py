@@ -0,0 +1,126 @@
+# mapeo_catalogo.py
+import json
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+# Configuración opcional: {"alias": {"clase del modelo": "producto"}, "ignorar": ["clase", ...]}
+MAPEO_PATH = Path("data/mapeo_vision.json")
+
+# class_id sin producto (ignorado o sin mapear)
+SIN_PRODUCTO = -1
+
+# Sinónimos por defecto: nombre de clase del modelo → nombre en el catálogo
+ALIAS_BASE = {
+    "oranges": "orange",
+    "apples": "apple",
+}
+
+# Clases COCO que nunca son productos: se descartan sin contarse como "sin mapear"
+IGNORAR_BASE = {
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat",
+    "traffic light", "fire hydrant", "stop sign", "parking meter", "bench",
+    "bird", "cat", "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe",
+    "chair", "couch", "potted plant", "bed", "dining table", "toilet",
+    "tv", "laptop", "mouse", "remote", "keyboard", "cell phone",
+    "microwave", "oven", "toaster", "sink", "refrigerator", "clock",
+}
+
+
+def leer_configuracion(path=MAPEO_PATH) -> tuple[dict, set]:
+    """
+    Alias e ignorados: los de base más los de data/mapeo_vision.json (si existe).
+    """
+    alias, ignorar = dict(ALIAS_BASE), set(IGNORAR_BASE)
+    try:
+        datos = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return alias, ignorar
+    alias.update({str(k).lower(): str(v).lower() for k, v in datos.get("alias", {}).items()})
+    ignorar.update(str(c).lower() for c in datos.get("ignorar", []))
+    return alias, ignorar
+
+
+class MapeoCatalogo:
+    """
+    class_id del modelo → product_id del catálogo, precalculado una vez.
+
+    - producto_de_clase[class_id] es el product_id o SIN_PRODUCTO, así el
+      mapeo de todas las cajas de un frame es una indexación numpy.
+    - Los nombres pasan por alias (sinónimos) antes de buscarse en el
+      catálogo; las clases en 'ignorar' (personas, muebles...) se descartan.
+    - Cuenta cuántas detecciones quedaron sin mapear (clases que no son
+      ignoradas ni están en el catálogo) para poder vigilar esa tasa.
+    """
+
+    def __init__(self, names, store, alias=None, ignorar=None):
+        if alias is None or ignorar is None:
+            alias_cfg, ignorar_cfg = leer_configuracion()
+            alias = alias_cfg if alias is None else alias
+            ignorar = ignorar_cfg if ignorar is None else ignorar
+
+        if isinstance(names, (list, tuple)):
+            names = dict(enumerate(names))
+        n_clases = max(names) + 1 if names else 0
+        self.producto_de_clase = np.full(n_clases, SIN_PRODUCTO, dtype=np.int64)
+        self.ignorada = np.zeros(n_clases, dtype=bool)
+        self.nombre_clase = {}
+        self.nombre_producto = {}
+
+        for class_id, nombre in names.items():
+            nombre = str(nombre).lower()
+            self.nombre_clase[class_id] = nombre
+            if nombre in ignorar:
+                self.ignorada[class_id] = True
+                continue
+            producto = store.producto_por_nombre(alias.get(nombre, nombre))
+            if producto is not None:
+                self.producto_de_clase[class_id] = producto["product_id"]
+                self.nombre_producto[producto["product_id"]] = producto["name"]
+
+        self.detecciones = 0
+        self.ignoradas = 0
+        self.sin_mapear = Counter()  # nombre de clase → detecciones
+
+    def filtrar(self, cajas, clases, confianzas):
+        """
+        Descarta las detecciones sin producto y devuelve
+        (cajas, clases, confianzas, product_ids) de las que quedan.
+        """
+        clases = np.asarray(clases, dtype=np.int64)
+        validas = (clases >= 0) & (clases < len(self.producto_de_clase))
+        productos = np.full(len(clases), SIN_PRODUCTO, dtype=np.int64)
+        productos[validas] = self.producto_de_clase[clases[validas]]
+        mapeadas = productos != SIN_PRODUCTO
+
+        self.detecciones += len(clases)
+        if not mapeadas.all():
+            ignoradas = np.zeros(len(clases), dtype=bool)
+            ignoradas[validas] = self.ignorada[clases[validas]]
+            self.ignoradas += int(ignoradas.sum())
+            for class_id in clases[~mapeadas & ~ignoradas].tolist():
+                self.sin_mapear[self.nombre_clase.get(class_id, str(class_id))] += 1
+
+        return cajas[mapeadas], clases[mapeadas], confianzas[mapeadas], productos[mapeadas]
+
+    def por_nombre(self, conteo_productos: Counter) -> Counter:
+        """
+        Conteo por product_id → por nombre del catálogo (para mostrar).
+        """
+        return Counter({self.nombre_producto.get(p, str(p)): n for p, n in conteo_productos.items()})
+
+    def metricas(self) -> dict:
+        """
+        Detecciones vistas, ignoradas, sin mapear (tasa sobre las no
+        ignoradas) y las clases sin mapear más frecuentes.
+        """
+        sin_mapear = sum(self.sin_mapear.values())
+        candidatas = self.detecciones - self.ignoradas
+        return {
+            "detecciones": self.detecciones,
+            "ignoradas": self.ignoradas,
+            "sin_mapear": sin_mapear,
+            "tasa_sin_mapear": sin_mapear / candidatas if candidatas else 0.0,
+            "clases_sin_mapear": dict(self.sin_mapear.most_common(5)),
+        }
@@ -0,0 +1,149 @@
+# multi_camara.py
+import argparse
+import threading
+import time
+from collections import Counter
+
+from src.backend.almacenamiento import obtener_almacenamiento
+from src.vision.detectar_producto import detecciones_de, resultados_de_conteo
+from src.vision.fuentes import abrir_fuente
+from src.vision.mapeo_catalogo import MapeoCatalogo
+from src.vision.pipeline import UltimoValor
+from src.vision.vision_model import obtener_modelo
+
+# Espera máxima por el frame nuevo de cada fuente en un tick (s)
+ESPERA_FRAME = 0.1
+
+
+class DetectorMultiCamara:
+    """
+    Un solo modelo para N fuentes (p. ej. las cámaras del muelle de recepción).
+
+    - Cada fuente tiene su hilo de captura que deja solo el último frame
+      (UltimoValor), así una cámara lenta o caída no frena a las demás.
+    - En cada tick los frames nuevos de todas las fuentes van en UNA
+      llamada self.model([...]) (un batch) y cada resultado vuelve a su
+      fuente como (frame_annotated, Counter).
+
+    Las fuentes pueden ser índices de cámara, videos, "sintetica" u
+    objetos con read()/release() (ver fuentes.abrir_fuente).
+    """
+
+    def __init__(self, fuentes, conf=0.4, modelo=None):
+        self.store = obtener_almacenamiento()
+
+        # Modelo YOLO (compartido por todas las fuentes)
+        self.model = modelo if modelo is not None else obtener_modelo()
+        self.conf = conf
+
+        self.fuentes = [abrir_fuente(f) for f in fuentes]
+        self.mapeo = None
+        self.conteos = [Counter() for _ in self.fuentes]  # por nombre (para mostrar)
+        self.conteos_productos = [Counter() for _ in self.fuentes]  # por product_id
+
+        self._ultimos = [UltimoValor() for _ in self.fuentes]
+        self._detener = threading.Event()
+        self._hilos = []
+
+    # ---------- captura ----------
+    def _leer_fuente(self, i: int):
+        fuente, ultimo = self.fuentes[i], self._ultimos[i]
+        while not self._detener.is_set():
+            ret, frame = fuente.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            ultimo.poner(frame)
+
+    def iniciar(self):
+        if self._hilos:
+            return
+        self._detener.clear()
+        self._hilos = [
+            threading.Thread(target=self._leer_fuente, args=(i,), name=f"captura-{i}", daemon=True)
+            for i in range(len(self.fuentes))
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def capturar(self, timeout: float = ESPERA_FRAME) -> list:
+        """
+        Frame más nuevo de cada fuente (None para las que no dieron uno
+        nuevo dentro del timeout). Las fuentes se leen en paralelo, así
+        la espera total está acotada por timeout y no por N·timeout.
+        """
+        self.iniciar()
+        limite = time.perf_counter() + timeout
+        return [u.tomar(timeout=max(limite - time.perf_counter(), 0)) for u in self._ultimos]
+
+    # ---------- inferencia ----------
+    def procesar(self, frames: list) -> list:
+        """
+        Inferencia en batch de los frames disponibles.
+        Devuelve por fuente (frame_annotated, conteo) o (None, None) si no tenía frame.
+        """
+        indices = [i for i, f in enumerate(frames) if f is not None]
+        salida = [(None, None)] * len(frames)
+        if not indices:
+            return salida
+
+        results = self.model([frames[i] for i in indices], conf=self.conf, verbose=False)
+        if self.mapeo is None:
+            self.mapeo = MapeoCatalogo(self.model.names, self.store)
+
+        for i, r in zip(indices, results):
+            productos = self.mapeo.filtrar(*detecciones_de(r))[3]
+            self.conteos_productos[i] = Counter(productos.tolist())
+            self.conteos[i] = self.mapeo.por_nombre(self.conteos_productos[i])
+            salida[i] = (r.plot(), self.conteos[i])
+        return salida
+
+    def leer_frames(self) -> list:
+        return self.procesar(self.capturar())
+
+    # ---------- resultados ----------
+    def obtener_resultados(self, fuente: int, tipo_movimiento):
+        """
+        Productos del catálogo en el conteo actual de una fuente.
+        """
+        return resultados_de_conteo(self.store, self.conteos_productos[fuente], tipo_movimiento)
+
+    def liberar(self):
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join()
+        self._hilos = []
+        for fuente in self.fuentes:
+            fuente.release()
+
+
+# =========================================================
+# CLI: throughput con varias fuentes y un solo modelo
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="Detector multi-cámara con un solo modelo.")
+    parser.add_argument("fuentes", nargs="+", help='Índices de cámara, videos o "sintetica".')
+    parser.add_argument("--segundos", type=float, default=10.0)
+    parser.add_argument("--conf", type=float, default=0.4)
+    args = parser.parse_args()
+
+    detector = DetectorMultiCamara(args.fuentes, conf=args.conf)
+    frames = [0] * len(detector.fuentes)
+    ticks = 0
+    inicio = time.perf_counter()
+    try:
+        while time.perf_counter() - inicio < args.segundos:
+            for i, (frame, _) in enumerate(detector.leer_frames()):
+                frames[i] += frame is not None
+            ticks += 1
+    finally:
+        detector.liberar()
+
+    total = time.perf_counter() - inicio
+    print(f"{ticks} batches en {total:.1f} s · {sum(frames) / total:.1f} frames/s en total")
+    for i, fuente in enumerate(args.fuentes):
+        print(f"  [{i}] {fuente}: {frames[i] / total:.1f} frames/s · último conteo {dict(detector.conteos[i])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# pipeline.py
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from src.vision.adaptativo import TickAdaptativo
+
+# Frames recientes sobre los que se miden FPS y latencia
+VENTANA_METRICAS = 30
+
+# Espera máxima de los hilos antes de revisar si deben detenerse (s)
+ESPERA_HILOS = 0.2
+
+
+class UltimoValor:
+    """
+    Cola acotada de un solo lugar: poner() reemplaza lo que había.
+    Quien consume siempre recibe el valor más nuevo; los que nadie
+    alcanzó a tomar se descartan (y se cuentan).
+    """
+
+    def __init__(self):
+        self._valor = None
+        self._seq = 0
+        self._seq_tomado = 0
+        self.descartados = 0
+        self._cond = threading.Condition()
+
+    def poner(self, valor):
+        with self._cond:
+            if self._seq > self._seq_tomado:
+                self.descartados += 1
+            self._valor = valor
+            self._seq += 1
+            self._cond.notify_all()
+
+    def tomar(self, timeout: float | None = None):
+        """
+        Espera un valor que todavía no se tomó. None si vence el timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._seq_tomado, timeout):
+                return None
+            self._seq_tomado = self._seq
+            return self._valor
+
+    def ultimo(self, desde_seq: int = 0):
+        """
+        (seq, valor) si hay uno más nuevo que desde_seq, sin esperar ni consumirlo.
+        """
+        with self._cond:
+            if self._seq <= desde_seq:
+                return None
+            return self._seq, self._valor
+
+
+@dataclass
+class Resultado:
+    frame: object  # frame anotado (BGR), o el original si anotar=False
+    conteo: dict
+    capturado: float  # perf_counter del momento de la captura
+    latencia: float  # segundos de inferencia + anotación
+    detecciones: tuple = None  # (cajas, clases, confianzas) para dibujar aparte
+    inferido: bool = True  # False: escena quieta, detecciones del frame anterior
+
+
+class PipelineDetector:
+    """
+    Captura e inferencia en hilos propios, fuera del hilo de la UI:
+
+    - hilo de captura: lee frames del detector sin pausa y deja solo el
+      último (UltimoValor), así la inferencia nunca trabaja sobre un
+      frame viejo;
+    - hilo de inferencia: toma el frame más nuevo, llama a
+      detector.procesar y publica el resultado, también en un UltimoValor.
+
+    La UI consulta ultimo() en su timer y pinta solo si hay un resultado
+    nuevo; si la inferencia es más lenta que la cámara, los frames
+    intermedios se descartan en lugar de acumularse.
+
+    Entre inferencias se respeta el intervalo de un TickAdaptativo (se
+    alarga si el modelo no da abasto). Los frames sin movimiento (ver
+    DetectorProducto.procesar) no cuentan como inferencias.
+    """
+
+    def __init__(self, detector, anotar=True):
+        self.detector = detector
+        self.anotar = anotar
+        self._frames = UltimoValor()
+        self._resultados = UltimoValor()
+        self._detener = threading.Event()
+        self._hilos = []
+
+        self.tick = TickAdaptativo()
+        self._omitidos = 0
+        self._tiempos = deque(maxlen=VENTANA_METRICAS)
+        self._latencias = deque(maxlen=VENTANA_METRICAS)
+        self._metricas_lock = threading.Lock()
+
+    # ---------- hilos ----------
+    def _capturar(self):
+        while not self._detener.is_set():
+            frame = self.detector.capturar()
+            if frame is None:
+                time.sleep(0.01)
+                continue
+            self._frames.poner((time.perf_counter(), frame))
+
+    def _inferir(self):
+        ultima = 0.0
+        while not self._detener.is_set():
+            # Tick adaptativo: no inferir más seguido de lo que el modelo sostiene
+            espera = ultima + self.tick.intervalo() - time.perf_counter()
+            if espera > 0 and self._detener.wait(espera):
+                break
+
+            item = self._frames.tomar(timeout=ESPERA_HILOS)
+            if item is None:
+                continue
+            capturado, frame = item
+
+            t0 = time.perf_counter()
+            anotado, conteo = self.detector.procesar(frame, anotar=self.anotar)
+            detecciones = getattr(self.detector, "detecciones", None)
+            inferido = getattr(self.detector, "inferido", True)
+            t1 = time.perf_counter()
+
+            with self._metricas_lock:
+                if inferido:
+                    ultima = t0
+                    self.tick.registrar(t1 - t0)
+                    self._tiempos.append(t1)
+                    self._latencias.append(t1 - t0)
+                else:
+                    self._omitidos += 1
+            self._resultados.poner(Resultado(anotado, dict(conteo), capturado, t1 - t0, detecciones, inferido))
+
+    # ---------- API ----------
+    def iniciar(self):
+        if self._hilos:
+            return
+        self._detener.clear()
+        self._hilos = [
+            threading.Thread(target=self._capturar, name="captura", daemon=True),
+            threading.Thread(target=self._inferir, name="inferencia", daemon=True),
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def detener(self):
+        """
+        Detiene los hilos y espera a que terminen (después se puede
+        liberar la cámara sin que otro hilo la esté leyendo).
+        """
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join()
+        self._hilos = []
+
+    def ultimo(self, desde_seq: int = 0):
+        """
+        (seq, Resultado) si hay un resultado más nuevo que desde_seq, o None.
+        """
+        return self._resultados.ultimo(desde_seq)
+
+    def metricas(self) -> dict:
+        """
+        FPS de inferencia y latencia promedio (ms) sobre los últimos
+        VENTANA_METRICAS frames, frames de cámara descartados, frames
+        sin inferencia por falta de movimiento y tick actual (ms).
+        """
+        with self._metricas_lock:
+            tiempos = list(self._tiempos)
+            latencias = list(self._latencias)
+            omitidos = self._omitidos
+
+        fps = (len(tiempos) - 1) / (tiempos[-1] - tiempos[0]) if len(tiempos) > 1 and tiempos[-1] > tiempos[0] else 0.0
+        latencia = 1000 * sum(latencias) / len(latencias) if latencias else 0.0
+        return {
+            "fps": fps,
+            "latencia_ms": latencia,
+            "descartados": self._frames.descartados,
+            "omitidos": omitidos,
+            "tick_ms": 1000 * self.tick.intervalo(),
+        }
@@ -0,0 +1,212 @@
+# render.py
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+# Tamaño del video en la ventana de escaneo (video_label)
+ANCHO_VISTA = 720
+ALTO_VISTA = 540
+
+# Colores BGR por class_id (se repiten cíclicamente)
+PALETA = np.array([
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+    (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0),
+    (168, 153, 44), (255, 194, 0), (147, 69, 52), (255, 115, 100), (236, 24, 0),
+    (255, 56, 132), (133, 0, 82), (255, 56, 203), (200, 149, 255), (199, 55, 255),
+], dtype=np.uint8)
+
+
+def dibujar_cajas(img: np.ndarray, cajas, clases=None, confianzas=None, names=None) -> np.ndarray:
+    """
+    Dibuja cajas xyxy (en píxeles de img) con su etiqueta, en el lugar.
+    """
+    if cajas is None or len(cajas) == 0:
+        return img
+    esquinas = np.rint(np.asarray(cajas, dtype=np.float64)).astype(np.int32)
+    clases = np.asarray(clases, dtype=np.int64) if clases is not None else np.zeros(len(esquinas), dtype=np.int64)
+    colores = PALETA[clases % len(PALETA)]
+
+    for i, (a, b, c, d) in enumerate(esquinas):
+        color = tuple(int(v) for v in colores[i])
+        cv2.rectangle(img, (int(a), int(b)), (int(c), int(d)), color, 2)
+        if names is not None:
+            texto = str(names[int(clases[i])])
+            if confianzas is not None:
+                texto += f" {float(confianzas[i]):.2f}"
+            cv2.putText(img, texto, (int(a), max(int(b) - 4, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+    return img
+
+
+class RenderizadorFrames:
+    """
+    Dibuja el frame de la cámara a tamaño de vista con un solo buffer:
+
+    - el frame se redimensiona UNA vez, directo dentro de un buffer BGR
+      preasignado (cv2.resize con dst), manteniendo la proporción;
+    - las cajas se dibujan en ese buffer, escaladas (sin results.plot(),
+      que copia el frame completo a resolución de cámara);
+    - la QImage envuelve el buffer en Format_BGR888 (sin cvtColor) y el
+      QPixmap se reutiliza con convertFromImage.
+
+    Por frame no se asigna memoria nueva salvo la subida al QPixmap.
+    """
+
+    def __init__(self, ancho=ANCHO_VISTA, alto=ALTO_VISTA):
+        self.ancho = ancho
+        self.alto = alto
+        self.buffer = np.zeros((alto, ancho, 3), dtype=np.uint8)
+        self._forma = None  # (alto, ancho) del frame de origen
+        self._vista = None  # región del buffer donde va el frame
+        self._barras = []  # franjas negras alrededor de la vista (letterbox)
+        self._escala = 1.0
+        self._desplazamiento = (0, 0)
+        self._qimage = None
+        self._pixmap = None
+
+    def _ajustar(self, alto: int, ancho: int):
+        """
+        Recalcula la región destino solo cuando cambia la resolución de origen.
+        """
+        escala = min(self.ancho / ancho, self.alto / alto)
+        w, h = max(int(round(ancho * escala)), 1), max(int(round(alto * escala)), 1)
+        x0, y0 = (self.ancho - w) // 2, (self.alto - h) // 2
+        self.buffer[:] = 0
+        self._vista = self.buffer[y0:y0 + h, x0:x0 + w]
+        # Las etiquetas y líneas pueden caer fuera de la vista: estas franjas
+        # se limpian en cada frame para no dejar texto de frames anteriores
+        if h < self.alto:
+            self._barras = [self.buffer[:y0], self.buffer[y0 + h:]]
+        else:
+            self._barras = [self.buffer[:, :x0], self.buffer[:, x0 + w:]]
+        self._escala = escala
+        self._desplazamiento = (x0, y0)
+        self._forma = (alto, ancho)
+
+    def renderizar(self, frame: np.ndarray, cajas=None, clases=None, confianzas=None, names=None) -> np.ndarray:
+        """
+        Escribe frame + cajas (xyxy en píxeles del frame de origen) en el
+        buffer y lo devuelve. El buffer es siempre el mismo arreglo.
+        """
+        alto, ancho = frame.shape[:2]
+        if self._forma != (alto, ancho):
+            self._ajustar(alto, ancho)
+
+        for barra in self._barras:
+            barra.fill(0)
+        vw, vh = self._vista.shape[1], self._vista.shape[0]
+        cv2.resize(frame, (vw, vh), dst=self._vista, interpolation=cv2.INTER_LINEAR)
+
+        if cajas is None or len(cajas) == 0:
+            return self.buffer
+
+        x0, y0 = self._desplazamiento
+        esquinas = np.asarray(cajas, dtype=np.float64) * self._escala + (x0, y0, x0, y0)
+        dibujar_cajas(self.buffer, esquinas, clases, confianzas, names)
+        return self.buffer
+
+    def _a_vista(self, x, y) -> tuple[int, int]:
+        x0, y0 = self._desplazamiento
+        return int(x * self._escala) + x0, int(y * self._escala) + y0
+
+    def dibujar_linea(self, p1, p2, color=(0, 200, 255)):
+        """
+        Línea de conteo (en píxeles del frame de origen) sobre el buffer.
+        """
+        cv2.line(self.buffer, self._a_vista(*p1), self._a_vista(*p2), color, 2)
+
+    def dibujar_roi(self, roi, color=(255, 255, 255)):
+        """
+        Rectángulo de la zona de escaneo roi=(x, y, ancho, alto) sobre el buffer.
+        """
+        x, y, w, h = roi
+        cv2.rectangle(self.buffer, self._a_vista(x, y), self._a_vista(x + w, y + h), color, 1)
+
+    # ---------- Qt ----------
+    def pixmap(self):
+        """
+        QPixmap con el contenido actual del buffer (reutilizado entre frames).
+        """
+        from PyQt5.QtGui import QImage, QPixmap
+
+        if self._qimage is None:
+            # La QImage apunta al buffer: no copia ni convierte BGR → RGB
+            self._qimage = QImage(self.buffer.data, self.ancho, self.alto, self.buffer.strides[0], QImage.Format_BGR888)
+            self._pixmap = QPixmap(self.ancho, self.alto)
+        self._pixmap.convertFromImage(self._qimage)
+        return self._pixmap
+
+
+# =========================================================
+# MICRO-BENCHMARK (frames sintéticos)
+# =========================================================
+def _cajas_sinteticas(rng, n: int, alto: int, ancho: int):
+    xy = rng.uniform(0, 0.8, size=(n, 2)) * (ancho, alto)
+    wh = rng.uniform(0.05, 0.2, size=(n, 2)) * (ancho, alto)
+    return np.hstack([xy, xy + wh]), rng.integers(0, 80, size=n), rng.uniform(0.4, 1.0, size=n)
+
+
+def _render_anterior(frame, cajas, clases, confianzas, names, qt):
+    """
+    Camino original: copia anotada a resolución de cámara (como
+    results.plot()), cvtColor a RGB, QImage RGB888 y QPixmap.fromImage.
+    """
+    anotado = frame.copy()
+    for (a, b, c, d), k, p in zip(cajas.astype(int), clases, confianzas):
+        cv2.rectangle(anotado, (a, b), (c, d), (0, 0, 255), 2)
+        cv2.putText(anotado, f"{names[int(k)]} {p:.2f}", (a, max(b - 4, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+    rgb = cv2.cvtColor(anotado, cv2.COLOR_BGR2RGB)
+    if qt is None:
+        return rgb
+    QImage, QPixmap = qt
+    h, w, ch = rgb.shape
+    img = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888)
+    return QPixmap.fromImage(img)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FPS del render de la ventana de escaneo con frames sintéticos.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--ancho", type=int, default=1280)
+    parser.add_argument("--alto", type=int, default=720)
+    parser.add_argument("--cajas", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtGui import QImage, QPixmap
+        from PyQt5.QtWidgets import QApplication
+        # QPixmap necesita una QApplication viva
+        app = QApplication.instance() or QApplication([])
+        qt = (QImage, QPixmap)
+    except ImportError:
+        qt = None
+        print("PyQt5 no disponible: se mide solo la parte numpy/OpenCV (sin QImage/QPixmap).")
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, size=(args.alto, args.ancho, 3), dtype=np.uint8) for _ in range(8)]
+    detecciones = [_cajas_sinteticas(rng, args.cajas, args.alto, args.ancho) for _ in frames]
+    names = {i: f"clase{i}" for i in range(80)}
+
+    t0 = time.perf_counter()
+    for i in range(args.frames):
+        _render_anterior(frames[i % len(frames)], *detecciones[i % len(frames)], names, qt)
+    anterior = time.perf_counter() - t0
+
+    render = RenderizadorFrames()
+    t0 = time.perf_counter()
+    for i in range(args.frames):
+        render.renderizar(frames[i % len(frames)], *detecciones[i % len(frames)], names)
+        if qt is not None:
+            render.pixmap()
+    actual = time.perf_counter() - t0
+
+    print(f"{args.frames} frames {args.ancho}x{args.alto} → {ANCHO_VISTA}x{ALTO_VISTA}, {args.cajas} cajas")
+    print(f"  plot + cvtColor + fromImage : {args.frames / anterior:8.1f} FPS ({1000 * anterior / args.frames:.2f} ms/frame)")
+    print(f"  buffer + BGR888 + pixmap    : {args.frames / actual:8.1f} FPS ({1000 * actual / args.frames:.2f} ms/frame)")
+
+
+if __name__ == "__main__":
+    main()
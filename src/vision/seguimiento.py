@@ -0,0 +1,301 @@
+# seguimiento.py
+import argparse
+import sys
+from collections import Counter, deque
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Un track se confirma después de MIN_APARICIONES frames (descarta falsos positivos de un frame)
+MIN_APARICIONES = 3
+
+# Frames que un track puede pasar sin detección antes de darse por perdido
+MAX_PERDIDOS = 10
+
+# Sin superposición (IoU 0, inferencia a pocos FPS) se asocia por distancia
+# entre centros: hasta DISTANCIA_MAX diagonales de la caja del track
+DISTANCIA_MAX = 2.0
+
+# Frames recientes que votan el conteo estable
+VENTANA_VOTO = 15
+
+
+def iou_matriz(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    IoU entre cada caja de a (n, 4) y de b (m, 4), en formato xyxy.
+    """
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    x0 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y0 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x1 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y1 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.where(union > 0, union, 1), 0.0)
+
+
+@dataclass
+class Track:
+    id: int
+    clase: int
+    caja: np.ndarray
+    apariciones: int = 1
+    perdidos: int = 0
+    velocidad: np.ndarray = field(default_factory=lambda: np.zeros(2))  # píxeles por frame
+
+    @property
+    def centro(self) -> tuple[float, float]:
+        return (self.caja[0] + self.caja[2]) / 2, (self.caja[1] + self.caja[3]) / 2
+
+    def caja_prevista(self) -> np.ndarray:
+        """
+        Caja esperada en el frame actual (velocidad constante).
+        """
+        dx, dy = self.velocidad * (self.perdidos + 1)
+        return self.caja + (dx, dy, dx, dy)
+
+    def asociar(self, caja: np.ndarray):
+        nuevo = np.array([(caja[0] + caja[2]) / 2, (caja[1] + caja[3]) / 2])
+        self.velocidad = (nuevo - np.asarray(self.centro)) / (self.perdidos + 1)
+        self.caja = caja
+        self.apariciones += 1
+        self.perdidos = 0
+
+    @property
+    def confirmado(self) -> bool:
+        return self.apariciones >= MIN_APARICIONES
+
+
+class SeguidorIoU:
+    """
+    Tracker por IoU: cada detección se asocia (greedy, mayor IoU primero)
+    al track vivo de la misma clase que más se le superpone, comparando
+    con la caja prevista del track (velocidad constante). Las que quedan
+    libres se asocian por distancia al centro previsto (misma clase, hasta
+    distancia_max diagonales de la caja): a pocos FPS las cajas de frames
+    consecutivos ya no se superponen. Las que no se asocian abren un track nuevo con id propio.
+    """
+
+    def __init__(self, iou_min: float = 0.3, max_perdidos: int = MAX_PERDIDOS, distancia_max: float = DISTANCIA_MAX):
+        self.iou_min = iou_min
+        self.max_perdidos = max_perdidos
+        self.distancia_max = distancia_max
+        self.tracks: list[Track] = []
+        self._siguiente_id = 1
+
+    def actualizar(self, cajas: np.ndarray, clases: np.ndarray) -> list[Track]:
+        """
+        cajas (n, 4) xyxy y clases (n,) de un frame.
+        Devuelve los tracks vistos en este frame.
+        """
+        cajas = np.asarray(cajas, dtype=np.float64).reshape(-1, 4)
+        clases = np.asarray(clases, dtype=np.int64).reshape(-1)
+
+        previas = np.array([t.caja_prevista() for t in self.tracks]).reshape(-1, 4)
+        iou = iou_matriz(previas, cajas)
+        if iou.size:
+            misma_clase = np.array([t.clase for t in self.tracks])[:, None] == clases[None, :]
+            iou = np.where(misma_clase, iou, 0.0)
+
+        libres_t = set(range(len(self.tracks)))
+        libres_d = set(range(len(cajas)))
+        vistos = []
+        if iou.size:
+            for plano in np.argsort(iou, axis=None)[::-1]:
+                t, d = np.unravel_index(plano, iou.shape)
+                if iou[t, d] < self.iou_min:
+                    break
+                if t in libres_t and d in libres_d:
+                    track = self.tracks[t]
+                    track.asociar(cajas[d])
+                    vistos.append(track)
+                    libres_t.discard(t)
+                    libres_d.discard(d)
+
+        if libres_t and libres_d:
+            self._asociar_por_centro(cajas, clases, libres_t, libres_d, vistos)
+
+        for t in libres_t:
+            self.tracks[t].perdidos += 1
+
+        for d in sorted(libres_d):
+            track = Track(self._siguiente_id, int(clases[d]), cajas[d])
+            self._siguiente_id += 1
+            self.tracks.append(track)
+            vistos.append(track)
+
+        self.tracks = [t for t in self.tracks if t.perdidos <= self.max_perdidos]
+        return vistos
+
+    def _asociar_por_centro(self, cajas, clases, libres_t, libres_d, vistos):
+        """
+        Asocia (greedy, menor distancia relativa primero) los tracks y
+        detecciones libres de la misma clase. Quita de libres_t/libres_d
+        los asociados.
+        """
+        ts, ds = sorted(libres_t), sorted(libres_d)
+        previas = np.array([self.tracks[t].caja_prevista() for t in ts])
+        centros_t = (previas[:, :2] + previas[:, 2:]) / 2
+        centros_d = (cajas[ds, :2] + cajas[ds, 2:]) / 2
+        diagonal = np.maximum(np.hypot(previas[:, 2] - previas[:, 0], previas[:, 3] - previas[:, 1]), 1.0)
+
+        # Distancia al centro previsto, medida en diagonales de la caja del track
+        relativa = np.linalg.norm(centros_t[:, None] - centros_d[None, :], axis=2) / diagonal[:, None]
+        misma_clase = np.array([self.tracks[t].clase for t in ts])[:, None] == clases[ds][None, :]
+        relativa = np.where(misma_clase, relativa, np.inf)
+
+        for plano in np.argsort(relativa, axis=None):
+            i, j = np.unravel_index(plano, relativa.shape)
+            if relativa[i, j] > self.distancia_max:
+                break
+            t, d = ts[i], ds[j]
+            if t in libres_t and d in libres_d:
+                track = self.tracks[t]
+                track.asociar(cajas[d])
+                vistos.append(track)
+                libres_t.discard(t)
+                libres_d.discard(d)
+
+
+class VotoVentana:
+    """
+    Conteo estable por clase: en cada clase gana el valor más repetido
+    entre los últimos 'ventana' frames (empate: el mayor).
+    """
+
+    def __init__(self, ventana: int = VENTANA_VOTO):
+        self.frames = deque(maxlen=ventana)
+
+    def agregar(self, conteo: Counter):
+        self.frames.append(conteo)
+
+    def conteo(self) -> Counter:
+        clases = set().union(*self.frames) if self.frames else set()
+        votado = Counter()
+        for clase in clases:
+            votos = Counter(f.get(clase, 0) for f in self.frames)
+            valor = max(votos.items(), key=lambda kv: (kv[1], kv[0]))[0]
+            if valor:
+                votado[clase] = valor
+        return votado
+
+
+class ContadorLinea:
+    """
+    Cuenta cada track una sola vez cuando su centro cruza el segmento
+    p1 → p2 (p. ej. el borde de la bandeja o de la cinta). Solo cuentan
+    los tracks confirmados: si uno cruza antes de confirmarse, el cruce
+    queda pendiente hasta que se confirme (y se olvida si nunca lo hace).
+    """
+
+    def __init__(self, p1, p2):
+        self.p1 = np.asarray(p1, dtype=np.float64)
+        self.p2 = np.asarray(p2, dtype=np.float64)
+        self._lado = {}
+        self._pendientes = set()
+        self._contados = set()
+        self.cruces = Counter()
+
+    def _lado_de(self, punto) -> int:
+        d = self.p2 - self.p1
+        x, y = punto[0] - self.p1[0], punto[1] - self.p1[1]
+        return int(np.sign(d[0] * y - d[1] * x))
+
+    def actualizar(self, tracks: list[Track]):
+        for track in tracks:
+            lado = self._lado_de(track.centro)
+            previo = self._lado.get(track.id)
+            if lado != 0:
+                self._lado[track.id] = lado
+            if previo and lado and previo != lado:
+                self._pendientes.add(track.id)
+            if track.confirmado and track.id in self._pendientes and track.id not in self._contados:
+                self._contados.add(track.id)
+                self.cruces[track.clase] += 1
+
+    def reiniciar(self):
+        self._lado, self._pendientes, self._contados, self.cruces = {}, set(), set(), Counter()
+
+
+class SeguimientoConteo:
+    """
+    Tracker + voto por ventana (+ línea de conteo opcional) por encima
+    de las detecciones crudas de cada frame.
+
+    - conteo(): por clase, tracks confirmados en el frame votados sobre
+      los últimos VENTANA_VOTO frames. No parpadea cuando una detección
+      falla uno o dos frames.
+    - con linea=(p1, p2), cruces() acumula cada objeto que cruzó una sola
+      vez. Aunque la inferencia corra a pocos FPS y las cajas de frames
+      consecutivos no se superpongan, el track se conserva por distancia
+      entre centros (ver SeguidorIoU).
+    """
+
+    def __init__(self, linea=None, iou_min: float = 0.3, ventana: int = VENTANA_VOTO, distancia_max: float = DISTANCIA_MAX):
+        self.seguidor = SeguidorIoU(iou_min=iou_min, distancia_max=distancia_max)
+        self.voto = VotoVentana(ventana)
+        self.linea = ContadorLinea(*linea) if linea is not None else None
+
+    def actualizar(self, cajas, clases) -> list[Track]:
+        vistos = self.seguidor.actualizar(cajas, clases)
+        self.voto.agregar(Counter(t.clase for t in vistos if t.confirmado))
+        if self.linea is not None:
+            self.linea.actualizar(vistos)
+        return vistos
+
+    def conteo(self) -> Counter:
+        return self.voto.conteo()
+
+    def cruces(self) -> Counter:
+        return Counter(self.linea.cruces) if self.linea is not None else Counter()
+
+
+# =========================================================
+# VERIFICACIÓN (cruces a distintos FPS, sin modelo)
+# =========================================================
+def simular_cruce(paso: float, objetos: int = 1, separacion: float = 240.0, lado: float = 60.0,
+                  ancho: float = 640.0, ruido: float = 0.0, seed: int = 0) -> Counter:
+    """
+    'objetos' cajas de la misma clase que cruzan en fila una línea vertical
+    en x = ancho / 2, avanzando 'paso' píxeles por frame inferido (un paso
+    grande equivale a inferir a pocos FPS). Devuelve los cruces contados.
+    Con varios objetos, el paso debe ser menor que separacion / 2: si no,
+    el objeto de atrás queda más cerca que el mismo objeto en su nueva
+    posición y ningún tracker por posición puede distinguirlos.
+    """
+    rng = np.random.default_rng(seed)
+    seguimiento = SeguimientoConteo(linea=((ancho / 2, 0), (ancho / 2, 480)))
+    x = 10.0
+    while x - (objetos - 1) * separacion < ancho:
+        cajas = []
+        for k in range(objetos):
+            x0 = x - k * separacion
+            if 0 <= x0 <= ancho - lado:
+                y0 = 200 + rng.normal(0, ruido)
+                cajas.append((x0, y0, x0 + lado, y0 + lado))
+        seguimiento.actualizar(np.array(cajas).reshape(-1, 4), np.zeros(len(cajas), dtype=np.int64))
+        x += paso
+    return seguimiento.cruces()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica que cada objeto que cruza la línea se cuente una vez.")
+    parser.add_argument("--pasos", type=float, nargs="+", default=[5, 20, 45, 70, 100, 150], help="Píxeles por frame inferido.")
+    parser.add_argument("--objetos", type=int, default=1)
+    parser.add_argument("--separacion", type=float, default=240.0, help="Píxeles entre objetos consecutivos.")
+    args = parser.parse_args()
+
+    fallas = 0
+    for paso in args.pasos:
+        contados = sum(simular_cruce(paso, args.objetos, args.separacion, ruido=2.0).values())
+        ok = contados == args.objetos
+        fallas += not ok
+        print(f"paso {paso:>5.0f} px/frame: {contados} de {args.objetos} contados {'OK' if ok else 'FALLA'}")
+    sys.exit(1 if fallas else 0)
+
+
+if __name__ == "__main__":
+    main()
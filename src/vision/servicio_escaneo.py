@@ -0,0 +1,248 @@
+# servicio_escaneo.py
+import argparse
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+from src.vision.detectar_producto import DetectorProducto
+from src.vision.pipeline import PipelineDetector
+from src.vision.render import ALTO_VISTA, ANCHO_VISTA, RenderizadorFrames
+
+HOST = "127.0.0.1"
+PUERTO = 8765
+
+# URL con la que el frontend busca el servicio
+URL_ENV = "INVENTORIX_SCAN_URL"
+URL_SERVICIO = os.environ.get(URL_ENV, f"http://{HOST}:{PUERTO}")
+
+CALIDAD_JPEG = 80
+TIMEOUT_CLIENTE = 2.0
+
+TIPOS_MOVIMIENTO = ("entrada", "salida")
+
+
+class ServicioEscaneo:
+    """
+    Detector de escaneo en su propio proceso (sin ventana Qt):
+    el frontend lo maneja por HTTP en localhost y nunca se bloquea
+    esperando a la cámara.
+
+    - iniciar(): abre la fuente, pone conteos en cero y arranca el pipeline.
+    - estado(): conteo estable actual, métricas del pipeline, del mapeo
+      al catálogo y del modelo.
+    - preview_jpeg(): último frame con las cajas, en JPEG (se codifica una
+      sola vez por resultado nuevo, aunque varios clientes consulten).
+    - confirmar(tipo): resultados del conteo (mismo formato que
+      obtener_resultados) y fin del escaneo. El registro lo hace el frontend.
+    """
+
+    def __init__(self, fuente=3, **opciones):
+        self.detector = DetectorProducto(cam_index=fuente, **opciones)
+        self.detector.liberar()  # la fuente se abre al iniciar cada escaneo
+        self.pipeline = None
+        self.render = RenderizadorFrames(ANCHO_VISTA, ALTO_VISTA)
+        self._jpeg = (0, None)  # (seq, bytes)
+        self._lock = threading.Lock()
+
+    @property
+    def escaneando(self) -> bool:
+        return self.pipeline is not None
+
+    def iniciar(self):
+        with self._lock:
+            if self.pipeline is not None:
+                return
+            self.detector.abrir()
+            self.detector.reiniciar()
+            self._jpeg = (0, None)
+            self.pipeline = PipelineDetector(self.detector, anotar=False)
+            self.pipeline.iniciar()
+
+    def _terminar(self):
+        if self.pipeline is not None:
+            self.pipeline.detener()
+            self.pipeline = None
+        self.detector.liberar()
+
+    def cancelar(self):
+        with self._lock:
+            self._terminar()
+
+    def confirmar(self, tipo: str) -> list[dict]:
+        if tipo not in TIPOS_MOVIMIENTO:
+            raise ValueError(f"Tipo de movimiento no válido: {tipo!r}")
+        with self._lock:
+            if self.pipeline is None:
+                raise RuntimeError("No hay un escaneo en curso")
+            self._terminar()
+            return self.detector.obtener_resultados(tipo)
+
+    def estado(self) -> dict:
+        with self._lock:
+            pipeline = self.pipeline
+            return {
+                "escaneando": pipeline is not None,
+                "conteo": dict(self.detector.conteo),
+                "metricas": pipeline.metricas() if pipeline is not None else None,
+                "mapeo": self.detector.metricas_mapeo(),
+                "modelo": self.detector.model.estado() if hasattr(self.detector.model, "estado") else None,
+            }
+
+    def preview_jpeg(self) -> bytes | None:
+        with self._lock:
+            if self.pipeline is None:
+                return self._jpeg[1]
+            ultimo = self.pipeline.ultimo(self._jpeg[0])
+            if ultimo is None:
+                return self._jpeg[1]
+
+            seq, res = ultimo
+            cajas, clases, confianzas = res.detecciones
+            self.render.renderizar(res.frame, cajas, clases, confianzas, self.detector.model.names)
+            if self.detector.roi is not None:
+                self.render.dibujar_roi(self.detector.roi)
+            if self.detector.linea is not None:
+                self.render.dibujar_linea(*self.detector.linea)
+            ok, jpeg = cv2.imencode(".jpg", self.render.buffer, [cv2.IMWRITE_JPEG_QUALITY, CALIDAD_JPEG])
+            if ok:
+                self._jpeg = (seq, jpeg.tobytes())
+            return self._jpeg[1]
+
+
+# =========================================================
+# HTTP
+# =========================================================
+def _crear_handler(servicio: ServicioEscaneo):
+    class Handler(BaseHTTPRequestHandler):
+        def _responder(self, codigo: int, cuerpo: bytes, tipo: str):
+            self.send_response(codigo)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def _json(self, codigo: int, datos):
+            self._responder(codigo, json.dumps(datos, ensure_ascii=False, default=str).encode("utf-8"), "application/json")
+
+        def do_GET(self):
+            if self.path == "/estado":
+                self._json(200, servicio.estado())
+            elif self.path == "/preview.jpg":
+                jpeg = servicio.preview_jpeg()
+                if jpeg is None:
+                    self._responder(204, b"", "image/jpeg")
+                else:
+                    self._responder(200, jpeg, "image/jpeg")
+            else:
+                self._json(404, {"error": "Ruta no encontrada"})
+
+        def do_POST(self):
+            largo = int(self.headers.get("Content-Length") or 0)
+            try:
+                datos = json.loads(self.rfile.read(largo) or b"{}")
+            except ValueError:
+                self._json(400, {"error": "JSON inválido"})
+                return
+
+            try:
+                if self.path == "/iniciar":
+                    servicio.iniciar()
+                    self._json(200, {"ok": True})
+                elif self.path == "/cancelar":
+                    servicio.cancelar()
+                    self._json(200, {"ok": True})
+                elif self.path == "/confirmar":
+                    self._json(200, {"resultados": servicio.confirmar(str(datos.get("tipo", "")).lower())})
+                else:
+                    self._json(404, {"error": "Ruta no encontrada"})
+            except (ValueError, RuntimeError) as e:
+                self._json(409, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            # Sin log por request: el frontend consulta varias veces por segundo
+            pass
+
+    return Handler
+
+
+def servir(fuente=3, host=HOST, puerto=PUERTO, **opciones):
+    servicio = ServicioEscaneo(fuente, **opciones)
+    # Modelo cargado y calentado antes de aceptar escaneos
+    servicio.detector.model.cargar_en_segundo_plano()
+    servidor = ThreadingHTTPServer((host, puerto), _crear_handler(servicio))
+    print(f"Servicio de escaneo en http://{host}:{puerto} (fuente: {fuente})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servicio.cancelar()
+        servidor.server_close()
+
+
+# =========================================================
+# CLIENTE (lo usa el frontend)
+# =========================================================
+class ClienteEscaneo:
+    def __init__(self, url=URL_SERVICIO, timeout=TIMEOUT_CLIENTE):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _pedir(self, ruta: str, datos: dict | None = None) -> bytes:
+        cuerpo = None if datos is None else json.dumps(datos).encode("utf-8")
+        req = urllib.request.Request(
+            self.url + ruta,
+            data=cuerpo,
+            method="GET" if datos is None else "POST",
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.read()
+        except urllib.error.HTTPError as e:
+            try:
+                mensaje = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                mensaje = str(e)
+            raise RuntimeError(mensaje) from None
+
+    def disponible(self) -> bool:
+        try:
+            self.estado()
+            return True
+        except (OSError, RuntimeError):
+            return False
+
+    def estado(self) -> dict:
+        return json.loads(self._pedir("/estado"))
+
+    def preview(self) -> bytes | None:
+        return self._pedir("/preview.jpg") or None
+
+    def iniciar(self):
+        self._pedir("/iniciar", {})
+
+    def cancelar(self):
+        self._pedir("/cancelar", {})
+
+    def confirmar(self, tipo: str) -> list[dict]:
+        return json.loads(self._pedir("/confirmar", {"tipo": tipo}))["resultados"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio de escaneo headless (HTTP en localhost).")
+    parser.add_argument("--fuente", default="3", help='Índice de cámara, archivo de video o "sintetica".')
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--roi", type=int, nargs=4, metavar=("X", "Y", "ANCHO", "ALTO"))
+    args = parser.parse_args()
+    servir(args.fuente, puerto=args.puerto, roi=args.roi)
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,203 @@
+# vision_model.py
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
 
+import numpy as np
+from ultralytics import YOLO
+
+MODELO_PATH = "yolov8n.pt"
+
+# Backend de inferencia: "pytorch" (el .pt tal cual), "onnx" (ONNX Runtime)
+# u "openvino" (OpenVINO CPU). Con INVENTORIX_VISION_INT8=1 el modelo
+# exportado se cuantiza a INT8.
+BACKEND_ENV = "INVENTORIX_VISION_BACKEND"
+INT8_ENV = "INVENTORIX_VISION_INT8"
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+# Tamaño de entrada con el que se exporta (el mismo que usa YOLO por defecto)
+IMGSZ_EXPORT = 640
+
+# Resolución de la cámara (alto, ancho): el warm-up usa la misma para
+# que la primera detección real no pague la preparación del modelo
+RESOLUCION_WARMUP = (480, 640)
+
+# Inferencias recientes sobre las que se promedia la latencia
+VENTANA_LATENCIA = 30
+
+
+# =========================================================
+# BACKENDS
+# =========================================================
+def backend_configurado() -> tuple[str, bool]:
+    backend = os.environ.get(BACKEND_ENV, "pytorch").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"{BACKEND_ENV}={backend!r} no válido (opciones: {', '.join(BACKENDS)})")
+    return backend, os.environ.get(INT8_ENV, "0") == "1"
+
+
+def ruta_exportada(ruta, backend: str, int8: bool = False) -> Path:
+    """
+    Dónde queda el modelo exportado (mismos nombres que usa ultralytics).
+    """
+    ruta = Path(ruta)
+    if backend == "pytorch":
+        return ruta
+    if backend == "onnx":
+        return ruta.with_name(f"{ruta.stem}{'_int8' if int8 else ''}.onnx")
+    return ruta.with_name(f"{ruta.stem}{'_int8' if int8 else ''}_openvino_model")
+
+
+def exportar_modelo(ruta=MODELO_PATH, backend: str = "onnx", int8: bool = False, imgsz: int = IMGSZ_EXPORT) -> Path:
+    """
+    Exporta el .pt al backend pedido (una sola vez: si ya existe se reutiliza).
+
+    - onnx: export de ultralytics; con int8 se cuantizan los pesos con
+      onnxruntime.quantization (cuantización dinámica, no necesita datos).
+    - openvino: export de ultralytics; con int8 cuantiza con NNCF usando
+      su dataset de calibración por defecto.
+    """
+    destino = ruta_exportada(ruta, backend, int8)
+    if backend == "pytorch" or destino.exists():
+        return destino
+
+    if backend == "onnx":
+        onnx_fp32 = Path(YOLO(ruta).export(format="onnx", imgsz=imgsz))
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(str(onnx_fp32), str(destino), weight_type=QuantType.QUInt8)
+        return destino
+
+    if backend == "openvino":
+        return Path(YOLO(ruta).export(format="openvino", imgsz=imgsz, int8=int8))
+
+    raise ValueError(f"Backend desconocido: {backend!r}")
+
+
+def cargar_yolo(ruta=MODELO_PATH, backend: str = "pytorch", int8: bool = False):
+    """
+    YOLO listo para inferir con el backend pedido. Para cualquier backend
+    se usa igual (model(frame, conf=...), model.names).
+    """
+    if backend == "pytorch":
+        return YOLO(ruta)
+    return YOLO(str(exportar_modelo(ruta, backend, int8)), task="detect")
+
+
+# =========================================================
+# MODELO RESIDENTE
+# =========================================================
+class ModeloResidente:
+    """
+    Modelo YOLO cargado una sola vez por proceso y calentado con una
+    inferencia sobre un frame vacío a la resolución de trabajo.
+
+    Se usa igual que el YOLO (modelo(frame, conf=...), modelo.names) y
+    además mide la latencia de cada llamada. La carga puede hacerse en
+    segundo plano (cargar_en_segundo_plano) mientras la UI sigue libre;
+    estado() informa si ya está listo.
+
+    backend/int8 por defecto salen de INVENTORIX_VISION_BACKEND e
+    INVENTORIX_VISION_INT8 (ver cargar_yolo).
+    """
+
+    def __init__(self, ruta=MODELO_PATH, resolucion=RESOLUCION_WARMUP, backend=None, int8=None):
+        backend_env, int8_env = backend_configurado()
+        self.ruta = ruta
+        self.resolucion = resolucion
+        self.backend = backend or backend_env
+        self.int8 = int8_env if int8 is None else int8
+        self.model = None
+        self.error = None
+        self.carga_ms = None
+        self.warmup_ms = None
+
+        self._listo = threading.Event()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._latencias = deque(maxlen=VENTANA_LATENCIA)
+
+    # ---------- carga ----------
+    def cargar(self):
+        """
+        Carga + warm-up (bloqueante). Si ya está cargado no hace nada.
+        """
+        with self._lock:
+            if self._listo.is_set():
+                return
+            try:
+                t0 = time.perf_counter()
+                model = cargar_yolo(self.ruta, self.backend, self.int8)
+                t1 = time.perf_counter()
+                alto, ancho = self.resolucion
+                model(np.zeros((alto, ancho, 3), dtype=np.uint8), verbose=False)
+                t2 = time.perf_counter()
+            except Exception as e:
+                self.error = str(e)
+                raise
+
+            self.model = model
+            self.error = None
+            self.carga_ms = 1000 * (t1 - t0)
+            self.warmup_ms = 1000 * (t2 - t1)
+            self._listo.set()
+
+    def _cargar_sin_error(self):
+        try:
+            self.cargar()
+        except Exception:
+            # El error queda en self.error (estado()); quien llame a cargar() lo verá
+            pass
+
+    def cargar_en_segundo_plano(self):
+        if self._listo.is_set() or (self._hilo is not None and self._hilo.is_alive()):
+            return
+        self._hilo = threading.Thread(target=self._cargar_sin_error, name="carga-modelo", daemon=True)
+        self._hilo.start()
+
+    def esperar(self, timeout: float | None = None) -> bool:
+        return self._listo.wait(timeout)
+
+    # ---------- uso ----------
+    @property
+    def names(self):
+        self.cargar()
+        return self.model.names
+
+    def __call__(self, source, **kwargs):
+        self.cargar()
+        kwargs.setdefault("verbose", False)
+        t0 = time.perf_counter()
+        results = self.model(source, **kwargs)
+        self._latencias.append(time.perf_counter() - t0)
+        return results
+
+    def estado(self) -> dict:
+        """
+        {"backend", "listo", "cargando", "error", "carga_ms", "warmup_ms", "latencia_ms"}
+        (latencia promedio de las últimas VENTANA_LATENCIA inferencias).
+        """
+        latencias = list(self._latencias)
+        return {
+            "backend": self.backend + (" int8" if self.int8 else ""),
+            "listo": self._listo.is_set(),
+            "cargando": self._hilo is not None and self._hilo.is_alive(),
+            "error": self.error,
+            "carga_ms": self.carga_ms,
+            "warmup_ms": self.warmup_ms,
+            "latencia_ms": 1000 * sum(latencias) / len(latencias) if latencias else None,
+        }
+
+
+_modelo = None
+_modelo_lock = threading.Lock()
+
+
+def obtener_modelo() -> ModeloResidente:
+    global _modelo
+    with _modelo_lock:
+        if _modelo is None:
+            _modelo = ModeloResidente()
+    return _modelo